@@ -3,8 +3,10 @@ import pandas as pd
 from dash import dcc, html, Input, Output, State
 import plotly.express as px
 import plotly.graph_objects as go
-import io
-import base64
+from .upload_cache import get_cube, get_upload
+from .cubes import build_attendance_cube, filter_attendance
+from .large_data import trend_traces
+from .course_data import list_courses, LIVE_TTL
 
 # --- LAYOUT DEFINITION ---
 def get_attendance_layout():
@@ -15,9 +17,23 @@ def get_attendance_layout():
             html.Div([
                 html.H1("📊 Attendance Analytics Dashboard", 
                         style={'fontSize': '32px', 'fontWeight': '800', 'color': '#0f172a', 'marginBottom': '8px', 'letterSpacing': '-0.02em'}),
-                html.P("Upload your CSV file to visualize attendance trends & performance metrics.", 
+                html.P("Upload your CSV or Excel files to visualize attendance trends & performance metrics.", 
                        style={'color': '#64748b', 'marginBottom': '24px', 'fontSize': '15px'}),
                 
+                # Live mode: pull the course straight from the API instead of a CSV
+                html.Div([
+                    html.Span("Load a course live", 
+                              style={'fontSize': '14px', 'fontWeight': '600', 'color': '#475569', 'whiteSpace': 'nowrap'}),
+                    dcc.Dropdown(
+                        id='attendance-course-picker',
+                        options=[],
+                        placeholder="Select a course...",
+                        clearable=True,
+                        style={'flex': '1'}
+                    ),
+                    dcc.Interval(id='attendance-live-interval', interval=LIVE_TTL * 1000)
+                ], style={'display': 'flex', 'alignItems': 'center', 'gap': '12px', 'marginBottom': '20px'}),
+                
                 dcc.Upload(
                     id='attendance-upload',
                     children=html.Div([
@@ -25,7 +41,7 @@ def get_attendance_layout():
                                style={'fontSize': '48px', 'color': '#6366f1', 'marginBottom': '16px'}),
                         html.H3("Drop your attendance file here", 
                                style={'fontSize': '20px', 'fontWeight': '700', 'color': '#1e293b', 'marginBottom': '8px'}),
-                        html.P("Supports CSV files with columns: date, status, section", 
+                        html.P("CSV or Excel files with columns: date, status, section (select several to combine)", 
                                style={'color': '#94a3b8', 'fontSize': '14px', 'marginBottom': '20px'}),
                         html.Button(
                             "Browse Files",
@@ -43,9 +59,17 @@ def get_attendance_layout():
                         'textAlign': 'center', 'cursor': 'pointer', 'background': 'white',
                         'transition': 'all 0.3s ease', 'boxShadow': '0 4px 20px rgba(0,0,0,0.04)'
                     },
-                    multiple=False
+                    accept='.csv,.xlsx,.xls',
+                    multiple=True
+                ),
+                html.Div(id='upload-status', style={'marginTop': '20px'}),
+                html.Div(
+                    html.Progress(id='attendance-progress', value='0', max='100',
+                                  style={'width': '100%', 'height': '8px', 'accentColor': '#6366f1'}),
+                    id='attendance-progress-wrap', style={'display': 'none', 'marginTop': '16px'}
                 ),
-                html.Div(id='upload-status', style={'marginTop': '20px'})
+                # Upload whose cube has been built (filters are answered from it)
+                dcc.Store(id='attendance-cube-store')
             ], style={
                 'background': 'white', 
                 'borderRadius': '20px', 
@@ -55,6 +79,14 @@ def get_attendance_layout():
             })
         ], style={'marginBottom': '28px'}),
         
+        # Filters (answered from the precomputed cube)
+        html.Div([
+            dcc.Dropdown(id='attendance-section-filter', multi=True, placeholder="All sections",
+                         style={'flex': '1', 'minWidth': '220px'}),
+            dcc.DatePickerRange(id='attendance-date-filter', clearable=True,
+                                start_date_placeholder_text="From", end_date_placeholder_text="To")
+        ], style={'display': 'flex', 'gap': '16px', 'alignItems': 'center', 'flexWrap': 'wrap', 'marginBottom': '28px'}),
+        
         # 2. KPI Cards Section
         html.Div(id='kpi-container', 
                 style={
@@ -275,6 +307,45 @@ def apply_chart_styling(fig, height=320):
 # --- CALLBACKS ---
 def register_attendance_callbacks(app):
     
+    # Filled after the page renders, so a slow or unreachable API never delays it
+    @app.callback(
+        Output('attendance-course-picker', 'options'),
+        Input('attendance-live-interval', 'n_intervals')
+    )
+    def load_course_options(n_intervals):
+        return [{'label': c, 'value': c} for c in list_courses()]
+    
+    # Building the cube scans every row: run it in the background, once per upload
+    @app.callback(
+        [Output('attendance-cube-store', 'data'),
+         Output('attendance-section-filter', 'options'),
+         Output('attendance-date-filter', 'min_date_allowed'),
+         Output('attendance-date-filter', 'max_date_allowed')],
+        Input('attendance-upload-store', 'data'),
+        background=True,
+        running=[(Output('attendance-progress-wrap', 'style'),
+                  {'display': 'block', 'marginTop': '16px'},
+                  {'display': 'none'})],
+        progress=[Output('attendance-progress', 'value'), Output('attendance-progress', 'max')],
+        cancel=[Input('attendance-upload', 'contents')]
+    )
+    def build_dashboard_cube(set_progress, upload):
+        if upload is None:
+            return None, [], None, None
+        set_progress(("10", "100"))
+        try:
+            cube = get_cube(upload, 'attendance', build_attendance_cube)
+            if cube is None:
+                raise ValueError("Upload expired from the server cache, please upload the file again")
+        except Exception as e:
+            return {'error': str(e)}, [], None, None
+        set_progress(("100", "100"))
+        if 'error' in cube:
+            return {'error': cube['error']}, [], None, None
+        section_options = [{'label': sec, 'value': sec} for sec in cube['sections']] if cube['has_section'] else []
+        return upload, section_options, cube['min_date'], cube['max_date']
+    
+    # Filter changes only slice the cached cube, so they are answered in the request
     @app.callback(
         [Output('upload-status', 'children'),
          Output('kpi-container', 'children'),
@@ -283,11 +354,13 @@ def register_attendance_callbacks(app):
          Output('trend-line', 'figure'),
          Output('summary-table', 'children'),
          Output('charts-container', 'className')],
-        [Input('attendance-upload', 'contents')],
-        [State('attendance-upload', 'filename')]
+        [Input('attendance-cube-store', 'data'),
+         Input('attendance-section-filter', 'value'),
+         Input('attendance-date-filter', 'start_date'),
+         Input('attendance-date-filter', 'end_date')]
     )
-    def update_dashboard(contents, filename):
-        if contents is None:
+    def update_dashboard(upload, sections, start_date, end_date):
+        if upload is None:
             return (
                 html.Div("📁 Upload a CSV file to begin analysis", 
                         style={'color': '#64748b', 'textAlign': 'center', 'padding': '12px', 'fontSize': '15px'}),
@@ -295,20 +368,16 @@ def register_attendance_callbacks(app):
             )
 
         try:
-            content_type, content_string = contents.split(',')
-            decoded = base64.b64decode(content_string)
-            try:
-                df = pd.read_csv(io.StringIO(decoded.decode('utf-8')))
-            except:
-                df = pd.read_csv(io.StringIO(decoded.decode('latin-1')))
+            filename = upload.get('filename')
+            cube = upload if 'error' in upload else get_cube(upload, 'attendance', build_attendance_cube)
+            if cube is None:
+                raise ValueError("Upload expired from the server cache, please upload the file again")
             
-            df.columns = [str(col).strip().lower().replace(' ', '_') for col in df.columns]
-            
-            if 'status' not in df.columns:
+            if 'error' in cube:
                 return (
                     html.Div([
                         html.I(className="fa-solid fa-triangle-exclamation", style={'marginRight': '10px'}),
-                        " Error: CSV must contain 'status' column"
+                        f" Error: {cube['error']}"
                     ], style={
                         'background': '#fef2f2', 
                         'color': '#dc2626', 
@@ -321,16 +390,14 @@ def register_attendance_callbacks(app):
                     [], {}, {}, {}, html.Div(), "hidden"
                 )
             
-            df['status'] = df['status'].astype(str).str.strip().str.title()
-            if 'date' in df.columns:
-                df['date'] = pd.to_datetime(df['date'], errors='coerce')
-                df = df.dropna(subset=['date'])
+            cells = filter_attendance(cube, sections, start_date, end_date)
+            status_counts = cells.groupby('status', observed=True)['count'].sum().sort_values(ascending=False)
             
             # KPI Calculations
-            total = len(df)
-            present = len(df[df['status'] == 'Present'])
-            absent = len(df[df['status'] == 'Absent'])
-            late = len(df[df['status'] == 'Late'])
+            total = int(status_counts.sum())
+            present = int(status_counts.get('Present', 0))
+            absent = int(status_counts.get('Absent', 0))
+            late = int(status_counts.get('Late', 0))
             rate = round((present / total) * 100, 1) if total > 0 else 0
             
             kpis = [
@@ -344,7 +411,6 @@ def register_attendance_callbacks(app):
             color_map = {'Present': "#3b82f6", 'Absent': "#ec4899", 'Late': "#f59e0b"}
             
             # Pie Chart with Donut Style
-            status_counts = df['status'].value_counts()
             pie_fig = go.Figure(data=[go.Pie(
                 labels=status_counts.index,
                 values=status_counts.values,
@@ -371,8 +437,8 @@ def register_attendance_callbacks(app):
             pie_fig = apply_chart_styling(pie_fig, height=320)
             
             # Bar Chart - Section Performance
-            if 'section' in df.columns:
-                bar_data = df.groupby(['section', 'status']).size().reset_index(name='count')
+            if cube['has_section']:
+                bar_data = cells.groupby(['section', 'status'], observed=True)['count'].sum().reset_index()
                 bar_fig = px.bar(
                     bar_data, 
                     x='section', 
@@ -405,31 +471,10 @@ def register_attendance_callbacks(app):
                 )
             
             # Trend Line with Area Fill
-            if 'date' in df.columns:
-                trend_data = df[df['status'] == 'Present'].groupby('date').size().reset_index(name='count').sort_values('date')
-                trend_fig = go.Figure()
-                
-                # Area fill
-                trend_fig.add_trace(go.Scatter(
-                    x=trend_data['date'],
-                    y=trend_data['count'],
-                    fill='tozeroy',
-                    fillcolor='rgba(59, 130, 246, 0.15)',
-                    line=dict(color='rgba(0,0,0,0)'),
-                    showlegend=False,
-                    hoverinfo='skip'
-                ))
-                
-                # Main line
-                trend_fig.add_trace(go.Scatter(
-                    x=trend_data['date'],
-                    y=trend_data['count'],
-                    mode='lines+markers',
-                    name='Present',
-                    line=dict(color='#3b82f6', width=4, shape='spline'),
-                    marker=dict(size=10, color='white', line=dict(width=3, color='#3b82f6')),
-                    hovertemplate='<b>%{x|%b %d, %Y}</b><br>Present: %{y}<extra></extra>'
-                ))
+            if cube['has_date']:
+                trend_data = cells[cells['status'] == 'Present'].groupby('date', observed=True)['count'].sum().reset_index().sort_values('date')
+                # Large date ranges switch to WebGL + LTTB downsampling
+                trend_fig = go.Figure(data=trend_traces(trend_data['date'], trend_data['count'], '#3b82f6', 'Present'))
                 
                 trend_fig = apply_chart_styling(trend_fig, height=360)
             else:
@@ -511,7 +556,7 @@ def register_attendance_callbacks(app):
                 'alignItems': 'center'
             })
             
-            return msg, kpis, pie_fig, bar_fig, trend_fig, summary_html, ""
+            return (msg, kpis, pie_fig, bar_fig, trend_fig, summary_html, "")
             
         except Exception as e:
             return (
@@ -533,12 +578,11 @@ def register_attendance_callbacks(app):
     @app.callback(
         Output("download-data", "data"),
         Input("download-btn", "n_clicks"),
-        State('attendance-upload', 'contents'),
+        State('attendance-upload-store', 'data'),
         prevent_initial_call=True
     )
-    def download_data(n_clicks, contents):
-        if contents is None:
+    def download_data(n_clicks, upload):
+        df = get_upload(upload)
+        if df is None:
             return dash.no_update
-        content_type, content_string = contents.split(',')
-        decoded = base64.b64decode(content_string)
-        return dict(content=decoded, filename="attendance_analysis.csv")
\ No newline at end of file
+        return dcc.send_data_frame(df.to_csv, "attendance_analysis.csv", index=False)
\ No newline at end of file
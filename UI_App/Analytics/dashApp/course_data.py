@@ -0,0 +1,99 @@
+import hashlib
+import io
+import logging
+import os
+import time
+
+import pandas as pd
+import requests
+
+from .upload_cache import cache, disk_cache, normalise_frame
+
+logger = logging.getLogger(__name__)
+
+# FastAPI backend the teacher/student pages talk to
+API_URL = os.getenv("STUDENT_API_URL", "http://localhost:8000").rstrip("/")
+# Seconds a live course frame is served from memory before revalidating
+LIVE_TTL = int(os.getenv("DASH_LIVE_TTL", "60"))
+API_TIMEOUT = 30
+# The course list is small: give up quickly, and retry a failed fetch after a short pause
+COURSE_LIST_TIMEOUT = 5
+COURSE_LIST_RETRY = 15
+
+# kind -> API path that serves the course data
+LIVE_SOURCES = {
+    'attendance': "/attendance/export/{course}",
+    'marks': "/results/{course}",
+}
+
+# Live entries live in the disk cache so every server worker shares them
+ENTRY_PREFIX = "live-entry"
+
+
+def _parse(kind, resp):
+    if kind == 'attendance':
+        df = pd.read_csv(io.BytesIO(resp.content))
+    else:
+        df = pd.DataFrame(resp.json()).drop(columns=['components'], errors='ignore')
+    return normalise_frame(df)
+
+
+def list_courses():
+    """Course codes for the picker (cached for LIVE_TTL seconds, failures for COURSE_LIST_RETRY)"""
+    entry = disk_cache.get((ENTRY_PREFIX, 'courses'))
+    if entry and time.time() < entry['expires']:
+        return entry['courses']
+    try:
+        resp = requests.get(f"{API_URL}/courses/", timeout=COURSE_LIST_TIMEOUT)
+        resp.raise_for_status()
+        courses = resp.json()
+    except Exception as e:
+        logger.warning("Error loading course list: %s", e)
+        # Keep serving the last list, without asking the API on every page load
+        courses = entry['courses'] if entry else []
+        disk_cache.set((ENTRY_PREFIX, 'courses'), {'courses': courses, 'expires': time.time() + COURSE_LIST_RETRY})
+        return courses
+
+    disk_cache.set((ENTRY_PREFIX, 'courses'), {'courses': courses, 'expires': time.time() + LIVE_TTL})
+    return courses
+
+
+def load_live(kind, course):
+    """
+    dcc.Store value for a course's live data.
+    Served from memory within LIVE_TTL; after that the API is asked again and the
+    frame is only re-parsed when the data version (ETag or content hash) changed.
+    """
+    entry_key = (ENTRY_PREFIX, kind, course)
+    entry = disk_cache.get(entry_key)
+    now = time.time()
+
+    if entry and now < entry['expires'] and entry['store']['key'] in cache:
+        return entry['store']
+
+    headers = {'If-None-Match': entry['etag']} if entry and entry.get('etag') else {}
+    resp = requests.get(API_URL + LIVE_SOURCES[kind].format(course=course), headers=headers, timeout=API_TIMEOUT)
+
+    if resp.status_code == 304 and entry and entry['store']['key'] in cache:
+        entry['expires'] = now + LIVE_TTL
+        disk_cache.set(entry_key, entry)
+        return entry['store']
+    resp.raise_for_status()
+
+    version = resp.headers.get('ETag') or hashlib.sha256(resp.content).hexdigest()
+    if entry and entry['version'] == version and entry['store']['key'] in cache:
+        entry['expires'] = now + LIVE_TTL
+        disk_cache.set(entry_key, entry)
+        return entry['store']
+
+    key = "live:{}:{}:{}".format(kind, course, hashlib.sha256(version.encode()).hexdigest()[:16])
+    cache.put(key, _parse(kind, resp))
+    store = {'key': key, 'filename': f"{course} (live)", 'course': course}
+
+    disk_cache.set(entry_key, {
+        'store': store,
+        'version': version,
+        'etag': resp.headers.get('ETag'),
+        'expires': now + LIVE_TTL,
+    })
+    return store
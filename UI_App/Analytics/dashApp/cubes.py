@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+
+# Section label used when a file has no section column
+NO_SECTION = "All"
+
+# Quantile sketch kept per marks cell (every 5th percentile)
+SKETCH_POINTS = np.linspace(0, 1, 21)
+
+
+def _labels(df, col, case=None):
+    """Label column, normalised (categoricals were already normalised at ingestion)"""
+    values = df[col]
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values
+    values = values.astype('string').str.strip()
+    values = values.mask(values == '')
+    return getattr(values.str, case)() if case else values
+
+
+# --- ATTENDANCE: counts by section x date x status ---
+def build_attendance_cube(df):
+    """One pass over the raw rows; every render afterwards works on the cells only"""
+    if 'status' not in df.columns:
+        return {'error': "CSV must contain 'status' column"}
+
+    frame = pd.DataFrame({
+        'section': _labels(df, 'section') if 'section' in df.columns else NO_SECTION,
+        'date': pd.to_datetime(df['date'], errors='coerce') if 'date' in df.columns else pd.NaT,
+        'status': _labels(df, 'status', 'title'),
+    })
+    if 'date' in df.columns:
+        frame = frame.dropna(subset=['date'])
+
+    cells = (
+        frame.groupby(['section', 'date', 'status'], dropna=False, observed=True)
+        .size()
+        .reset_index(name='count')
+    )
+    return {
+        'cells': cells,
+        'has_section': 'section' in df.columns,
+        'has_date': 'date' in df.columns,
+        # Rows without a section still count, but are not a filter option
+        'sections': sorted(cells['section'].dropna().unique()),
+        'min_date': _day(cells['date'].min()) if 'date' in df.columns else None,
+        'max_date': _day(cells['date'].max()) if 'date' in df.columns else None,
+    }
+
+
+def _day(value):
+    return None if pd.isna(value) else value.strftime('%Y-%m-%d')
+
+
+def filter_attendance(cube, sections=None, start_date=None, end_date=None):
+    """Cells matching the section / date-range filters (unknown sections are ignored)"""
+    cells = cube['cells']
+    sections = [s for s in (sections or []) if s in cube['sections']]
+    if sections:
+        cells = cells[cells['section'].isin(sections)]
+    if cube['has_date']:
+        if start_date:
+            cells = cells[cells['date'] >= pd.to_datetime(start_date)]
+        if end_date:
+            cells = cells[cells['date'] <= pd.to_datetime(end_date)]
+    return cells
+
+
+# --- MARKS: stats and quantile sketch by section x grade x status ---
+def build_marks_cube(df):
+    if 'status' not in df.columns or 'grade' not in df.columns:
+        return {'error': "CSV must contain 'status' and 'grade' columns"}
+
+    frame = pd.DataFrame({
+        'section': _labels(df, 'section') if 'section' in df.columns else NO_SECTION,
+        'grade': _labels(df, 'grade', 'upper'),
+        'status': _labels(df, 'status', 'title'),
+        'total_marks': pd.to_numeric(df['total_marks'], errors='coerce').fillna(0) if 'total_marks' in df.columns else 0.0,
+        'gpa': pd.to_numeric(df['gpa'], errors='coerce').fillna(0) if 'gpa' in df.columns else 0.0,
+        'name': df['name'] if 'name' in df.columns else "N/A",
+    })
+    frame['marks_sq'] = frame['total_marks'] ** 2
+
+    # Rows with a missing label are kept (as NA cells) so the totals count them
+    keys = ['section', 'grade', 'status']
+    grouped = frame.groupby(keys, dropna=False, observed=True)
+    marks = grouped['total_marks']
+
+    cells = marks.agg(count='size', sum_marks='sum', min_marks='min', max_marks='max')
+    cells['sum_sq'] = grouped['marks_sq'].sum()
+    cells['sum_gpa'] = grouped['gpa'].sum()
+    cells['top_name'] = frame.loc[marks.idxmax().values, 'name'].values
+    # Keyed by group number: unstack() would reorder cells with NA labels
+    sketch = frame['total_marks'].groupby(grouped.ngroup()).quantile(SKETCH_POINTS).unstack()
+    cells['sketch'] = sketch.values.tolist()
+    cells = cells.reset_index()
+
+    return {
+        'cells': cells,
+        'has_section': 'section' in df.columns,
+        'has_gpa': 'gpa' in df.columns,
+        'has_name': 'name' in df.columns,
+        'sections': sorted(cells['section'].dropna().unique()),
+        'grades': sorted(cells['grade'].dropna().unique()),
+    }
+
+
+def filter_marks(cube, sections=None, grades=None):
+    cells = cube['cells']
+    sections = [s for s in (sections or []) if s in cube['sections']]
+    grades = [g for g in (grades or []) if g in cube['grades']]
+    if sections:
+        cells = cells[cells['section'].isin(sections)]
+    if grades:
+        cells = cells[cells['grade'].isin(grades)]
+    return cells
+
+
+def box_stats(cells):
+    """
+    Box-plot statistics for the union of several cells, merged from their
+    quantile sketches (approximate to the sketch resolution).
+    """
+    count = cells['count'].sum()
+    points = np.concatenate([np.asarray(s, dtype=float) for s in cells['sketch']])
+    weights = np.repeat(cells['count'].values / len(SKETCH_POINTS), len(SKETCH_POINTS))
+
+    order = np.argsort(points)
+    points, cumulative = points[order], np.cumsum(weights[order])
+
+    def quantile(p):
+        idx = np.searchsorted(cumulative, p * cumulative[-1])
+        return float(points[min(idx, len(points) - 1)])
+
+    q1, median, q3 = quantile(0.25), quantile(0.5), quantile(0.75)
+    lowest, highest = float(cells['min_marks'].min()), float(cells['max_marks'].max())
+    iqr = q3 - q1
+    mean = cells['sum_marks'].sum() / count
+    variance = max(cells['sum_sq'].sum() / count - mean ** 2, 0.0)
+
+    return {
+        'q1': q1,
+        'median': median,
+        'q3': q3,
+        'lowerfence': max(lowest, q1 - 1.5 * iqr),
+        'upperfence': min(highest, q3 + 1.5 * iqr),
+        'mean': float(mean),
+        'sd': float(np.sqrt(variance)),
+        'count': int(count),
+    }
@@ -1,19 +1,41 @@
-from dash import Dash, html, dcc, Input, Output, State, dash_table, callback_context
+from dash import Dash, html, dcc, Input, Output, State, dash_table, callback_context, DiskcacheManager
 import dash
+import logging
+import os
 from .attendance import get_attendance_layout, register_attendance_callbacks
 from .marks import get_marks_layout, register_marks_callbacks
+from .upload_cache import store_upload, get_upload, callback_cache
+from .course_data import load_live
 import dash_bootstrap_components as dbc
-import base64
+
+logger = logging.getLogger(__name__)
+
+# Set by run_Analytics.py --prod (or in the environment of a WSGI server)
+PRODUCTION = os.getenv("ANALYTICS_ENV") == "production"
+
+# CSS/fonts bundled by bundle_assets.py are served from assets/ automatically;
+# fall back to the CDNs when they have not been bundled
+VENDOR_ASSETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "vendor")
+if os.path.isdir(VENDOR_ASSETS):
+    external_stylesheets = []
+else:
+    external_stylesheets = [
+        dbc.themes.BOOTSTRAP,
+        "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css",
+        "https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap"
+    ]
+
+# Heavy dashboard callbacks run in background processes so one large file
+# does not block the worker for every other user
+background_callback_manager = DiskcacheManager(callback_cache)
 
 # Initialize Dash App
 app = Dash(
     __name__, 
     suppress_callback_exceptions=True,
-    external_stylesheets=[
-        dbc.themes.BOOTSTRAP,
-        "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css",
-        "https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap"
-    ],
+    background_callback_manager=background_callback_manager,
+    external_stylesheets=external_stylesheets,
+    compress=PRODUCTION,
     meta_tags=[
         {"name": "viewport", "content": "width=device-width, initial-scale=1"}
     ]
@@ -43,8 +65,6 @@ app.index_string = '''
                 color: #334155;
             }
         </style>
-        <link href="https://fonts.googleapis.com/css2?family=Inter:wght=300;400;500;600;700&display=swap" rel="stylesheet">
-        <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css">
     </head>
     <body>
         {%app_entry%}
@@ -65,10 +85,10 @@ app.layout = html.Div([
     # Global download component (for both modules)
     dcc.Download(id="global-download-data"),
     
-    # Store for attendance data
+    # Store for attendance upload key (parsed frame stays server-side)
     dcc.Store(id='attendance-upload-store'),
     
-    # Store for marks data  
+    # Store for marks upload key (parsed frame stays server-side)
     dcc.Store(id='marks-upload-store'),
 ])
 
@@ -165,47 +185,66 @@ def handle_global_download(attendance_clicks, marks_clicks, attendance_data, mar
     button_id = ctx.triggered[0]['prop_id'].split('.')[0]
     
     if button_id == "attendance-download-btn" and attendance_data:
-        # Decode base64 data
-        decoded = base64.b64decode(attendance_data)
-        return dict(
-            content=decoded,
-            filename="attendance_data.csv"
-        )
+        df = get_upload(attendance_data)
+        if df is not None:
+            return dcc.send_data_frame(df.to_csv, "attendance_data.csv", index=False)
     elif button_id == "marks-download-btn" and marks_data:
-        # Decode base64 data
-        decoded = base64.b64decode(marks_data)
-        return dict(
-            content=decoded,
-            filename="marks_data.csv"
-        )
+        df = get_upload(marks_data)
+        if df is not None:
+            return dcc.send_data_frame(df.to_csv, "marks_data.csv", index=False)
     
     return dash.no_update
 
-# Store attendance upload data
+def resolve_store(kind, contents, filename, course, current):
+    """Store value for an upload or a live course pick; no_update when nothing changed"""
+    ctx = callback_context
+    trigger = ctx.triggered[0]['prop_id'].split('.')[0] if ctx.triggered else ''
+    
+    if trigger == f'{kind}-upload' and contents is not None:
+        try:
+            return store_upload(contents, filename)
+        except Exception as e:
+            # Shown in the upload status by the dashboard callback (see get_cube)
+            names = ', '.join(filename) if isinstance(filename, list) else filename
+            return {'key': None, 'filename': names, 'error': f"Could not read {names}: {e}"}
+    
+    # Interval ticks only refresh a live course that is currently shown
+    if trigger == f'{kind}-live-interval' and (not current or current.get('course') != course):
+        return dash.no_update
+    
+    if course and trigger in (f'{kind}-course-picker', f'{kind}-live-interval'):
+        try:
+            data = load_live(kind, course)
+        except Exception as e:
+            logger.warning("Error loading live %s data for %s: %s", kind, course, e)
+            return dash.no_update
+        return data if data != current else dash.no_update
+    
+    return dash.no_update
+
+# Store attendance upload / live course: parse once, keep only the cache key in the browser
 @app.callback(
     Output('attendance-upload-store', 'data'),
-    [Input('attendance-upload', 'contents')]
+    [Input('attendance-upload', 'contents'),
+     Input('attendance-course-picker', 'value'),
+     Input('attendance-live-interval', 'n_intervals')],
+    [State('attendance-upload', 'filename'),
+     State('attendance-upload-store', 'data')]
 )
-def store_attendance_data(contents):
-    if contents is None:
-        return None
-    
-    # Extract just the base64 part
-    content_type, content_string = contents.split(',')
-    return content_string
+def store_attendance_data(contents, course, n_intervals, filename, current):
+    return resolve_store('attendance', contents, filename, course, current)
 
-# Store marks upload data
+# Store marks upload / live course: parse once, keep only the cache key in the browser
 @app.callback(
     Output('marks-upload-store', 'data'),
-    [Input('marks-upload', 'contents')]
+    [Input('marks-upload', 'contents'),
+     Input('marks-course-picker', 'value'),
+     Input('marks-live-interval', 'n_intervals')],
+    [State('marks-upload', 'filename'),
+     State('marks-upload-store', 'data')]
 )
-def store_marks_data(contents):
-    if contents is None:
-        return None
-    
-    # Extract just the base64 part
-    content_type, content_string = contents.split(',')
-    return content_string
+def store_marks_data(contents, course, n_intervals, filename, current):
+    return resolve_store('marks', contents, filename, course, current)
 
 # Register Callbacks (remove download callbacks from modules)
 register_attendance_callbacks(app)
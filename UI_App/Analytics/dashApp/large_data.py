@@ -0,0 +1,91 @@
+import os
+
+import numpy as np
+import plotly.graph_objects as go
+
+# Above this many points a trend switches to WebGL and is downsampled
+LARGE_TREND_POINTS = int(os.getenv("DASH_LARGE_TREND_POINTS", "1000"))
+# Points kept after LTTB downsampling
+MAX_TREND_POINTS = int(os.getenv("DASH_MAX_TREND_POINTS", "500"))
+
+
+def is_large(n_points):
+    return n_points > LARGE_TREND_POINTS
+
+
+def lttb(x, y, threshold=MAX_TREND_POINTS):
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+    Returns the indices of the points to keep (first and last always kept).
+    `x` must be numeric and sorted ascending.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    keep = np.empty(threshold, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    bucket_size = (n - 2) / (threshold - 2)
+    selected = 0
+
+    for i in range(threshold - 2):
+        start = int(np.floor(i * bucket_size)) + 1
+        end = int(np.floor((i + 1) * bucket_size)) + 1
+
+        # Average of the next bucket is the third triangle vertex
+        next_start, next_end = end, min(int(np.floor((i + 2) * bucket_size)) + 1, n)
+        if next_start >= next_end:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        ax, ay = x[selected], y[selected]
+        areas = np.abs((ax - avg_x) * (y[start:end] - ay) - (ax - x[start:end]) * (avg_y - ay))
+        selected = start + int(np.argmax(areas))
+        keep[i + 1] = selected
+
+    return keep
+
+
+def trend_traces(dates, counts, color, name):
+    """
+    Area + line traces for a date trend. Small series keep the SVG spline look;
+    large ones use Scattergl on an LTTB-downsampled series so the figure JSON
+    stays bounded regardless of how many dates the file covers.
+    """
+    dates = np.asarray(dates)
+    counts = np.asarray(counts)
+    large = is_large(len(dates))
+
+    if large:
+        idx = lttb(dates.astype('datetime64[ns]').astype(np.int64), counts)
+        dates, counts = dates[idx], counts[idx]
+
+    scatter = go.Scattergl if large else go.Scatter
+    line = dict(color=color, width=2 if large else 4, shape='linear' if large else 'spline')
+    marker = dict(size=4, color=color) if large else dict(size=10, color='white', line=dict(width=3, color=color))
+
+    return [
+        # Area fill
+        scatter(
+            x=dates,
+            y=counts,
+            fill='tozeroy',
+            fillcolor='rgba(59, 130, 246, 0.15)',
+            line=dict(color='rgba(0,0,0,0)'),
+            showlegend=False,
+            hoverinfo='skip'
+        ),
+        # Main line
+        scatter(
+            x=dates,
+            y=counts,
+            mode='lines' if large else 'lines+markers',
+            name=name,
+            line=line,
+            marker=marker,
+            hovertemplate=f'<b>%{{x|%b %d, %Y}}</b><br>{name}: %{{y}}<extra></extra>'
+        ),
+    ]
@@ -3,8 +3,9 @@ import pandas as pd
 from dash import dcc, html, Input, Output, State
 import plotly.express as px
 import plotly.graph_objects as go
-import io
-import base64
+from .upload_cache import get_cube, get_upload
+from .cubes import build_marks_cube, filter_marks, box_stats
+from .course_data import list_courses, LIVE_TTL
 import json
 
 # --- LAYOUT DEFINITION ---
@@ -16,9 +17,23 @@ def get_marks_layout():
             html.Div([
                 html.H1("🎓 Marks & Results Analytics Dashboard", 
                         style={'fontSize': '32px', 'fontWeight': '800', 'color': '#0f172a', 'marginBottom': '8px', 'letterSpacing': '-0.02em'}),
-                html.P("Upload your CSV file to visualize grade distribution, performance metrics & insights.", 
+                html.P("Upload your CSV or Excel files to visualize grade distribution, performance metrics & insights.", 
                        style={'color': '#64748b', 'marginBottom': '24px', 'fontSize': '15px'}),
                 
+                # Live mode: pull the course straight from the API instead of a CSV
+                html.Div([
+                    html.Span("Load a course live", 
+                              style={'fontSize': '14px', 'fontWeight': '600', 'color': '#475569', 'whiteSpace': 'nowrap'}),
+                    dcc.Dropdown(
+                        id='marks-course-picker',
+                        options=[],
+                        placeholder="Select a course...",
+                        clearable=True,
+                        style={'flex': '1'}
+                    ),
+                    dcc.Interval(id='marks-live-interval', interval=LIVE_TTL * 1000)
+                ], style={'display': 'flex', 'alignItems': 'center', 'gap': '12px', 'marginBottom': '20px'}),
+                
                 dcc.Upload(
                     id='marks-upload',
                     children=html.Div([
@@ -26,7 +41,7 @@ def get_marks_layout():
                                style={'fontSize': '48px', 'color': '#7c3aed', 'marginBottom': '16px'}),
                         html.H3("Drop your marks file here", 
                                style={'fontSize': '20px', 'fontWeight': '700', 'color': '#1e293b', 'marginBottom': '8px'}),
-                        html.P("Supports CSV files with columns: name, grade, status, total_marks, gpa, section", 
+                        html.P("CSV or Excel files with columns: name, grade, status, total_marks, gpa, section (select several to combine)", 
                                style={'color': '#94a3b8', 'fontSize': '14px', 'marginBottom': '20px'}),
                         html.Button(
                             "Browse Files",
@@ -44,9 +59,17 @@ def get_marks_layout():
                         'textAlign': 'center', 'cursor': 'pointer', 'background': 'white',
                         'transition': 'all 0.3s ease', 'boxShadow': '0 4px 20px rgba(0,0,0,0.04)'
                     },
-                    multiple=False
+                    accept='.csv,.xlsx,.xls',
+                    multiple=True
                 ),
-                html.Div(id='marks-upload-status', style={'marginTop': '20px'})
+                html.Div(id='marks-upload-status', style={'marginTop': '20px'}),
+                html.Div(
+                    html.Progress(id='marks-progress', value='0', max='100',
+                                  style={'width': '100%', 'height': '8px', 'accentColor': '#7c3aed'}),
+                    id='marks-progress-wrap', style={'display': 'none', 'marginTop': '16px'}
+                ),
+                # Upload whose cube has been built (filters are answered from it)
+                dcc.Store(id='marks-cube-store')
             ], style={
                 'background': 'white', 
                 'borderRadius': '20px', 
@@ -56,6 +79,14 @@ def get_marks_layout():
             })
         ], style={'marginBottom': '28px'}),
         
+        # Filters (answered from the precomputed cube)
+        html.Div([
+            dcc.Dropdown(id='marks-section-filter', multi=True, placeholder="All sections",
+                         style={'flex': '1', 'minWidth': '220px'}),
+            dcc.Dropdown(id='marks-grade-filter', multi=True, placeholder="All grades",
+                         style={'flex': '1', 'minWidth': '220px'})
+        ], style={'display': 'flex', 'gap': '16px', 'alignItems': 'center', 'flexWrap': 'wrap', 'marginBottom': '28px'}),
+        
         # 2. KPI Cards Section
         html.Div(id='marks-kpi-container', 
                 style={
@@ -276,6 +307,45 @@ def apply_marks_chart_styling(fig, height=320):
 # --- CALLBACKS ---
 def register_marks_callbacks(app):
     
+    # Filled after the page renders, so a slow or unreachable API never delays it
+    @app.callback(
+        Output('marks-course-picker', 'options'),
+        Input('marks-live-interval', 'n_intervals')
+    )
+    def load_course_options(n_intervals):
+        return [{'label': c, 'value': c} for c in list_courses()]
+    
+    # Building the cube scans every row: run it in the background, once per upload
+    @app.callback(
+        [Output('marks-cube-store', 'data'),
+         Output('marks-section-filter', 'options'),
+         Output('marks-grade-filter', 'options')],
+        Input('marks-upload-store', 'data'),
+        background=True,
+        running=[(Output('marks-progress-wrap', 'style'),
+                  {'display': 'block', 'marginTop': '16px'},
+                  {'display': 'none'})],
+        progress=[Output('marks-progress', 'value'), Output('marks-progress', 'max')],
+        cancel=[Input('marks-upload', 'contents')]
+    )
+    def build_marks_dashboard_cube(set_progress, upload):
+        if upload is None:
+            return None, [], []
+        set_progress(("10", "100"))
+        try:
+            cube = get_cube(upload, 'marks', build_marks_cube)
+            if cube is None:
+                raise ValueError("Upload expired from the server cache, please upload the file again")
+        except Exception as e:
+            return {'error': str(e)}, [], []
+        set_progress(("100", "100"))
+        if 'error' in cube:
+            return {'error': cube['error']}, [], []
+        section_options = [{'label': sec, 'value': sec} for sec in cube['sections']] if cube['has_section'] else []
+        grade_options = [{'label': g, 'value': g} for g in cube['grades']]
+        return upload, section_options, grade_options
+    
+    # Filter changes only slice the cached cube, so they are answered in the request
     @app.callback(
         [Output('marks-upload-status', 'children'),
          Output('marks-kpi-container', 'children'),
@@ -284,11 +354,12 @@ def register_marks_callbacks(app):
          Output('marks-section-box', 'figure'),
          Output('marks-summary-table', 'children'),
          Output('marks-charts-container', 'className')],
-        [Input('marks-upload', 'contents')],
-        [State('marks-upload', 'filename')]
+        [Input('marks-cube-store', 'data'),
+         Input('marks-section-filter', 'value'),
+         Input('marks-grade-filter', 'value')]
     )
-    def update_marks_dashboard(contents, filename):
-        if contents is None:
+    def update_marks_dashboard(upload, sections, grades):
+        if upload is None:
             return (
                 html.Div("📁 Upload a CSV file to begin analysis", 
                         style={'color': '#64748b', 'textAlign': 'center', 'padding': '12px', 'fontSize': '15px'}),
@@ -296,21 +367,17 @@ def register_marks_callbacks(app):
             )
 
         try:
-            content_type, content_string = contents.split(',')
-            decoded = base64.b64decode(content_string)
-            try:
-                df = pd.read_csv(io.StringIO(decoded.decode('utf-8')))
-            except:
-                df = pd.read_csv(io.StringIO(decoded.decode('latin-1')))
-            
-            df.columns = [str(col).strip().lower().replace(' ', '_') for col in df.columns]
+            filename = upload.get('filename')
+            cube = upload if 'error' in upload else get_cube(upload, 'marks', build_marks_cube)
+            if cube is None:
+                raise ValueError("Upload expired from the server cache, please upload the file again")
             
             # Validate required columns
-            if 'status' not in df.columns or 'grade' not in df.columns:
+            if 'error' in cube:
                 return (
                     html.Div([
                         html.I(className="fa-solid fa-triangle-exclamation", style={'marginRight': '10px'}),
-                        " Error: CSV must contain 'status' and 'grade' columns"
+                        f" Error: {cube['error']}"
                     ], style={
                         'background': '#fef2f2', 
                         'color': '#dc2626', 
@@ -323,26 +390,18 @@ def register_marks_callbacks(app):
                     [], {}, {}, {}, html.Div(), "hidden"
                 )
             
-            # Clean data
-            df['status'] = df['status'].astype(str).str.strip().str.title()
-            df['grade'] = df['grade'].astype(str).str.strip().str.upper()
-            
-            # Handle total_marks column
-            if 'total_marks' in df.columns:
-                df['total_marks'] = pd.to_numeric(df['total_marks'], errors='coerce').fillna(0)
-            else:
-                df['total_marks'] = 0
+            cells = filter_marks(cube, sections, grades)
+            status_counts = cells.groupby('status', observed=True)['count'].sum().sort_values(ascending=False)
             
             # KPI Calculations
-            total_students = len(df)
-            avg_marks = round(df['total_marks'].mean(), 1) if 'total_marks' in df.columns else 0
-            pass_count = len(df[df['status'] == 'Pass'])
+            total_students = int(cells['count'].sum())
+            avg_marks = round(cells['sum_marks'].sum() / total_students, 1) if total_students > 0 else 0
+            pass_count = int(status_counts.get('Pass', 0))
             pass_rate = round((pass_count / total_students) * 100, 1) if total_students > 0 else 0
             
             # Get GPA if available
-            if 'gpa' in df.columns:
-                df['gpa'] = pd.to_numeric(df['gpa'], errors='coerce').fillna(0)
-                avg_gpa = round(df['gpa'].mean(), 2)
+            if cube['has_gpa'] and total_students > 0:
+                avg_gpa = round(cells['sum_gpa'].sum() / total_students, 2)
             else:
                 avg_gpa = 0
             
@@ -355,7 +414,7 @@ def register_marks_callbacks(app):
             
             # Chart 1: Grade Distribution Bar Chart
             grade_order = ['A+', 'A', 'A-', 'B+', 'B', 'B-', 'C+', 'C', 'D', 'F']
-            grade_counts = df['grade'].value_counts().reindex(grade_order, fill_value=0)
+            grade_counts = cells.groupby('grade', observed=True)['count'].sum().rename(index=str).reindex(grade_order, fill_value=0)
             
             grade_colors = {
                 'A+': '#10b981', 'A': '#34d399', 'A-': '#6ee7b7',
@@ -378,7 +437,6 @@ def register_marks_callbacks(app):
             bar_fig = apply_marks_chart_styling(bar_fig, height=320)
             
             # Chart 2: Pass/Fail Pie Chart
-            status_counts = df['status'].value_counts()
             pie_colors = {'Pass': '#10b981', 'Fail': '#ef4444'}
             
             pie_fig = go.Figure(data=[go.Pie(
@@ -407,19 +465,21 @@ def register_marks_callbacks(app):
             pie_fig = apply_marks_chart_styling(pie_fig, height=320)
             
             # Chart 3: Section-wise Performance Box Plot
-            if 'section' in df.columns:
-                sections = sorted(df['section'].unique())
+            if cube['has_section']:
                 box_colors = ['#7c3aed', '#3b82f6', '#10b981', '#f59e0b', '#ec4899', '#8b5cf6']
                 
+                # Precomputed box statistics per section instead of raw points
                 box_fig = go.Figure()
-                for i, section in enumerate(sections):
-                    section_data = df[df['section'] == section]['total_marks']
+                for i, (section, section_cells) in enumerate(cells.groupby('section', sort=True, observed=True)):
+                    stats = box_stats(section_cells)
                     box_fig.add_trace(go.Box(
-                        y=section_data,
+                        x=[str(section)],
+                        q1=[stats['q1']], median=[stats['median']], q3=[stats['q3']],
+                        lowerfence=[stats['lowerfence']], upperfence=[stats['upperfence']],
+                        mean=[stats['mean']], sd=[stats['sd']],
                         name=str(section),
                         marker=dict(color=box_colors[i % len(box_colors)]),
-                        boxmean='sd',
-                        hovertemplate='<b>%{fullData.name}</b><br>Marks: %{y}<extra></extra>'
+                        boxmean='sd'
                     ))
                 
                 box_fig = apply_marks_chart_styling(box_fig, height=360)
@@ -439,12 +499,13 @@ def register_marks_callbacks(app):
                 )
             
             # Summary Table
-            top_performer = df.loc[df['total_marks'].idxmax()]['name'] if 'name' in df.columns else "N/A"
-            highest_marks = df['total_marks'].max()
-            lowest_marks = df['total_marks'].min()
+            top_performer = cells.loc[cells['max_marks'].idxmax(), 'top_name'] if cube['has_name'] and total_students > 0 else "N/A"
+            highest_marks = cells['max_marks'].max()
+            lowest_marks = cells['min_marks'].min()
             
             # Get most common grade
-            most_common_grade = df['grade'].mode()[0] if len(df['grade'].mode()) > 0 else "N/A"
+            grade_totals = cells.groupby('grade', observed=True)['count'].sum()
+            most_common_grade = grade_totals.idxmax() if len(grade_totals) > 0 else "N/A"
             
             summary_data = [
                 ('Total Students', f"{total_students:,}", '#7c3aed'),
@@ -512,7 +573,7 @@ def register_marks_callbacks(app):
                 'alignItems': 'center'
             })
             
-            return msg, kpis, bar_fig, pie_fig, box_fig, summary_html, ""
+            return (msg, kpis, bar_fig, pie_fig, box_fig, summary_html, "")
             
         except Exception as e:
             return (
@@ -534,12 +595,11 @@ def register_marks_callbacks(app):
     @app.callback(
         Output("marks-download-data", "data"),
         Input("marks-download-btn", "n_clicks"),
-        State('marks-upload', 'contents'),
+        State('marks-upload-store', 'data'),
         prevent_initial_call=True
     )
-    def download_marks_data(n_clicks, contents):
-        if contents is None:
+    def download_marks_data(n_clicks, upload):
+        df = get_upload(upload)
+        if df is None:
             return dash.no_update
-        content_type, content_string = contents.split(',')
-        decoded = base64.b64decode(content_string)
-        return dict(content=decoded, filename="marks_analysis.csv")
\ No newline at end of file
+        return dcc.send_data_frame(df.to_csv, "marks_analysis.csv", index=False)
\ No newline at end of file
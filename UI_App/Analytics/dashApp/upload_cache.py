@@ -0,0 +1,197 @@
+import base64
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import diskcache
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# How many parsed uploads to keep in memory (oldest are evicted first)
+MAX_CACHED_UPLOADS = int(os.getenv("DASH_UPLOAD_CACHE_SIZE", "16"))
+
+# On-disk cache shared by every process (background callback workers included)
+CACHE_DIR = os.getenv(
+    "DASH_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".dash_cache")
+)
+DISK_CACHE_BYTES = int(os.getenv("DASH_DISK_CACHE_MB", "1024")) * 1024 * 1024
+
+# Parsed uploads (LRU eviction once the size limit is hit)
+disk_cache = diskcache.Cache(
+    os.path.join(CACHE_DIR, "uploads"),
+    size_limit=DISK_CACHE_BYTES,
+    eviction_policy="least-recently-used"
+)
+# Background callback jobs and results
+callback_cache = diskcache.Cache(os.path.join(CACHE_DIR, "callbacks"))
+
+
+class UploadCache:
+    """
+    Thread-safe LRU of parsed upload DataFrames keyed by content hash.
+    Backed by a shared disk cache so other processes can read the same upload.
+    """
+
+    def __init__(self, max_entries=MAX_CACHED_UPLOADS, disk=None):
+        self.max_entries = max_entries
+        self.disk = disk
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            df = self._frames.get(key)
+            if df is not None:
+                self._frames.move_to_end(key)
+                return df
+
+        if self.disk is None:
+            return None
+        df = self.disk.get(key)
+        if df is not None:
+            self._remember(key, df)
+        return df
+
+    def put(self, key, df):
+        if self.disk is not None:
+            self.disk.set(key, df)
+        self._remember(key, df)
+
+    def _remember(self, key, df):
+        with self._lock:
+            self._frames[key] = df
+            self._frames.move_to_end(key)
+            while len(self._frames) > self.max_entries:
+                self._frames.popitem(last=False)
+
+    def __contains__(self, key):
+        with self._lock:
+            if key in self._frames:
+                return True
+        return self.disk is not None and key in self.disk
+
+
+cache = UploadCache(disk=disk_cache)
+
+
+# Low-cardinality label columns kept as categoricals: column -> case normaliser
+CATEGORICAL_COLUMNS = {'status': 'title', 'section': None, 'grade': 'upper'}
+
+
+def read_csv_bytes(decoded):
+    """CSV bytes -> DataFrame; pyarrow engine when available, utf-8/latin-1 fallback otherwise"""
+    try:
+        return pd.read_csv(io.BytesIO(decoded), engine='pyarrow')
+    except Exception:
+        # pyarrow missing, or a file it cannot handle (encoding, ragged rows)
+        pass
+    try:
+        return pd.read_csv(io.StringIO(decoded.decode('utf-8')))
+    except:
+        return pd.read_csv(io.StringIO(decoded.decode('latin-1')))
+
+
+def read_excel_bytes(decoded):
+    """XLSX/XLS bytes -> DataFrame; calamine (Rust) reader when available"""
+    try:
+        return pd.read_excel(io.BytesIO(decoded), engine='calamine')
+    except (ImportError, ValueError):
+        return pd.read_excel(io.BytesIO(decoded))
+
+
+def normalise_frame(df):
+    """Normalise column names and turn label columns into categoricals"""
+    df.columns = [str(col).strip().lower().replace(' ', '_') for col in df.columns]
+    for col, case in CATEGORICAL_COLUMNS.items():
+        if col in df.columns:
+            # "string" keeps missing cells missing (astype(str) would make a "nan" label)
+            values = df[col].astype('string').str.strip()
+            values = values.mask(values == '')
+            if case:
+                values = getattr(values.str, case)()
+            df[col] = values.astype('category')
+    return df
+
+
+def parse_file_bytes(decoded, filename):
+    if str(filename).lower().endswith(('.xlsx', '.xls')):
+        df = read_excel_bytes(decoded)
+    else:
+        df = read_csv_bytes(decoded)
+    return normalise_frame(df)
+
+
+def combine_frames(frames):
+    """Concatenate per-file frames, aligning categories so label columns stay categorical"""
+    if len(frames) == 1:
+        return frames[0]
+    frames = [f.copy() for f in frames]
+    for col in CATEGORICAL_COLUMNS:
+        parts = [f[col] for f in frames if col in f.columns]
+        if len(parts) == len(frames):
+            categories = union_categoricals([p.cat.as_unordered() for p in parts]).categories
+            for f in frames:
+                f[col] = f[col].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
+
+
+def store_upload(contents, filename):
+    """
+    Parse dcc.Upload `contents` (one file or a list of CSV/XLSX files) once and
+    keep the combined frame server-side. Each file is cached under its own hash,
+    so adding a file to a selection only parses the new one.
+    Returns the small dict that goes into dcc.Store.
+    """
+    if isinstance(contents, str):
+        contents, filename = [contents], [filename]
+
+    file_keys = []
+    for item, name in zip(contents, filename):
+        content_type, content_string = item.split(',')
+        decoded = base64.b64decode(content_string)
+        file_key = hashlib.sha256(decoded).hexdigest()
+        if file_key not in cache:
+            cache.put(file_key, parse_file_bytes(decoded, name))
+        file_keys.append(file_key)
+
+    if len(file_keys) == 1:
+        key = file_keys[0]
+    else:
+        key = hashlib.sha256(":".join(file_keys).encode()).hexdigest()
+        if key not in cache:
+            cache.put(key, combine_frames([cache.get(k) for k in file_keys]))
+
+    label = filename[0] if len(filename) == 1 else f"{len(filename)} files ({', '.join(filename)})"
+    return {'key': key, 'filename': label}
+
+
+def get_upload(store_data):
+    """Copy of the cached frame for a dcc.Store value, or None if it was evicted"""
+    if not store_data:
+        return None
+    df = cache.get(store_data.get('key'))
+    return df.copy() if df is not None else None
+
+
+def get_cube(store_data, name, build):
+    """
+    Aggregation cube for an upload, built once from the cached frame and then
+    cached alongside it under "<upload key>:<name>".
+    """
+    if not store_data:
+        return None
+    if store_data.get('error'):
+        # The upload could not be parsed (see home.resolve_store)
+        raise ValueError(store_data['error'])
+    key = f"{store_data.get('key')}:{name}"
+    cube = cache.get(key)
+    if cube is None:
+        df = get_upload(store_data)
+        if df is None:
+            return None
+        cube = build(df)
+        cache.put(key, cube)
+    return cube
@@ -0,0 +1,36 @@
+# Run from UI_App/Analytics: python -m pytest tests
+import pandas as pd
+
+from dashApp.cubes import box_stats, build_marks_cube, filter_marks
+from dashApp.upload_cache import normalise_frame
+
+
+def _marks_frame():
+    return normalise_frame(pd.DataFrame({
+        'name': ['a', 'b', 'c', 'd'],
+        'section': ['A', '', 'B', 'A'],
+        'grade': ['A', 'B', '', 'A'],
+        'status': ['Pass', 'Pass', '', 'Fail'],
+        'total_marks': [90, 70, 50, 30],
+        'gpa': [4, 3, 2, 1],
+    }))
+
+
+def test_marks_cube_counts_rows_with_missing_labels():
+    cube = build_marks_cube(_marks_frame())
+    cells = filter_marks(cube)
+
+    assert cells['count'].sum() == 4
+    assert box_stats(cells)['count'] == 4
+    assert cells.loc[cells['max_marks'].idxmax(), 'top_name'] == 'a'
+    # Missing labels are not filter options
+    assert cube['sections'] == ['A', 'B']
+    assert cube['grades'] == ['A', 'B']
+
+
+def test_marks_cube_sketches_match_their_cells():
+    cells = build_marks_cube(_marks_frame())['cells']
+
+    for sketch, lowest, highest in zip(cells['sketch'], cells['min_marks'], cells['max_marks']):
+        assert sketch[0] == lowest
+        assert sketch[-1] == highest
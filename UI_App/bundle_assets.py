@@ -0,0 +1,60 @@
+"""
+Download the dashboard's CSS and fonts into Analytics/dashApp/assets/vendor so
+production pages are served locally instead of hitting external CDNs.
+
+Run once per deploy (before run_Analytics.py --prod):
+    python bundle_assets.py
+"""
+import os
+import re
+from urllib.parse import urljoin
+
+import requests
+import dash_bootstrap_components as dbc
+
+VENDOR_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Analytics", "dashApp", "assets", "vendor")
+
+FONT_AWESOME = "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css"
+INTER = "https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap"
+# Google Fonts only serves woff2 to modern browsers
+BROWSER_UA = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+
+URL_PATTERN = re.compile(r"url\((['\"]?)([^)'\"]+)\1\)")
+
+
+def fetch(url):
+    resp = requests.get(url, headers={"User-Agent": BROWSER_UA}, timeout=60)
+    resp.raise_for_status()
+    return resp
+
+
+def bundle_stylesheet(url, name):
+    """Save a stylesheet and every file it references under vendor/<name>/"""
+    target = os.path.join(VENDOR_DIR, name)
+    os.makedirs(os.path.join(target, "files"), exist_ok=True)
+    css = fetch(url).text
+
+    def localise(match):
+        ref = match.group(2)
+        if ref.startswith("data:"):
+            return match.group(0)
+        filename = os.path.basename(ref.split("?")[0].split("#")[0])
+        with open(os.path.join(target, "files", filename), "wb") as f:
+            f.write(fetch(urljoin(url, ref)).content)
+        return f"url(files/{filename})"
+
+    css = URL_PATTERN.sub(localise, css)
+    with open(os.path.join(target, f"{name}.css"), "w", encoding="utf-8") as f:
+        f.write(css)
+    print(f"Bundled {name} -> {target}")
+
+
+def main():
+    # Dash loads assets/*.css alphabetically, so prefix to keep bootstrap first
+    bundle_stylesheet(dbc.themes.BOOTSTRAP, "0-bootstrap")
+    bundle_stylesheet(FONT_AWESOME, "1-fontawesome")
+    bundle_stylesheet(INTER, "2-inter")
+
+
+if __name__ == "__main__":
+    main()
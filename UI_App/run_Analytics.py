@@ -1,7 +1,48 @@
-from Analytics.dashApp.home import app
+import argparse
+import multiprocessing
+import os
+
+
+def serve_production(port, workers):
+    """Multi-worker gunicorn server; workers share uploads/jobs through the disk cache"""
+    from gunicorn.app.base import BaseApplication
+
+    class AnalyticsServer(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from Analytics.dashApp.home import app
+            return app.server
+
+    AnalyticsServer({
+        "bind": f"0.0.0.0:{port}",
+        "workers": workers,
+        "timeout": 120,
+        "accesslog": "-",
+    }).run()
+
 
 if __name__ == "__main__":
-    app.run(
-        debug=True,
-        port=8050
-    )
+    parser = argparse.ArgumentParser(description="Student Analytics Dashboard")
+    parser.add_argument("--prod", action="store_true",
+                        help="serve with gunicorn workers, debug off and compression on")
+    parser.add_argument("--port", type=int, default=int(os.getenv("ANALYTICS_PORT", "8050")))
+    parser.add_argument("--workers", type=int,
+                        default=int(os.getenv("ANALYTICS_WORKERS", str(multiprocessing.cpu_count() * 2 + 1))))
+    args = parser.parse_args()
+
+    if args.prod or os.getenv("ANALYTICS_ENV") == "production":
+        os.environ["ANALYTICS_ENV"] = "production"
+        serve_production(args.port, args.workers)
+    else:
+        from Analytics.dashApp.home import app
+        app.run(
+            debug=True,
+            port=args.port
+        )
@@ -7,7 +7,8 @@ from dotenv import load_dotenv
 load_dotenv("../.env")
 
 # Import routers
-from routers import upload, attendance, marks, student, result, course
+from routers import upload, attendance, marks, student, result, course, metrics, admin, events
+from services.instrumentation import RequestInstrumentationMiddleware
 
 
 app = FastAPI(title="Student Analytics API")
@@ -27,6 +28,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request timing: Server-Timing header + one JSON log line per request
+app.add_middleware(RequestInstrumentationMiddleware)
+
 # Include Routers
 app.include_router(upload.router)
 app.include_router(attendance.router)
@@ -34,6 +38,9 @@ app.include_router(marks.router)
 app.include_router(student.router)
 app.include_router(result.router)
 app.include_router(course.router)
+app.include_router(metrics.router)
+app.include_router(admin.router)
+app.include_router(events.router)
 
 @app.get("/")
 def root():
@@ -0,0 +1,41 @@
+# api/routers/admin.py
+from fastapi import APIRouter, HTTPException
+from services.firebase import get_cost_report, estimate_cost, COST_RATES
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+@router.get("/cost")
+async def get_cost(days: int = 7, course: str = None, limit: int = 100):
+    """
+    Firestore documents read / written / deleted per endpoint, course and day,
+    with an estimated cost. Optional ?course= narrows to one course.
+    """
+    if days < 1 or days > 90:
+        raise HTTPException(status_code=400, detail="days must be between 1 and 90")
+    try:
+        rows = get_cost_report(days, course)
+
+        by_endpoint = {}
+        for row in rows:
+            entry = by_endpoint.setdefault(row["endpoint"], {"read": 0, "write": 0, "delete": 0})
+            for op in entry:
+                entry[op] += row[op]
+        endpoints = sorted(
+            ({"endpoint": endpoint, **counts, "estimated_usd": round(estimate_cost(counts), 6)}
+             for endpoint, counts in by_endpoint.items()),
+            key=lambda e: e["estimated_usd"], reverse=True
+        )
+
+        totals = {op: sum(row[op] for row in rows) for op in ("read", "write", "delete")}
+        return {
+            "days": days,
+            "course": course,
+            "rates_usd_per_100k": COST_RATES,
+            "totals": {**totals, "estimated_usd": round(estimate_cost(totals), 6)},
+            "by_endpoint": endpoints,
+            "rows": rows[:limit]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
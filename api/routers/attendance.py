@@ -1,6 +1,7 @@
 # api/routers/attendance.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from services.firebase import db
+from services import attendance_repo, events, roster_cache, versions
 from fastapi.responses import FileResponse
 import pandas as pd
 import tempfile
@@ -8,6 +9,9 @@ from datetime import datetime
 
 router = APIRouter(prefix="/attendance", tags=["Attendance"])
 
+# Firestore caps a write batch at 500 operations
+MAX_BULK_SESSIONS = 500
+
 @router.post("/mark/{course_code}")
 async def mark_attendance(course_code: str, data: dict):
     """
@@ -26,18 +30,12 @@ async def mark_attendance(course_code: str, data: dict):
         if not date or not attendance_map:
             raise HTTPException(400, "Date and attendance data are required")
         
-        # Save attendance in teacher portal format
-        attendance_ref = db.collection(f"attendance_{course_code}").document(date)
-        
-        attendance_data = {
-            "date": date,
-            "time": time,
-            "course": course_code,
-            "attendance": attendance_map,
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        attendance_ref.set(attendance_data)
+        # Save attendance in the canonical attendance_<course>/<date> layout
+        attendance_data = attendance_repo.build_session(
+            course_code, date, time, attendance_map, timestamp=datetime.now().isoformat()
+        )
+        attendance_repo.save_session(course_code, date, attendance_data)
+        events.session_saved(course_code, date, attendance_data)
         
         return {
             "status": "success",
@@ -48,39 +46,139 @@ async def mark_attendance(course_code: str, data: dict):
     except Exception as e:
         raise HTTPException(500, str(e))
 
+@router.post("/mark-bulk/{course_code}")
+async def mark_attendance_bulk(course_code: str, data: dict):
+    """
+    Save several sessions (make-up classes, lab sections) in one request.
+    Expected payload:
+    {
+        "sessions": [
+            {
+                "date": "2025-02-01",
+                "time": "09:00",
+                "section": "A",
+                "attendance": { "20F-001": "present", "20F-002": "absent" }
+            }
+        ]
+    }
+    Every valid session is written in a single atomic batch.
+    """
+    try:
+        sessions = data.get("sessions", [])
+
+        if not sessions:
+            raise HTTPException(400, "At least one session is required")
+        if len(sessions) > MAX_BULK_SESSIONS:
+            raise HTTPException(400, f"At most {MAX_BULK_SESSIONS} sessions can be saved per request")
+
+        # Roster is read once and reused for every session in the request
+        roster = {doc.id for doc in roster_cache.get_roster(course_code)}
+        if not roster:
+            raise HTTPException(404, "No students found in this course. Please upload student roster first.")
+
+        # Same date/section twice in one request (make-up class) -> keep both by time
+        slot_counts = {}
+        for session in sessions:
+            slot = (session.get("date"), session.get("section") or "")
+            slot_counts[slot] = slot_counts.get(slot, 0) + 1
+
+        outcomes = []
+        seen_ids = set()
+        batch = db.batch()
+        saved = 0
+        saved_sessions = []
+
+        for index, session in enumerate(sessions):
+            date = session.get("date")
+            time = session.get("time", "")
+            section = session.get("section") or ""
+            attendance_map = session.get("attendance", {})
+
+            outcome = {"index": index, "date": date, "time": time, "section": section}
+
+            if not date or not attendance_map:
+                outcomes.append({**outcome, "status": "rejected", "error": "Date and attendance data are required"})
+                continue
+
+            unknown = sorted(rollno for rollno in attendance_map if rollno not in roster)
+            if unknown:
+                outcomes.append({
+                    **outcome,
+                    "status": "rejected",
+                    "error": "Roll numbers not found in course roster",
+                    "unknown_rollnos": unknown
+                })
+                continue
+
+            doc_id = attendance_repo.session_id(date, section, time, slot_counts[(date, section)] > 1)
+            if doc_id in seen_ids:
+                outcomes.append({**outcome, "status": "rejected", "error": f"Duplicate session '{doc_id}' in request"})
+                continue
+            seen_ids.add(doc_id)
+
+            session_data = attendance_repo.build_session(
+                course_code, date, time, attendance_map, section, timestamp=datetime.now().isoformat()
+            )
+            attendance_repo.save_session(course_code, doc_id, session_data, batch=batch)
+            saved_sessions.append((doc_id, session_data))
+            saved += 1
+            outcomes.append({**outcome, "status": "saved", "id": doc_id, "students_marked": len(attendance_map)})
+
+        if saved:
+            batch.commit()
+            versions.bump(course_code, "attendance")
+            for doc_id, session_data in saved_sessions:
+                events.session_saved(course_code, doc_id, session_data)
+
+        return {
+            "status": "success" if saved == len(sessions) else ("partial" if saved else "failed"),
+            "course": course_code,
+            "sessions_saved": saved,
+            "sessions_rejected": len(sessions) - saved,
+            "results": outcomes
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, str(e))
+
 @router.get("/view/{course_code}/{date}")
-async def view_attendance(course_code: str, date: str):
+async def view_attendance(course_code: str, date: str, request: Request, response: Response):
     try:
-        doc = db.collection(f"attendance_{course_code}").document(date).get()
-        if not doc.exists:
+        cond = versions.conditional_get(request, response, course_code, "attendance")
+        if cond.not_modified:
+            return cond.not_modified
+        session = attendance_repo.get_session(course_code, date)
+        if session is None:
             raise HTTPException(404, "No attendance found for this date")
-        return doc.to_dict()
+        return session
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(500, str(e))
 
 @router.get("/dates/{course_code}")
-async def get_dates(course_code: str):
+async def get_dates(course_code: str, request: Request, response: Response):
     try:
-        docs = db.collection(f"attendance_{course_code}").stream()
-        dates = []
-        for doc in docs:
-            dates.append({
-                "date": doc.id,
-                **doc.to_dict()
-            })
-        return dates
+        cond = versions.conditional_get(request, response, course_code, "attendance")
+        if cond.not_modified:
+            return cond.not_modified
+        return attendance_repo.list_sessions(course_code)
     except Exception as e:
         raise HTTPException(500, str(e))
 
 @router.get("/export/{course_code}")
-async def export_attendance(course_code: str):
+async def export_attendance(course_code: str, request: Request, response: Response):
     """
     Export attendance as CSV
     """
     try:
+        cond = versions.conditional_get(request, response, course_code, "attendance", "roster")
+        if cond.not_modified:
+            return cond.not_modified
         # Get attendance records
-        attendance_ref = db.collection(f"attendance_{course_code}")
-        docs = attendance_ref.stream()
+        docs = attendance_repo.stream_sessions(course_code)
         
         rows = []
         for doc in docs:
@@ -103,8 +201,7 @@ async def export_attendance(course_code: str):
             raise HTTPException(404, "No attendance records found")
         
         # Get student details for more informative export
-        students_ref = db.collection(course_code)
-        student_docs = students_ref.stream()
+        student_docs = roster_cache.get_roster(course_code, versions.roster_version(cond.versions))
         
         student_info = {}
         for doc in student_docs:
@@ -138,7 +235,8 @@ async def export_attendance(course_code: str):
         return FileResponse(
             tmp_path,
             filename=filename,
-            media_type='text/csv'
+            media_type='text/csv',
+            headers=cond.headers
         )
         
     except Exception as e:
@@ -1,6 +1,8 @@
 # api/routers/course.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from services.firebase import db, list_all_courses, get_course_info
+from services import attendance_repo, events, result_snapshots, roster_cache, versions
+from services.singleflight import shared
 
 router = APIRouter(prefix="/courses", tags=["Courses"])
 
@@ -10,7 +12,7 @@ async def list_courses():
     Get list of all courses from _courses collection
     """
     try:
-        courses = list_all_courses()
+        courses = await shared(("courses", versions.courses_version()), list_all_courses)
         
         if not courses:
             return []
@@ -43,21 +45,8 @@ async def delete_course(course_code: str):
             student.reference.delete()
             deleted_students += 1
         
-        # Delete attendance records (teacher portal format)
-        attendance_ref = db.collection(f"attendance_{course_code}")
-        attendance_docs = attendance_ref.stream()
-        
-        deleted_attendance = 0
-        for doc in attendance_docs:
-            doc.reference.delete()
-            deleted_attendance += 1
-        
-        # Also delete from attendance logs (student portal format)
-        attendance_logs_ref = db.collection("attendance").document(course_code).collection("logs")
-        attendance_logs_docs = attendance_logs_ref.stream()
-        
-        for doc in attendance_logs_docs:
-            doc.reference.delete()
+        # Delete attendance records (canonical sessions and unmigrated legacy logs)
+        deleted_attendance = attendance_repo.delete_course_attendance(course_code)
         
         # Delete marks (student portal format)
         marks_ref = db.collection("marks").document(course_code).collection("students")
@@ -77,8 +66,15 @@ async def delete_course(course_code: str):
             doc.reference.delete()
             deleted_results += 1
         
+        # Published snapshots would otherwise keep answering lookups
+        result_snapshots.unpublish(course_code)
+        
         # Finally delete from _courses
         db.collection("_courses").document(course_code).delete()
+        versions.bump_courses()
+        # Versions are bumped, not deleted, so old ETags never match a new course
+        versions.bump(course_code, "roster", "marks", "results")
+        events.reload(course_code)
         
         return {
             "status": "deleted",
@@ -96,11 +92,14 @@ async def delete_course(course_code: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{course_code}/info")
-async def get_course_info_endpoint(course_code: str):
+async def get_course_info_endpoint(course_code: str, request: Request, response: Response):
     """
     Get detailed information about a course
     """
     try:
+        cond = versions.conditional_get(request, response, course_code, *versions.KINDS)
+        if cond.not_modified:
+            return cond.not_modified
         # Get course info from _courses
         course_data = get_course_info(course_code)
         
@@ -108,22 +107,19 @@ async def get_course_info_endpoint(course_code: str):
             raise HTTPException(status_code=404, detail=f"Course '{course_code}' not found")
         
         # Count students in course collection
-        students_ref = db.collection(course_code)
-        students_count = len(list(students_ref.stream()))
+        roster = roster_cache.get_roster(course_code, versions.roster_version(cond.versions))
+        students_count = len(roster)
         
-        # Count attendance records (teacher portal)
-        attendance_ref = db.collection(f"attendance_{course_code}")
-        attendance_count = len(list(attendance_ref.stream()))
+        # Count attendance records
+        attendance_count = attendance_repo.count_sessions(course_code)
         
         # Get results count
         results_ref = db.collection(f"results_{course_code}")
         results_count = len(list(results_ref.stream()))
         
         # Get marks count
-        marks_ref = db.collection(course_code)
-        marks_docs = marks_ref.stream()
         marks_count = 0
-        for doc in marks_docs:
+        for doc in roster:
             data = doc.to_dict()
             if any(key in data for key in ['mids_marks', 'finals_marks', 'sessional', 'assignment', 'quiz']):
                 marks_count += 1
@@ -0,0 +1,25 @@
+# api/routers/events.py
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from services import events
+
+router = APIRouter(prefix="/events", tags=["Events"])
+
+@router.get("/{course_code}")
+async def stream_course_events(course_code: str, request: Request):
+    """
+    Server-Sent Events stream of a course's changes (students, marks,
+    attendance sessions). Open it with EventSource before loading the page
+    data, then patch that data with each event; see services/events.py for
+    the event types.
+    """
+    try:
+        subscription, backlog = events.subscribe(course_code, request.headers.get("last-event-id"))
+        return StreamingResponse(
+            events.stream(subscription, backlog),
+            media_type="text/event-stream",
+            # No caching, and no buffering by reverse proxies (nginx)
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    except Exception as e:
+        raise HTTPException(500, str(e))
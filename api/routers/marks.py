@@ -1,6 +1,19 @@
 # api/routers/marks.py
-from fastapi import APIRouter, HTTPException, UploadFile
-from services.firebase import db
+from fastapi import APIRouter, HTTPException, UploadFile, Request, Response
+from services.firebase import (
+    db,
+    firestore,
+    chunked,
+    MARKS_FIELDS,
+    as_field_updates,
+    format_update_time,
+    write_option_for,
+    PreconditionFailed,
+    DocumentNotFound
+)
+from services import events, instrumentation, roster_cache, versions
+from services.metrics import UPLOAD_ROWS
+from services.singleflight import shared
 import pandas as pd
 import tempfile
 from fastapi.responses import FileResponse
@@ -8,19 +21,24 @@ from fastapi.responses import FileResponse
 router = APIRouter(prefix="/marks", tags=["Marks"])
 
 @router.get("/{course_code}")
-async def get_marks_for_course(course_code: str):
+async def get_marks_for_course(course_code: str, request: Request, response: Response):
     """
     Get marks for all students in a course
     """
     try:
-        marks_ref = db.collection(course_code)
-        docs = marks_ref.stream()
+        cond = versions.conditional_get(request, response, course_code, "roster", "marks")
+        if cond.not_modified:
+            return cond.not_modified
+        version = versions.roster_version(cond.versions)
+        docs = await shared(("roster", course_code, version), roster_cache.get_roster, course_code, version)
         
         marks_list = []
         for doc in docs:
             data = doc.to_dict()
             # Check if this document has marks data (not just student info)
             if any(key in data for key in ['mids_marks', 'finals_marks', 'sessional', 'assignment', 'quiz']):
+                # Clients send this back as "update_time" to guard concurrent edits
+                data["update_time"] = format_update_time(doc.update_time)
                 marks_list.append(data)
         
         return marks_list
@@ -32,6 +50,7 @@ async def upload_marks(file: UploadFile, course_code: str):
     """
     Upload marks CSV/Excel file
     """
+    instrumentation.set_course(course_code)
     try:
         # Read file
         if file.filename.endswith(".csv"):
@@ -84,6 +103,11 @@ async def upload_marks(file: UploadFile, course_code: str):
             
             processed += 1
         
+        # Rows for unknown roll numbers create new roster documents
+        versions.bump(course_code, "roster", "marks")
+        events.reload(course_code, "roster", "marks")
+        UPLOAD_ROWS.inc(processed, upload="marks", outcome="ok")
+        
         return {
             "status": "success",
             "students_processed": processed,
@@ -96,10 +120,15 @@ async def upload_marks(file: UploadFile, course_code: str):
 @router.post("/save")
 async def save_marks(data: dict):
     """
-    Save or update marks for a student
+    Save or update marks for a student.
+    Optional "update_time" (from GET /marks/{course_code}) makes the write
+    fail with 409 if someone else changed the record in the meantime.
     """
     try:
+        data = dict(data)
+        update_time = data.pop('update_time', None)
         course_code = data.get('course_code')
+        instrumentation.set_course(course_code)
         rollno = data.get('rollno')
         
         if not course_code or not rollno:
@@ -107,19 +136,38 @@ async def save_marks(data: dict):
         
         marks_ref = db.collection(course_code).document(rollno)
         
-        # Get existing data
-        existing_doc = marks_ref.get()
-        if existing_doc.exists:
-            # Update
-            existing_data = existing_doc.to_dict()
-            existing_data.update(data)
-            marks_ref.set(existing_data)
+        # Single merge write instead of get + full-document set
+        option = write_option_for(update_time)
+        if option:
+            result = marks_ref.update(as_field_updates(data), option=option)
+        else:
+            result = marks_ref.set(data, merge=True)
+        # The merge write creates the student when missing, and name / section...
+        # sent along are roster fields: either way the roster changed too
+        roster_fields = [k for k in data if k not in MARKS_FIELDS and k not in ('course_code', 'rollno')]
+        if option is None or roster_fields:
+            versions.bump(course_code, "roster", "marks")
         else:
-            # Create new
-            marks_ref.set(data)
+            versions.bump(course_code, "marks")
+        events.publish(course_code, "marks", {
+            "op": "saved",
+            "rollno": rollno,
+            "fields": {k: v for k, v in data.items() if k != 'course_code'},
+            "update_time": format_update_time(result.update_time)
+        })
         
-        return {"status": "success", "message": "Marks saved successfully"}
+        return {
+            "status": "success",
+            "message": "Marks saved successfully",
+            "update_time": format_update_time(result.update_time)
+        }
         
+    except HTTPException:
+        raise
+    except PreconditionFailed:
+        raise HTTPException(status_code=409, detail="Marks were changed by someone else. Reload and try again.")
+    except DocumentNotFound:
+        raise HTTPException(status_code=404, detail="Student marks not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -130,6 +178,7 @@ async def update_marks(data: dict):
     """
     try:
         course_code = data.get('course_code')
+        instrumentation.set_course(course_code)
         rollno = data.get('rollno')
         field = data.get('field')
         value = data.get('value')
@@ -138,10 +187,27 @@ async def update_marks(data: dict):
             raise HTTPException(status_code=400, detail="Missing required fields")
         
         marks_ref = db.collection(course_code).document(rollno)
-        marks_ref.update({field: value})
+        result = marks_ref.update(as_field_updates({field: value}), option=write_option_for(data.get('update_time')))
+        versions.bump(course_code, "marks")
+        events.publish(course_code, "marks", {
+            "op": "saved",
+            "rollno": rollno,
+            "fields": {field: value},
+            "update_time": format_update_time(result.update_time)
+        })
         
-        return {"status": "success", "message": "Marks updated successfully"}
+        return {
+            "status": "success",
+            "message": "Marks updated successfully",
+            "update_time": format_update_time(result.update_time)
+        }
         
+    except HTTPException:
+        raise
+    except PreconditionFailed:
+        raise HTTPException(status_code=409, detail="Marks were changed by someone else. Reload and try again.")
+    except DocumentNotFound:
+        raise HTTPException(status_code=404, detail="Student marks not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -152,6 +218,7 @@ async def delete_marks(data: dict):
     """
     try:
         course_code = data.get('course_code')
+        instrumentation.set_course(course_code)
         rollno = data.get('rollno')
         
         if not course_code or not rollno:
@@ -159,36 +226,104 @@ async def delete_marks(data: dict):
         
         marks_ref = db.collection(course_code).document(rollno)
         
-        # Get existing data
-        existing_doc = marks_ref.get()
-        if not existing_doc.exists:
-            raise HTTPException(status_code=404, detail="Student marks not found")
-        
-        # Remove marks fields but keep student info
-        existing_data = existing_doc.to_dict()
-        
-        # Remove marks fields
-        marks_fields = ['mids_marks', 'finals_marks', 'sessional', 'assignment', 'quiz']
-        for field in marks_fields:
-            if field in existing_data:
-                del existing_data[field]
-        
-        # Update document
-        marks_ref.set(existing_data)
+        # Remove marks fields but keep student info (one write, 404 if missing)
+        result = marks_ref.update(
+            {field: firestore.DELETE_FIELD for field in MARKS_FIELDS},
+            option=write_option_for(data.get('update_time'))
+        )
+        versions.bump(course_code, "marks")
+        events.publish(course_code, "marks", {
+            "op": "deleted",
+            "rollno": rollno,
+            "update_time": format_update_time(result.update_time)
+        })
         
-        return {"status": "success", "message": "Marks deleted successfully"}
+        return {
+            "status": "success",
+            "message": "Marks deleted successfully",
+            "update_time": format_update_time(result.update_time)
+        }
         
+    except HTTPException:
+        raise
+    except PreconditionFailed:
+        raise HTTPException(status_code=409, detail="Marks were changed by someone else. Reload and try again.")
+    except DocumentNotFound:
+        raise HTTPException(status_code=404, detail="Student marks not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/clear/{course_code}")
+async def clear_marks(course_code: str, data: dict = None):
+    """
+    Clear marks for a whole course (or only the given students) in one request.
+    Optional payload:
+    {
+        "rollnos": ["20F-001", "20F-002"]
+    }
+    Mark fields are removed with batched field deletes; student info is kept.
+    An empty or malformed "rollnos" is rejected rather than clearing the course.
+    """
+    try:
+        rollnos = (data or {}).get("rollnos")
+        if rollnos is not None and (not isinstance(rollnos, list) or not rollnos):
+            raise HTTPException(status_code=400, detail="rollnos must be a non-empty list of roll numbers")
+        course_ref = db.collection(course_code)
+        not_found = []
+
+        if rollnos is not None:
+            # One round trip for all requested students
+            refs = [course_ref.document(str(r)) for r in dict.fromkeys(rollnos)]
+            docs = db.get_all(refs, field_paths=MARKS_FIELDS)
+        else:
+            docs = course_ref.select(MARKS_FIELDS).stream()
+
+        targets = []
+        for doc in docs:
+            if not doc.exists:
+                not_found.append(doc.id)
+            elif any(key in (doc.to_dict() or {}) for key in MARKS_FIELDS):
+                targets.append(doc.reference)
+
+        clear_fields = {field: firestore.DELETE_FIELD for field in MARKS_FIELDS}
+        cleared = 0
+        for refs in chunked(targets):
+            batch = db.batch()
+            for ref in refs:
+                batch.update(ref, clear_fields)
+            batch.commit()
+            cleared += len(refs)
+        if cleared:
+            versions.bump(course_code, "marks")
+            # A whole-course clear would otherwise list every roll number
+            if rollnos is None:
+                events.publish(course_code, "marks", {"op": "cleared", "all": True})
+            else:
+                events.publish(course_code, "marks", {"op": "cleared", "rollnos": [ref.id for ref in targets]})
+
+        return {
+            "status": "success",
+            "course": course_code,
+            "students_cleared": cleared,
+            "not_found": not_found or None,
+            "message": f"Marks cleared for {cleared} students"
+        }
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/export/{course_code}")
-async def export_marks(course_code: str):
+async def export_marks(course_code: str, request: Request, response: Response):
     """
     Export marks as CSV
     """
     try:
-        marks_ref = db.collection(course_code)
-        docs = marks_ref.stream()
+        cond = versions.conditional_get(request, response, course_code, "roster", "marks")
+        if cond.not_modified:
+            return cond.not_modified
+        docs = roster_cache.get_roster(course_code, versions.roster_version(cond.versions))
         
         rows = []
         for doc in docs:
@@ -208,7 +343,8 @@ async def export_marks(course_code: str):
         return FileResponse(
             tmp_path,
             filename=f"{course_code}_marks.csv",
-            media_type='text/csv'
+            media_type='text/csv',
+            headers=cond.headers
         )
         
     except Exception as e:
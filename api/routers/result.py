@@ -1,9 +1,13 @@
 # api/routers/result.py
-from fastapi import APIRouter, HTTPException
-from services.firebase import db
+from fastapi import APIRouter, HTTPException, Request, Response
+from services.firebase import db, get_results_from_course_collection
+from services import events, result_snapshots, roster_cache, versions
+from services.singleflight import shared
+from services.metrics import RESULT_CALCULATION, RESULT_CALCULATION_STUDENTS
 from fastapi.responses import FileResponse
 import pandas as pd
 import tempfile
+import time
 from datetime import datetime
 
 router = APIRouter(prefix="/results", tags=["Results"])
@@ -118,19 +122,20 @@ def calculate_result(mids_marks=0.0, finals_marks=0.0, sessional=0.0, assignment
 # ============================================
 
 @router.get("/{course_code}")
-async def get_course_results(course_code: str):
+async def get_course_results(course_code: str, request: Request, response: Response):
     """
     Get calculated results for a course
     """
     try:
-        results_ref = db.collection(f"results_{course_code}")
-        docs = results_ref.stream()
+        cond = versions.conditional_get(request, response, course_code, "results")
+        if cond.not_modified:
+            return cond.not_modified
+        rows = await shared(("results", course_code, cond.versions["results"]),
+                            get_results_from_course_collection, course_code)
         
         results = []
-        for doc in docs:
-            result = doc.to_dict()
-            result["id"] = doc.id
-            results.append(result)
+        for doc_id, result in rows:
+            results.append({**result, "id": doc_id})
         
         return results
     except Exception as e:
@@ -141,10 +146,10 @@ async def calculate_course_results(course_code: str):
     """
     Calculate results for all students in a course
     """
+    started = time.perf_counter()
     try:
         # Get students from course collection
-        students_ref = db.collection(course_code)
-        students_docs = students_ref.stream()
+        students_docs = roster_cache.get_roster(course_code)
         
         if not students_docs:
             raise HTTPException(status_code=404, detail=f"No students found in course '{course_code}'")
@@ -195,6 +200,11 @@ async def calculate_course_results(course_code: str):
             results_ref.document(rollno).set(result)
             results.append(result)
         
+        versions.bump(course_code, "results")
+        events.reload(course_code, "results")
+        RESULT_CALCULATION.observe(time.perf_counter() - started)
+        RESULT_CALCULATION_STUDENTS.inc(len(results))
+        
         return {
             "status": "success",
             "course": course_code,
@@ -208,11 +218,14 @@ async def calculate_course_results(course_code: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/export/{course_code}")
-async def export_results(course_code: str):
+async def export_results(course_code: str, request: Request, response: Response):
     """
     Export results as CSV
     """
     try:
+        cond = versions.conditional_get(request, response, course_code, "results")
+        if cond.not_modified:
+            return cond.not_modified
         results_ref = db.collection(f"results_{course_code}")
         docs = results_ref.stream()
         
@@ -235,18 +248,34 @@ async def export_results(course_code: str):
         return FileResponse(
             tmp_path,
             filename=f"{course_code}_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-            media_type='text/csv'
+            media_type='text/csv',
+            headers=cond.headers
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/student/{course_code}/{rollno}")
-async def get_student_result(course_code: str, rollno: str):
+async def get_student_result(course_code: str, rollno: str, request: Request, response: Response):
     """
     Get result for specific student
     """
     try:
+        # Published results are answered from memory until the next publish
+        snapshot, published = result_snapshots.lookup(course_code, rollno)
+        if snapshot is not None:
+            headers = {"ETag": snapshot.etag, "Cache-Control": versions.CACHE_CONTROL}
+            if versions.etag_matches(request.headers.get("if-none-match"), snapshot.etag):
+                return Response(status_code=304, headers=headers)
+            if published is None:
+                raise HTTPException(status_code=404, detail=f"No published result for {rollno} in course {course_code}")
+            response.headers.update(headers)
+            return published
+        
+        # Falls back to the roster document when no result is stored
+        cond = versions.conditional_get(request, response, course_code, "results", "roster", "marks")
+        if cond.not_modified:
+            return cond.not_modified
         result_ref = db.collection(f"results_{course_code}").document(rollno)
         result_doc = result_ref.get()
         
@@ -282,21 +311,54 @@ async def get_student_result(course_code: str, rollno: str):
         
         return result_doc.to_dict()
         
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/publish/{course_code}")
+async def publish_results(course_code: str):
+    """
+    Freeze the calculated results of a course into a published snapshot.
+    /results/student lookups are served from it, in memory on every worker,
+    until the next publish. Recalculating does not change what students see
+    until results are published again.
+    """
+    try:
+        pointer = result_snapshots.publish(course_code)
+        return {"status": "published", **pointer}
+    except LookupError:
+        raise HTTPException(status_code=404, detail="No results found. Calculate results first.")
+    except result_snapshots.SnapshotConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/publish/{course_code}")
+async def unpublish_results(course_code: str):
+    """
+    Withdraw published results; lookups go back to the live results collection
+    """
+    try:
+        removed = result_snapshots.unpublish(course_code)
+        return {"status": "unpublished", "course": course_code, "snapshot_parts_deleted": removed}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{course_code}/stats")
-async def get_course_stats(course_code: str):
+async def get_course_stats(course_code: str, request: Request, response: Response):
     """
     Get statistics for a course
     """
     try:
-        results_ref = db.collection(f"results_{course_code}")
-        docs = results_ref.stream()
+        cond = versions.conditional_get(request, response, course_code, "results")
+        if cond.not_modified:
+            return cond.not_modified
+        # Result release: hundreds of identical requests share one stream
+        rows = await shared(("results", course_code, cond.versions["results"]),
+                            get_results_from_course_collection, course_code)
         
-        results = []
-        for doc in docs:
-            results.append(doc.to_dict())
+        results = [result for _, result in rows]
         
         if not results:
             raise HTTPException(status_code=404, detail="No results found. Calculate results first.")
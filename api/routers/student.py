@@ -1,13 +1,21 @@
 # api/routers/student.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from services.firebase import (
     get_student,
     create_student,
     update_student_enrollments,
+    bulk_enroll_students,
     get_students_by_course,
     get_students_from_course_collection,
+    as_field_updates,
+    format_update_time,
+    write_option_for,
+    PreconditionFailed,
+    DocumentNotFound,
     db  # ADD THIS
 )
+from services import attendance_repo, events, instrumentation, roster_cache, versions
+from services.singleflight import shared
 
 router = APIRouter(prefix="/students", tags=["Students"])
 
@@ -33,10 +41,40 @@ async def enroll_student(rollno: str, course_code: str):
         raise HTTPException(404, "Student not found")
     return {"status": "enrolled"}
 
+@router.post("/enroll-bulk/{course_code}")
+async def enroll_students_bulk(course_code: str, data: dict):
+    """
+    Enroll a cohort in one request.
+    Expected payload:
+    {
+        "rollnos": ["20F-001", "20F-002"]
+    }
+    """
+    rollnos = data.get("rollnos")
+    if not rollnos:
+        raise HTTPException(400, "rollnos list is required")
+
+    try:
+        enrolled, not_found = bulk_enroll_students(rollnos, course_code)
+    except Exception as e:
+        raise HTTPException(500, f"Error enrolling students: {str(e)}")
+
+    return {
+        "status": "enrolled" if not not_found else "partial",
+        "course": course_code,
+        "enrolled": len(enrolled),
+        "not_found": not_found or None
+    }
+
 @router.get("/by-course/{course_code}")
-async def fetch_by_course(course_code: str):
+async def fetch_by_course(course_code: str, request: Request, response: Response):
     """Get students from course-specific collection (for teacher portal)"""
-    students = get_students_from_course_collection(course_code)
+    cond = versions.conditional_get(request, response, course_code, "roster", "marks")
+    if cond.not_modified:
+        return cond.not_modified
+    version = versions.roster_version(cond.versions)
+    # Concurrent page loads share one list (read-only from here on)
+    students = await shared(("students", course_code, version), get_students_from_course_collection, course_code, version)
     if not students:
         raise HTTPException(404, "No students found in this course. Please upload student roster first.")
     return students
@@ -50,6 +88,7 @@ async def add_student_to_course(data: dict):
     """
     try:
         course_code = data.get("course_code")
+        instrumentation.set_course(course_code)
         student_data = data.get("student")
         
         if not course_code or not student_data:
@@ -68,6 +107,8 @@ async def add_student_to_course(data: dict):
         
         # Add student to course collection
         existing_ref.set(student_data)
+        versions.bump(course_code, "roster")
+        events.publish(course_code, "student", {"op": "added", "rollno": rollno, "fields": student_data})
         
         return {
             "status": "success",
@@ -87,6 +128,7 @@ async def update_student_in_course(data: dict):
     """
     try:
         course_code = data.get("course_code")
+        instrumentation.set_course(course_code)
         student_data = data.get("student")
         
         if not course_code or not student_data:
@@ -96,27 +138,32 @@ async def update_student_in_course(data: dict):
         if not rollno:
             raise HTTPException(400, "Student roll number is required")
         
-        # Check if student exists
+        # Field-level update: one write, fails if the student does not exist
+        # (or, with "update_time", if the record changed since it was read)
         student_ref = db.collection(course_code).document(rollno)
-        existing_doc = student_ref.get()
-        
-        if not existing_doc.exists:
-            raise HTTPException(404, f"Student {rollno} not found in course {course_code}")
-        
-        # Update student data (merge with existing)
-        existing_data = existing_doc.to_dict()
-        updated_data = {**existing_data, **student_data}
-        
-        student_ref.set(updated_data)
+        result = student_ref.update(as_field_updates(student_data), option=write_option_for(data.get("update_time")))
+        versions.bump(course_code, "roster")
+        events.publish(course_code, "student", {
+            "op": "updated",
+            "rollno": rollno,
+            "fields": student_data,
+            "update_time": format_update_time(result.update_time)
+        })
         
         return {
             "status": "success",
             "message": f"Student {rollno} updated successfully",
-            "student": updated_data
+            # The fields written (no re-read); patch them onto the record you hold
+            "student": student_data,
+            "update_time": format_update_time(result.update_time)
         }
         
     except HTTPException:
         raise
+    except DocumentNotFound:
+        raise HTTPException(404, f"Student {rollno} not found in course {course_code}")
+    except PreconditionFailed:
+        raise HTTPException(409, f"Student {rollno} was changed by someone else. Reload and try again.")
     except Exception as e:
         raise HTTPException(500, f"Error updating student: {str(e)}")
 
@@ -127,6 +174,7 @@ async def delete_student_from_course(data: dict):
     """
     try:
         course_code = data.get("course_code")
+        instrumentation.set_course(course_code)
         rollno = data.get("rollno")
         
         if not course_code or not rollno:
@@ -141,18 +189,11 @@ async def delete_student_from_course(data: dict):
         
         # Delete student
         student_ref.delete()
+        versions.bump(course_code, "roster")
         
         # Also delete from attendance records if needed
-        attendance_ref = db.collection(f"attendance_{course_code}")
-        attendance_docs = attendance_ref.stream()
-        
-        for doc in attendance_docs:
-            attendance_data = doc.to_dict()
-            if "attendance" in attendance_data and rollno in attendance_data["attendance"]:
-                # Update attendance record to remove this student
-                updated_attendance = attendance_data["attendance"]
-                del updated_attendance[rollno]
-                doc.reference.update({"attendance": updated_attendance})
+        attendance_repo.remove_student(course_code, rollno)
+        events.publish(course_code, "student", {"op": "deleted", "rollno": rollno})
         
         return {
             "status": "success",
@@ -165,13 +206,16 @@ async def delete_student_from_course(data: dict):
         raise HTTPException(500, f"Error deleting student: {str(e)}")
 
 @router.get("/search/{course_code}")
-async def search_students(course_code: str, query: str = ""):
+async def search_students(course_code: str, request: Request, response: Response, query: str = ""):
     """
     Search students in a course by name or roll number
     """
     try:
-        students_ref = db.collection(course_code)
-        docs = students_ref.stream()
+        cond = versions.conditional_get(request, response, course_code, "roster", "marks")
+        if cond.not_modified:
+            return cond.not_modified
+        version = versions.roster_version(cond.versions)
+        docs = await shared(("roster", course_code, version), roster_cache.get_roster, course_code, version)
         
         results = []
         query_lower = query.lower()
@@ -2,6 +2,8 @@
 import pandas as pd
 from fastapi import APIRouter, UploadFile, File, HTTPException, Form
 from services.firebase import db
+from services.metrics import UPLOAD_ROWS
+from services import events, instrumentation, versions
 from datetime import datetime
 
 router = APIRouter(prefix="/upload", tags=["Upload"])
@@ -21,6 +23,7 @@ async def upload_student_master(
         raise HTTPException(status_code=400, detail="Course code is required")
     
     course_code = course_code.strip()
+    instrumentation.set_course(course_code)
     
     try:
         # Read file based on extension
@@ -111,6 +114,11 @@ async def upload_student_master(
             except Exception as e:
                 errors.append(f"Row {index + 2}: {str(e)}")
         
+        versions.bump(course_code, "roster", "marks")
+        events.reload(course_code, "roster", "marks")
+        UPLOAD_ROWS.inc(inserted, upload="students", outcome="ok")
+        UPLOAD_ROWS.inc(len(errors), upload="students", outcome="error")
+        
         # Add/Update course in _courses collection
         courses_list_ref.set({
             "name": course_code,
@@ -120,6 +128,7 @@ async def upload_student_master(
             "last_updated": datetime.now().isoformat(),
             "status": "active"
         })
+        versions.bump_courses()
         
         return {
             "status": "success",
@@ -143,6 +152,7 @@ async def upload_marks_file(
     """
     Upload marks CSV/Excel file
     """
+    instrumentation.set_course(course_code)
     try:
         # Read file
         content = await file.read()
@@ -236,6 +246,12 @@ async def upload_marks_file(
             except Exception as e:
                 errors.append(f"Row {index + 2}: {str(e)}")
         
+        # Rows for unknown roll numbers create new roster documents
+        versions.bump(course_code, "roster", "marks")
+        events.reload(course_code, "roster", "marks")
+        UPLOAD_ROWS.inc(processed, upload="marks", outcome="ok")
+        UPLOAD_ROWS.inc(len(errors), upload="marks", outcome="error")
+        
         return {
             "status": "success",
             "course": course_code,
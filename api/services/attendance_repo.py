@@ -0,0 +1,245 @@
+# api/services/attendance_repo.py
+"""
+Single home for attendance storage.
+
+Canonical layout:  attendance_<course>/<session_id>
+Legacy layout:     attendance/<course>/logs/<date>   (read adapter + migration only)
+
+Routers and services/firebase.py go through this module. New sessions are
+only written to the canonical layout; until tools/migrate_attendance.py has
+moved a course's legacy logs, reads also return them (reshaped with
+to_canonical, canonical sessions win on the same id) and deletes sweep them.
+Once a course has no legacy logs left, reads cost one query on one
+collection again (checked once per process).
+"""
+from services import versions
+from services.firestore_client import db, firestore, chunked
+
+LEGACY_ROOT = "attendance"
+LEGACY_LOGS = "logs"
+
+_no_legacy = set()      # courses known to have no legacy logs left
+
+
+def collection_name(course_code: str):
+    return f"attendance_{course_code}"
+
+
+def attendance_collection(course_code: str):
+    return db.collection(collection_name(course_code))
+
+
+def session_id(date: str, section: str = "", time: str = "", with_time: bool = False):
+    """Document id for one session; plain date keeps /attendance/view/{course}/{date} working"""
+    parts = [date]
+    if section:
+        parts.append(str(section))
+    if with_time and time:
+        parts.append(str(time).replace(":", ""))
+    return "_".join(parts)
+
+
+def build_session(course_code: str, date: str, time: str, attendance_map: dict, section: str = "", timestamp=None):
+    """Canonical session document"""
+    session = {
+        "date": date,
+        "time": time,
+        "course": course_code,
+        "attendance": attendance_map,
+        "timestamp": timestamp if timestamp is not None else firestore.SERVER_TIMESTAMP,
+    }
+    if section:
+        session["section"] = section
+    return session
+
+
+# ======================================================
+#                       WRITES
+# ======================================================
+
+def save_session(course_code: str, doc_id: str, session: dict, batch=None):
+    """
+    Write one session; pass a batch to defer the commit to the caller (who
+    then also calls versions.bump(course_code, "attendance"))
+    """
+    ref = attendance_collection(course_code).document(doc_id)
+    if batch is not None:
+        batch.set(ref, session)
+    else:
+        ref.set(session)
+        versions.bump(course_code, "attendance")
+    return ref
+
+
+def remove_student(course_code: str, rollno: str):
+    """Drop one roll number from every session with field deletes (no full rewrites)"""
+    field = firestore.FieldPath("attendance", rollno).to_api_repr()
+    touched = 0
+    affected = (
+        doc.reference
+        for doc in stream_sessions(course_code)
+        if rollno in (doc.to_dict().get("attendance") or {})
+    )
+    for refs in chunked(affected):
+        batch = db.batch()
+        for ref in refs:
+            batch.update(ref, {field: firestore.DELETE_FIELD})
+        batch.commit()
+        touched += len(refs)
+    if touched:
+        versions.bump(course_code, "attendance")
+    return touched
+
+
+def delete_course_attendance(course_code: str):
+    """Delete every session of a course (legacy logs included) in batched deletes; returns the count"""
+    refs = list(attendance_collection(course_code).list_documents())
+    if has_legacy(course_code):
+        refs += list(legacy_logs(course_code).list_documents())
+    deleted = 0
+    for chunk in chunked(refs):
+        batch = db.batch()
+        for ref in chunk:
+            batch.delete(ref)
+        batch.commit()
+        deleted += len(chunk)
+    if course_code not in _no_legacy:
+        db.collection(LEGACY_ROOT).document(course_code).delete()
+        _no_legacy.add(course_code)
+    if deleted:
+        versions.bump(course_code, "attendance")
+    return deleted
+
+
+# ======================================================
+#                       READS
+# ======================================================
+
+def get_session(course_code: str, doc_id: str):
+    doc = attendance_collection(course_code).document(doc_id).get()
+    if doc.exists:
+        return doc.to_dict()
+    if has_legacy(course_code):
+        legacy = legacy_logs(course_code).document(doc_id).get()
+        if legacy.exists:
+            return LegacySession(course_code, legacy).to_dict()
+    return None
+
+
+def stream_sessions(course_code: str, limit: int = None):
+    """Session snapshots (.id, .reference, .to_dict()), legacy logs included until migrated"""
+    query = attendance_collection(course_code)
+    if limit:
+        query = query.limit(limit)
+    if not has_legacy(course_code):
+        return query.stream()
+    sessions = list(query.stream())
+    seen = {doc.id for doc in sessions}
+    for doc in legacy_logs(course_code).stream():
+        if limit and len(sessions) >= limit:
+            break
+        if doc.id not in seen:
+            sessions.append(LegacySession(course_code, doc))
+    return sessions
+
+
+def list_sessions(course_code: str, limit: int = None):
+    return [{"date": d.id, **d.to_dict()} for d in stream_sessions(course_code, limit)]
+
+
+def count_sessions(course_code: str):
+    ids = {ref.id for ref in attendance_collection(course_code).list_documents()}
+    if has_legacy(course_code):
+        ids.update(ref.id for ref in legacy_logs(course_code).list_documents())
+    return len(ids)
+
+
+# ======================================================
+#              LEGACY READ ADAPTER + MIGRATION
+# ======================================================
+
+def legacy_logs(course_code: str):
+    return db.collection(LEGACY_ROOT).document(course_code).collection(LEGACY_LOGS)
+
+
+def to_canonical(course_code: str, legacy: dict, doc_id: str):
+    """Reshape a legacy attendance/<course>/logs/<date> document into the canonical form"""
+    return build_session(
+        course_code,
+        legacy.get("date", doc_id),
+        legacy.get("time", ""),
+        legacy.get("attendance", {}),
+        legacy.get("section", ""),
+        timestamp=legacy.get("saved_at", legacy.get("timestamp")),
+    )
+
+
+def has_legacy(course_code: str):
+    """
+    True while attendance/<course>/logs still holds documents. Costs one read
+    per call until the course is found empty; nothing writes there any more,
+    so that answer is kept for the life of the process.
+    """
+    if course_code in _no_legacy:
+        return False
+    if any(True for _ in legacy_logs(course_code).limit(1).stream()):
+        return True
+    _no_legacy.add(course_code)
+    return False
+
+
+class LegacySession:
+    """A legacy log read in the canonical shape; .reference still points at the legacy document"""
+
+    def __init__(self, course_code: str, doc):
+        self.id = doc.id
+        self.reference = doc.reference
+        self._session = to_canonical(course_code, doc.to_dict() or {}, doc.id)
+        if self._session["timestamp"] is firestore.SERVER_TIMESTAMP:
+            # Nothing to resolve it against on a read
+            self._session["timestamp"] = None
+
+    def to_dict(self):
+        return dict(self._session)
+
+
+def stream_legacy_sessions(course_code: str):
+    """Yield (doc_id, canonical_session, legacy_ref) for every legacy log of a course"""
+    for doc in legacy_logs(course_code).stream():
+        yield doc.id, to_canonical(course_code, doc.to_dict(), doc.id), doc.reference
+
+
+def legacy_courses():
+    """Course codes that still have documents under the legacy root"""
+    return [ref.id for ref in db.collection(LEGACY_ROOT).list_documents()]
+
+
+def migrate_course(course_code: str, delete_legacy: bool = False, overwrite: bool = False, dry_run: bool = False):
+    """
+    Stream legacy logs of one course into the canonical collection in batches.
+    Existing canonical sessions win unless overwrite is set.
+    """
+    existing = set() if overwrite else {ref.id for ref in attendance_collection(course_code).list_documents()}
+    stats = {"course": course_code, "migrated": 0, "skipped": 0, "deleted_legacy": 0}
+
+    # Each legacy doc can cost a set + a delete, so halve the chunk size
+    for rows in chunked(stream_legacy_sessions(course_code), size=250):
+        batch = db.batch()
+        for doc_id, session, legacy_ref in rows:
+            if doc_id in existing:
+                stats["skipped"] += 1
+            else:
+                save_session(course_code, doc_id, session, batch=batch)
+                stats["migrated"] += 1
+            if delete_legacy:
+                batch.delete(legacy_ref)
+                stats["deleted_legacy"] += 1
+        if not dry_run:
+            batch.commit()
+
+    if stats["migrated"] and not dry_run:
+        versions.bump(course_code, "attendance")
+    if delete_legacy and not dry_run:
+        db.collection(LEGACY_ROOT).document(course_code).delete()
+        _no_legacy.add(course_code)
+    return stats
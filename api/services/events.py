@@ -0,0 +1,180 @@
+# api/services/events.py
+"""
+Live course updates, streamed to teacher pages as Server-Sent Events
+(GET /events/{course_code}).
+
+Write endpoints publish a compact delta once their writes (and
+versions.bump) are done; every open stream of the course receives it, so
+pages patch the rows they hold instead of refetching the whole course:
+
+    ready    {"course"}                                      stream is live (after any replay)
+    student  {"op": "added" | "updated" | "deleted", "rollno", "fields"?, "update_time"?}
+    marks    {"op": "saved" | "deleted", "rollno", "fields"?, "update_time"?}
+             {"op": "cleared", "rollnos"} | {"op": "cleared", "all": true}
+    session  {"id", "date", "time", "section", "students_marked", "present"}
+    reload   {"kinds"}                                       bulk change: refetch those kinds
+
+- Event ids are "<worker>-<n>", counted per course. A reconnecting
+  EventSource sends the last one back (Last-Event-ID) and receives what it
+  missed from the course's last EVENTS_REPLAY events, or a "reload" of
+  everything when those are gone (other worker, restart, too far behind)
+- A stream that falls EVENTS_QUEUE_SIZE events behind gets one "reload"
+  instead of the backlog
+- Delivery is per worker process: with several workers a page only sees
+  writes made through its own worker live; the rest still reach it through
+  the ETag revalidation of its next load (services/versions.py)
+"""
+import asyncio
+import json
+import os
+import threading
+import uuid
+from collections import deque
+
+from services.metrics import EVENTS_PUBLISHED, EVENT_STREAMS, EVENT_RELOADS
+from services.versions import KINDS
+
+EVENTS_REPLAY = int(os.getenv("EVENTS_REPLAY", "256"))
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "256"))
+EVENTS_KEEPALIVE_SECONDS = float(os.getenv("EVENTS_KEEPALIVE_SECONDS", "15"))
+# Reconnect delay suggested to EventSource (milliseconds)
+EVENTS_RETRY_MS = 3000
+
+# Ids from another process (or before a restart) can never be replayed here
+WORKER = uuid.uuid4().hex[:8]
+
+_lock = threading.Lock()
+_seqs = {}          # course_code -> last event number
+_history = {}       # course_code -> deque of (n, event, data), oldest first
+_streams = {}       # course_code -> set of Subscription
+
+
+class Subscription:
+    """One open stream: a bounded queue on the event loop serving it"""
+
+    def __init__(self, course_code: str):
+        self.course_code = course_code
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(EVENTS_QUEUE_SIZE)
+
+    def deliver(self, item):
+        # Runs on self.loop (publishers may be on any thread)
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            item = (item[0], "reload", {"kinds": list(KINDS)})
+            EVENT_RELOADS.inc(reason="overflow")
+        self.queue.put_nowait(item)
+
+
+def format_event(n: int, event: str, data: dict):
+    # json.dumps escapes newlines, so the payload always fits one data: line
+    payload = json.dumps(data, separators=(",", ":"), default=str)
+    return f"id: {WORKER}-{n}\nevent: {event}\ndata: {payload}\n\n"
+
+
+# ======================================================
+#                       PUBLISH
+# ======================================================
+
+def publish(course_code: str, event: str, data: dict):
+    """Send one delta to every stream of a course; safe from any thread"""
+    with _lock:
+        n = _seqs[course_code] = _seqs.get(course_code, 0) + 1
+        history = _history.get(course_code)
+        if history is None:
+            history = _history[course_code] = deque(maxlen=EVENTS_REPLAY)
+        history.append((n, event, data))
+        subscriptions = list(_streams.get(course_code, ()))
+    EVENTS_PUBLISHED.inc(event=event)
+    for subscription in subscriptions:
+        try:
+            subscription.loop.call_soon_threadsafe(subscription.deliver, (n, event, data))
+        except RuntimeError:
+            # Its event loop has shut down; the stream is going away
+            pass
+
+
+def reload(course_code: str, *kinds: str):
+    """Tell open pages to refetch `kinds` (uploads and other bulk changes)"""
+    publish(course_code, "reload", {"kinds": list(kinds or KINDS)})
+
+
+def session_saved(course_code: str, doc_id: str, session: dict):
+    attendance_map = session.get("attendance", {})
+    publish(course_code, "session", {
+        "id": doc_id,
+        "date": session.get("date"),
+        "time": session.get("time", ""),
+        "section": session.get("section", ""),
+        "students_marked": len(attendance_map),
+        "present": sum(1 for status in attendance_map.values() if str(status).lower() == "present"),
+    })
+
+
+# ======================================================
+#                       STREAMS
+# ======================================================
+
+def subscribe(course_code: str, last_event_id: str = None):
+    """
+    Register a stream (call on the event loop that serves it).
+    Returns (subscription, backlog): the events to send before live ones.
+    """
+    subscription = Subscription(course_code)
+    with _lock:
+        last = _seqs.get(course_code, 0)
+        history = _history.get(course_code, ())
+        backlog = []
+        if last_event_id:
+            missed = _replay(last_event_id, last, history)
+            if missed is None:
+                backlog.append((last, "reload", {"kinds": list(KINDS)}))
+                EVENT_RELOADS.inc(reason="replay")
+            else:
+                backlog.extend(missed)
+        # Also gives a fresh page an id to resume from
+        backlog.append((last, "ready", {"course": course_code}))
+        _streams.setdefault(course_code, set()).add(subscription)
+        EVENT_STREAMS.set(sum(len(s) for s in _streams.values()))
+    return subscription, backlog
+
+
+def _replay(last_event_id: str, last: int, history):
+    """Events after `last_event_id`, or None when they are no longer held"""
+    worker, _, n = last_event_id.strip().rpartition("-")
+    if worker != WORKER or not n.isdigit() or int(n) > last:
+        return None
+    n = int(n)
+    oldest = history[0][0] if history else last + 1
+    if n + 1 < oldest:
+        return None
+    return [item for item in history if item[0] > n]
+
+
+def unsubscribe(subscription):
+    with _lock:
+        streams = _streams.get(subscription.course_code)
+        if streams is not None:
+            streams.discard(subscription)
+            if not streams:
+                del _streams[subscription.course_code]
+        EVENT_STREAMS.set(sum(len(s) for s in _streams.values()))
+
+
+async def stream(subscription, backlog):
+    """text/event-stream body: backlog, then live events and keep-alive comments"""
+    try:
+        yield f"retry: {EVENTS_RETRY_MS}\n\n"
+        for item in backlog:
+            yield format_event(*item)
+        while True:
+            try:
+                item = await asyncio.wait_for(subscription.queue.get(), EVENTS_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+                continue
+            yield format_event(*item)
+    finally:
+        unsubscribe(subscription)
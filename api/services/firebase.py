@@ -1,37 +1,53 @@
 # api/services/firebase.py
+import atexit
+import logging
 import os
-from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials, firestore
+import threading
+from datetime import datetime, timedelta, timezone
+from services import instrumentation
+# Client, collection names and chunked() (re-exported for the routers)
+from services.firestore_client import (
+    STORAGE_BACKEND,
+    firestore,
+    gcp_exceptions,
+    DatetimeWithNanoseconds,
+    db,
+    COL_STUDENTS,
+    COL_COURSES,
+    COL_ATTENDANCE_ROOT,
+    COL_MARKS_ROOT,
+    COL_VERSIONS,
+    MARKS_FIELDS,
+    MAX_BATCH_WRITES,
+    chunked,
+)
+from services import attendance_repo, mirror, roster_cache, versions
 
-# Load env file
-load_dotenv("../.env")
+logger = logging.getLogger(__name__)
 
-# Path to service account JSON
-SERVICE_ACCOUNT = os.getenv("FIREBASE_SERVICE_ACCOUNT", "./stu sys.json")
+# ======================================================
+#          OPTIMISTIC CONCURRENCY (update_time)
+# ======================================================
 
-# -----------------------------
-#   Initialize Firebase App
-# -----------------------------
-if not firebase_admin._apps:
-    # Safely initialize Firebase only once
-    try:
-        cred = credentials.Certificate(SERVICE_ACCOUNT)
-        firebase_admin.initialize_app(cred) 
-    except FileNotFoundError:
-        print("ERROR: Firebase service account file not found.")
-        # Handle initialization failure gracefully in production
-        pass
-
-db = firestore.client()
-
-# -----------------------------
-#   FIRESTORE COLLECTIONS - UPDATED
-# -----------------------------
-COL_STUDENTS = "students"              # student documents (rollno → student info)
-COL_COURSES = "_courses"               # CHANGED: course documents (course_code → course metadata)
-COL_ATTENDANCE_ROOT = "attendance"     # attendance/<course>/logs/<date>
-COL_MARKS_ROOT = "marks"               # marks/<course>/students/<rollno>
+def format_update_time(update_time):
+    """RFC 3339 string with nanoseconds, safe to send back as a precondition"""
+    return update_time.rfc3339() if update_time else None
+
+def write_option_for(update_time: str = None):
+    """Write option that fails the write if the document changed since `update_time`"""
+    if not update_time:
+        return None
+    return db.write_option(last_update_time=DatetimeWithNanoseconds.from_rfc3339(update_time))
+
+def as_field_updates(data: dict):
+    """Top-level keys for DocumentReference.update() (dots/spaces are not nested paths)"""
+    return {firestore.FieldPath(str(key)).to_api_repr(): value for key, value in data.items()}
+
+# Raised by writes whose update_time precondition no longer holds / whose document is gone
+PreconditionFailed = gcp_exceptions.FailedPrecondition
+DocumentNotFound = gcp_exceptions.NotFound
+# Raised by create() when the document is already there
+DocumentExists = gcp_exceptions.AlreadyExists
 
 # ======================================================
 #               COURSE MANAGEMENT (UPDATED)
@@ -47,12 +63,15 @@ def create_course_if_not_exists(course_code: str, course_name: str, credit_hours
             "credit_hours": credit_hours,
             "created_at": firestore.SERVER_TIMESTAMP,
         })
+        versions.bump_courses()
         return True
     return False
 
 def list_all_courses():
     """Returns a list of all course documents."""
-    docs = db.collection(COL_COURSES).stream()
+    docs = mirror.courses() if mirror.MIRROR_ENABLED else None
+    if docs is None:
+        docs = db.collection(COL_COURSES).stream()
     courses = []
     for doc in docs:
         courses.append({
@@ -96,18 +115,37 @@ def get_student(rollno: str):
 def update_student_enrollments(rollno: str, course_code: str):
     """Add course to student's enrolled_courses list"""
     ref = db.collection(COL_STUDENTS).document(rollno)
-    doc = ref.get()
-    if not doc.exists:
+    try:
+        # Atomic server-side append, no read-modify-write race
+        ref.update({"enrolled_courses": firestore.ArrayUnion([course_code])})
+    except DocumentNotFound:
         return False
+    return True
 
-    data = doc.to_dict()
-    courses = data.get("enrolled_courses", [])
-    
-    if course_code not in courses:
-        courses.append(course_code)
+def bulk_enroll_students(rollnos: list, course_code: str):
+    """
+    Enroll many students in a course with chunked ArrayUnion batches.
+    Returns (enrolled_rollnos, not_found_rollnos).
+    """
+    col = db.collection(COL_STUDENTS)
+    enrolled, not_found = [], []
 
-    ref.update({"enrolled_courses": courses})
-    return True
+    for chunk in chunked(dict.fromkeys(str(r).strip() for r in rollnos if str(r).strip())):
+        # One round trip to learn which students exist (ids only)
+        docs = db.get_all([col.document(r) for r in chunk], field_paths=[])
+        existing = {d.id for d in docs if d.exists}
+
+        batch = db.batch()
+        for rollno in chunk:
+            if rollno in existing:
+                batch.update(col.document(rollno), {"enrolled_courses": firestore.ArrayUnion([course_code])})
+                enrolled.append(rollno)
+            else:
+                not_found.append(rollno)
+        if existing:
+            batch.commit()
+
+    return enrolled, not_found
 
 def get_students_by_course(course_code: str):
     """Get all students who are enrolled in a given course"""
@@ -117,9 +155,9 @@ def get_students_by_course(course_code: str):
     return [d.to_dict() for d in docs]
 
 # NEW FUNCTION: Get students from course collection (not enrolled_courses)
-def get_students_from_course_collection(course_code: str):
+def get_students_from_course_collection(course_code: str, version=None):
     """Get students from the course-specific collection"""
-    docs = db.collection(course_code).stream()
+    docs = roster_cache.get_roster(course_code, version)
     students = []
     for doc in docs:
         student_data = doc.to_dict()
@@ -130,54 +168,23 @@ def get_students_from_course_collection(course_code: str):
 # ======================================================
 #               ATTENDANCE MANAGEMENT (UPDATED)
 # ======================================================
+# All attendance is written to attendance_<course>/<date>; see
+# services/attendance_repo.py. Old attendance/<course>/logs data is still
+# read through it until tools/migrate_attendance.py has moved it.
 
 def save_attendance(course_code: str, date_iso: str, time_iso: str, attendance_map: dict):
     """
     Saves attendance log for a specific course and date.
     """
-    ref = (
-        db.collection(COL_ATTENDANCE_ROOT)
-        .document(course_code)
-        .collection("logs")
-        .document(date_iso)
-    )
-
-    payload = {
-        "date": date_iso,  # ADDED: date field
-        "time": time_iso,
-        "course": course_code,  # ADDED: course field
-        "attendance": attendance_map,
-        "saved_at": firestore.SERVER_TIMESTAMP,
-    }
-
-    ref.set(payload)
+    session = attendance_repo.build_session(course_code, date_iso, time_iso, attendance_map)
+    attendance_repo.save_session(course_code, date_iso, session)
     return True
 
 def get_attendance(course_code: str, date_iso: str):
-    doc = (
-        db.collection(COL_ATTENDANCE_ROOT)
-        .document(course_code)
-        .collection("logs")
-        .document(date_iso)
-        .get()
-    )
-    return doc.to_dict() if doc.exists else None
+    return attendance_repo.get_session(course_code, date_iso)
 
 def list_attendance_dates(course_code: str, limit: int = 50):
-    docs = (
-        db.collection(COL_ATTENDANCE_ROOT)
-        .document(course_code)
-        .collection("logs")
-        .limit(limit)
-        .stream()
-    )
-    dates = []
-    for d in docs:
-        dates.append({
-            "date": d.id,
-            **d.to_dict()
-        })
-    return dates
+    return attendance_repo.list_sessions(course_code, limit)
 
 # NEW FUNCTION: For teacher portal (different structure)
 def save_attendance_teacher_portal(course_code: str, data: dict):
@@ -191,16 +198,7 @@ def save_attendance_teacher_portal(course_code: str, data: dict):
     if not date or not attendance_map:
         return False
     
-    # Save in teacher portal format (same collection as course)
-    attendance_collection = db.collection(f"attendance_{course_code}")
-    attendance_collection.document(date).set({
-        "date": date,
-        "time": time,
-        "course": course_code,
-        "attendance": attendance_map,
-        "timestamp": firestore.SERVER_TIMESTAMP
-    })
-    return True
+    return save_attendance(course_code, date, time, attendance_map)
 
 # ======================================================
 #                   MARKS MANAGEMENT (UPDATED)
@@ -233,11 +231,134 @@ def get_marks_for_course(course_code: str, rollno: str = None):
 # NEW FUNCTION: Get marks from course collection (for teacher portal)
 def get_marks_from_course_collection(course_code: str):
     """Get marks from the course-specific collection"""
-    docs = db.collection(course_code).stream()
+    docs = roster_cache.get_roster(course_code)
     marks_list = []
     for doc in docs:
         data = doc.to_dict()
         # Check if this document has marks data
         if any(key in data for key in ['mids_marks', 'finals_marks', 'sessional', 'assignment', 'quiz']):
             marks_list.append(data)
-    return marks_list
\ No newline at end of file
+    return marks_list
+
+def get_results_from_course_collection(course_code: str):
+    """Stored results of a course as (rollno, result) pairs"""
+    return [(doc.id, doc.to_dict()) for doc in db.collection(f"results_{course_code}").stream()]
+
+# ======================================================
+#          COST LEDGER (documents billed per endpoint / course / day)
+# ======================================================
+# Every request's document reads / writes / deletes (counted by
+# services/instrumentation.py) are attributed to its endpoint, course and UTC
+# day, buffered in memory and flushed as Increment()s into one rollup document
+# per day: _cost_ledger/<YYYY-MM-DD> -> entries.<endpoint>.<course>.<op>
+
+COL_COST_LEDGER = "_cost_ledger"
+COST_LEDGER_FLUSH_SECONDS = float(os.getenv("COST_LEDGER_FLUSH_SECONDS", "60"))
+# USD per 100,000 documents (Firestore list prices; override per region)
+COST_RATES = {
+    "read": float(os.getenv("FIRESTORE_READ_RATE", "0.06")),
+    "write": float(os.getenv("FIRESTORE_WRITE_RATE", "0.18")),
+    "delete": float(os.getenv("FIRESTORE_DELETE_RATE", "0.02")),
+}
+NO_COURSE = "-"
+
+_ledger_lock = threading.Lock()
+_ledger_pending = {}        # (day, endpoint, course) -> {op: count}
+_ledger_timer = None
+
+def _ledger_day(when: datetime = None):
+    return (when or datetime.now(timezone.utc)).strftime("%Y-%m-%d")
+
+@instrumentation.add_request_listener
+def record_request_cost(stats):
+    """Buffer one finished request's document ops into the ledger"""
+    if not any(stats.counts.values()):
+        return
+    endpoint = f"{stats.method} {stats.route if stats.matched else '<unmatched>'}"
+    key = (_ledger_day(), endpoint, stats.course or NO_COURSE)
+
+    global _ledger_timer
+    with _ledger_lock:
+        entry = _ledger_pending.setdefault(key, {op: 0 for op in instrumentation.OP_KINDS})
+        for op, count in stats.counts.items():
+            entry[op] += count
+        if _ledger_timer is None:
+            _ledger_timer = threading.Timer(COST_LEDGER_FLUSH_SECONDS, flush_cost_ledger)
+            _ledger_timer.daemon = True
+            _ledger_timer.start()
+
+def flush_cost_ledger():
+    """Write buffered counts into the daily rollup documents (one write per day)"""
+    global _ledger_timer
+    with _ledger_lock:
+        pending = dict(_ledger_pending)
+        _ledger_pending.clear()
+        _ledger_timer = None
+    if not pending:
+        return
+
+    by_day = {}
+    for (day, endpoint, course), counts in pending.items():
+        courses = by_day.setdefault(day, {}).setdefault(endpoint, {})
+        courses[course] = {op: firestore.Increment(n) for op, n in counts.items() if n}
+
+    try:
+        batch = db.batch()
+        for day, entries in by_day.items():
+            batch.set(db.collection(COL_COST_LEDGER).document(day), {
+                "day": day,
+                "entries": entries,
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+            }, merge=True)
+        batch.commit()
+    except Exception:
+        logger.exception("Cost ledger flush failed")
+        # Put the counts back so the next flush retries them
+        with _ledger_lock:
+            for key, counts in pending.items():
+                entry = _ledger_pending.setdefault(key, {op: 0 for op in instrumentation.OP_KINDS})
+                for op, count in counts.items():
+                    entry[op] += count
+
+atexit.register(flush_cost_ledger)
+
+def estimate_cost(counts: dict):
+    return sum(counts.get(op, 0) * rate for op, rate in COST_RATES.items()) / 100_000
+
+def get_cost_report(days: int = 7, course_code: str = None):
+    """
+    Rows of {day, endpoint, course, read, write, delete, estimated_usd} for the
+    last `days` UTC days (including counts not flushed yet), most expensive first.
+    """
+    today = datetime.now(timezone.utc)
+    day_ids = [_ledger_day(today - timedelta(days=i)) for i in range(max(days, 1))]
+    refs = [db.collection(COL_COST_LEDGER).document(day) for day in day_ids]
+
+    totals = {}
+    def add(day, endpoint, course, counts):
+        if course_code and course != course_code:
+            return
+        entry = totals.setdefault((day, endpoint, course), {op: 0 for op in instrumentation.OP_KINDS})
+        for op in instrumentation.OP_KINDS:
+            entry[op] += int(counts.get(op, 0))
+
+    for snap in db.get_all(refs):
+        if not snap.exists:
+            continue
+        for endpoint, courses in (snap.to_dict().get("entries") or {}).items():
+            for course, counts in courses.items():
+                add(snap.id, endpoint, course, counts)
+
+    with _ledger_lock:
+        pending = list(_ledger_pending.items())
+    for (day, endpoint, course), counts in pending:
+        if day in day_ids:
+            add(day, endpoint, course, counts)
+
+    rows = [
+        {"day": day, "endpoint": endpoint, "course": course, **counts,
+         "estimated_usd": round(estimate_cost(counts), 6)}
+        for (day, endpoint, course), counts in totals.items()
+    ]
+    rows.sort(key=lambda r: (r["estimated_usd"], r["read"]), reverse=True)
+    return rows
@@ -0,0 +1,88 @@
+# api/services/firestore_client.py
+"""
+Firestore client, collection names and batching helpers.
+
+Kept apart from services/firebase.py so the storage modules it builds on
+(attendance_repo, versions...) can import the client at module level without
+an import cycle; services/firebase.py re-exports all of it.
+"""
+import os
+from dotenv import load_dotenv
+from services.instrumentation import instrument
+
+# Load env file
+load_dotenv("../.env")
+
+# Path to service account JSON
+SERVICE_ACCOUNT = os.getenv("FIREBASE_SERVICE_ACCOUNT", "./stu sys.json")
+
+# "firestore" (default) or "local" (services/local_store.py: in-memory, or
+# SQLite via LOCAL_STORE_PATH) for benchmarks, load tests and offline work
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "firestore").lower()
+
+if STORAGE_BACKEND == "local":
+    from services import local_store as firestore
+    from services.local_store import Timestamp as DatetimeWithNanoseconds
+    gcp_exceptions = firestore
+else:
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+    from google.api_core import exceptions as gcp_exceptions
+    from google.api_core.datetime_helpers import DatetimeWithNanoseconds
+
+    # -----------------------------
+    #   Initialize Firebase App
+    # -----------------------------
+    if not firebase_admin._apps:
+        # Safely initialize Firebase only once
+        try:
+            cred = credentials.Certificate(SERVICE_ACCOUNT)
+            firebase_admin.initialize_app(cred) 
+        except FileNotFoundError:
+            print("ERROR: Firebase service account file not found.")
+            # Handle initialization failure gracefully in production
+            pass
+
+# Every storage call is counted per request (see services/instrumentation.py)
+db = instrument(firestore.client())
+
+# -----------------------------
+#   FIRESTORE COLLECTIONS - UPDATED
+# -----------------------------
+COL_STUDENTS = "students"              # student documents (rollno → student info)
+COL_COURSES = "_courses"               # CHANGED: course documents (course_code → course metadata)
+COL_ATTENDANCE_ROOT = "attendance"     # legacy attendance/<course>/logs/<date> (see attendance_repo)
+COL_MARKS_ROOT = "marks"               # marks/<course>/students/<rollno>
+COL_VERSIONS = "_versions"             # per-course data versions (see services/versions.py)
+
+# Mark fields stored on course roster documents (<course>/<rollno>)
+MARKS_FIELDS = ['mids_marks', 'finals_marks', 'sessional', 'assignment', 'quiz']
+
+# Firestore rejects write batches with more than 500 operations
+MAX_BATCH_WRITES = 500
+
+def chunked(items, size: int = MAX_BATCH_WRITES):
+    """Yield lists of at most `size` items from any iterable (for batch commits)"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class RosterDocument:
+    """Roster snapshot held in memory: .id, .update_time and .to_dict() like a Firestore snapshot"""
+
+    exists = True
+
+    def __init__(self, doc_id, data, update_time):
+        self.id = doc_id
+        self.update_time = update_time
+        self._data = data
+
+    def to_dict(self):
+        # Callers add keys (rollno, update_time...) to what they get back
+        return dict(self._data)
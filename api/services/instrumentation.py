@@ -0,0 +1,403 @@
+# api/services/instrumentation.py
+"""
+Per-request instrumentation.
+
+* InstrumentedClient wraps the storage client (services/firebase.db) and counts
+  document reads / writes / deletes and their latency.
+* RequestInstrumentationMiddleware times every request, attaches the counts as
+  a Server-Timing header and writes one structured log line per request.
+"""
+import contextvars
+import json
+import logging
+import time
+
+logger = logging.getLogger("api.requests")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+OP_KINDS = ("read", "write", "delete")
+
+# ======================================================
+#               PER-REQUEST STATS
+# ======================================================
+
+class RequestStats:
+    """Storage operations seen while serving one request"""
+
+    def __init__(self, method: str = "", route: str = ""):
+        self.method = method
+        self.route = route
+        self.matched = False
+        # Response is a long-lived event stream (see add_stream_listener)
+        self.streaming = False
+        self.course = None
+        self.status = None
+        self.duration_ms = 0.0
+        self.counts = {kind: 0 for kind in OP_KINDS}
+        self.storage_ms = 0.0
+        # (op kind, collection kind) -> document count
+        self.by_collection = {}
+
+    def record(self, op: str, collection_kind: str, count: int, elapsed_ms: float):
+        self.counts[op] += count
+        self.storage_ms += elapsed_ms
+        key = (op, collection_kind)
+        self.by_collection[key] = self.by_collection.get(key, 0) + count
+
+    def as_log(self):
+        return {
+            "method": self.method,
+            "route": self.route,
+            "course": self.course,
+            "status": self.status,
+            "duration_ms": round(self.duration_ms, 2),
+            "reads": self.counts["read"],
+            "writes": self.counts["write"],
+            "deletes": self.counts["delete"],
+            "storage_ms": round(self.storage_ms, 2),
+        }
+
+
+_current = contextvars.ContextVar("request_stats", default=None)
+# Called with (RequestStats) when a request starts
+_request_start_listeners = []
+# Called with (RequestStats) once every request has finished
+_request_listeners = []
+# Called with (RequestStats) when a response starts as an event stream
+_stream_listeners = []
+# Called with (op, collection_kind, count, elapsed_ms) for every storage op
+_op_listeners = []
+
+
+def current_stats():
+    return _current.get()
+
+
+def set_course(course_code):
+    """Attribute the current request to a course taken from its body, form or query"""
+    stats = _current.get()
+    if stats is not None and course_code:
+        stats.course = str(course_code)
+
+
+def add_request_start_listener(fn):
+    _request_start_listeners.append(fn)
+    return fn
+
+
+def add_request_listener(fn):
+    _request_listeners.append(fn)
+    return fn
+
+
+def add_stream_listener(fn):
+    _stream_listeners.append(fn)
+    return fn
+
+
+def add_op_listener(fn):
+    _op_listeners.append(fn)
+    return fn
+
+
+def collection_kind(name: str):
+    """Map a collection name onto the kind of data it holds"""
+    if name == "_courses":
+        return "courses"
+    if name.startswith("attendance"):
+        return "attendance"
+    if name.startswith("results_"):
+        return "results"
+    if name == "marks":
+        return "marks"
+    if name == "students":
+        return "students"
+    if name.startswith("_"):
+        return "system"
+    # <course_code> collections hold the roster (and its marks fields)
+    return "roster"
+
+
+def record_op(op: str, collection: str, count: int = 1, elapsed_ms: float = 0.0):
+    kind = collection_kind(collection)
+    stats = _current.get()
+    if stats is not None:
+        stats.record(op, kind, count, elapsed_ms)
+    for listener in _op_listeners:
+        listener(op, kind, count, elapsed_ms)
+
+
+def _root_collection(path: str):
+    return path.split("/")[0] if path else ""
+
+
+# ======================================================
+#               STORAGE CLIENT WRAPPER
+# ======================================================
+
+def _unwrap(obj):
+    return getattr(obj, "_wrapped", obj)
+
+
+class _Proxy:
+    def __init__(self, wrapped):
+        object.__setattr__(self, "_wrapped", wrapped)
+
+    def __getattr__(self, name):
+        return getattr(self._wrapped, name)
+
+    def __eq__(self, other):
+        return self._wrapped == _unwrap(other)
+
+    def __hash__(self):
+        return hash(self._wrapped)
+
+
+class InstrumentedSnapshot(_Proxy):
+    @property
+    def reference(self):
+        return InstrumentedDocument(self._wrapped.reference)
+
+
+def _counted_stream(iterator, collection: str):
+    """Yield snapshots, counting one read each and the time spent fetching"""
+    count, elapsed = 0, 0.0
+    iterator = iter(iterator)
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                elapsed += time.perf_counter() - start
+                break
+            elapsed += time.perf_counter() - start
+            count += 1
+            yield item
+    finally:
+        # Firestore bills at least one read for a query that returns nothing
+        record_op("read", collection, max(count, 1), elapsed * 1000)
+
+
+class InstrumentedQuery(_Proxy):
+    """Collection reference or query; every streamed document counts as a read"""
+
+    def __init__(self, wrapped, collection: str):
+        super().__init__(wrapped)
+        object.__setattr__(self, "_collection", collection)
+
+    def _chain(self, name):
+        method = getattr(self._wrapped, name)
+
+        def chained(*args, **kwargs):
+            return InstrumentedQuery(method(*args, **kwargs), self._collection)
+        return chained
+
+    def __getattr__(self, name):
+        if name in ("where", "select", "limit", "limit_to_last", "order_by", "offset",
+                    "start_at", "start_after", "end_at", "end_before"):
+            return self._chain(name)
+        return getattr(self._wrapped, name)
+
+    def stream(self, *args, **kwargs):
+        for snap in _counted_stream(self._wrapped.stream(*args, **kwargs), self._collection):
+            yield InstrumentedSnapshot(snap)
+
+    def get(self, *args, **kwargs):
+        return list(self.stream(*args, **kwargs))
+
+    def document(self, *args, **kwargs):
+        return InstrumentedDocument(self._wrapped.document(*args, **kwargs))
+
+    def list_documents(self, *args, **kwargs):
+        for ref in _counted_stream(self._wrapped.list_documents(*args, **kwargs), self._collection):
+            yield InstrumentedDocument(ref)
+
+    def on_snapshot(self, callback):
+        """Snapshot listener; every delivered document change counts as a read"""
+        collection = self._collection
+
+        def counted(docs, changes, read_time):
+            record_op("read", collection, max(len(changes), 1))
+            return callback(docs, changes, read_time)
+        return self._wrapped.on_snapshot(counted)
+
+    def add(self, *args, **kwargs):
+        start = time.perf_counter()
+        result = self._wrapped.add(*args, **kwargs)
+        record_op("write", self._collection, 1, (time.perf_counter() - start) * 1000)
+        return result[0], InstrumentedDocument(result[1])
+
+
+class InstrumentedDocument(_Proxy):
+    @property
+    def _collection(self):
+        return _root_collection(self._wrapped.path)
+
+    def _timed(self, op, name, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return getattr(self._wrapped, name)(*args, **kwargs)
+        finally:
+            record_op(op, self._collection, 1, (time.perf_counter() - start) * 1000)
+
+    def get(self, *args, **kwargs):
+        return InstrumentedSnapshot(self._timed("read", "get", *args, **kwargs))
+
+    def set(self, *args, **kwargs):
+        return self._timed("write", "set", *args, **kwargs)
+
+    def create(self, *args, **kwargs):
+        return self._timed("write", "create", *args, **kwargs)
+
+    def update(self, *args, **kwargs):
+        return self._timed("write", "update", *args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._timed("delete", "delete", *args, **kwargs)
+
+    def collection(self, *args, **kwargs):
+        return InstrumentedQuery(self._wrapped.collection(*args, **kwargs), self._collection)
+
+    @property
+    def parent(self):
+        return InstrumentedQuery(self._wrapped.parent, self._collection)
+
+
+class InstrumentedBatch(_Proxy):
+    """Write batch; operations are counted when the batch commits"""
+
+    def __init__(self, wrapped):
+        super().__init__(wrapped)
+        object.__setattr__(self, "_pending", [])
+
+    def _add(self, op, name, reference, *args, **kwargs):
+        ref = _unwrap(reference)
+        getattr(self._wrapped, name)(ref, *args, **kwargs)
+        self._pending.append((op, _root_collection(ref.path)))
+        return self
+
+    def set(self, reference, *args, **kwargs):
+        return self._add("write", "set", reference, *args, **kwargs)
+
+    def create(self, reference, *args, **kwargs):
+        return self._add("write", "create", reference, *args, **kwargs)
+
+    def update(self, reference, *args, **kwargs):
+        return self._add("write", "update", reference, *args, **kwargs)
+
+    def delete(self, reference, *args, **kwargs):
+        return self._add("delete", "delete", reference, *args, **kwargs)
+
+    def commit(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._wrapped.commit(*args, **kwargs)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            pending = self._pending
+            for i, (op, collection) in enumerate(pending):
+                # Attribute the commit latency once, to the first op
+                record_op(op, collection, 1, elapsed if i == 0 else 0.0)
+            pending.clear()
+
+
+class InstrumentedClient(_Proxy):
+    def collection(self, *args, **kwargs):
+        ref = self._wrapped.collection(*args, **kwargs)
+        return InstrumentedQuery(ref, _root_collection("/".join(ref._path)))
+
+    def document(self, *args, **kwargs):
+        return InstrumentedDocument(self._wrapped.document(*args, **kwargs))
+
+    def batch(self, *args, **kwargs):
+        return InstrumentedBatch(self._wrapped.batch(*args, **kwargs))
+
+    def get_all(self, references, *args, **kwargs):
+        references = [_unwrap(r) for r in references]
+        collection = _root_collection(references[0].path) if references else ""
+        for snap in _counted_stream(self._wrapped.get_all(references, *args, **kwargs), collection):
+            yield InstrumentedSnapshot(snap)
+
+
+def instrument(client):
+    """Wrap a storage client so every document operation is counted"""
+    return InstrumentedClient(client)
+
+
+# ======================================================
+#               ASGI MIDDLEWARE
+# ======================================================
+
+class RequestInstrumentationMiddleware:
+    """Times each request and reports its storage ops (Server-Timing + log line)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope.get("method", ""), scope.get("path", ""))
+        token = _current.set(stats)
+        start = time.perf_counter()
+        for listener in _request_start_listeners:
+            listener(stats)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                _finish(stats, scope, start, message["status"])
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(stats).encode("latin-1")))
+                # Lets the cross-origin frontend read the timings in devtools
+                headers.append((b"timing-allow-origin", b"*"))
+                message = {**message, "headers": headers}
+                if _is_event_stream(headers):
+                    stats.streaming = True
+                    for listener in _stream_listeners:
+                        listener(stats)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        except Exception:
+            _finish(stats, scope, start, 500)
+            raise
+        finally:
+            # Duration runs to the end of the body, not just the headers
+            stats.duration_ms = (time.perf_counter() - start) * 1000
+            _current.reset(token)
+            logger.info(json.dumps({"event": "request", **stats.as_log()}))
+            for listener in _request_listeners:
+                listener(stats)
+
+
+def _is_event_stream(headers):
+    return any(name.lower() == b"content-type" and value.startswith(b"text/event-stream")
+               for name, value in headers)
+
+
+def _finish(stats, scope, start, status):
+    route = scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        stats.route = route.path
+        stats.matched = True
+    # Handlers that read the course from the body have set it already (set_course)
+    stats.course = (scope.get("path_params") or {}).get("course_code") or stats.course
+    stats.status = status
+    stats.duration_ms = (time.perf_counter() - start) * 1000
+
+
+def server_timing(stats):
+    return (
+        f"app;dur={stats.duration_ms:.1f}, "
+        f"storage;dur={stats.storage_ms:.1f};"
+        f"desc=\"reads={stats.counts['read']} writes={stats.counts['write']} deletes={stats.counts['delete']}\""
+    )
@@ -0,0 +1,844 @@
+# api/services/local_store.py
+"""
+Local stand-in for the Firestore client, used when STORAGE_BACKEND=local.
+
+Implements the part of the google-cloud-firestore API this codebase uses
+(collections, documents, queries, batches, get_all, update_time preconditions
+and the DELETE_FIELD / SERVER_TIMESTAMP / ArrayUnion / Increment transforms)
+on top of an in-memory store. Set LOCAL_STORE_PATH to a SQLite file to keep
+the data between runs (e.g. after seeding it with tools/generate_dataset.py).
+
+LOCAL_STORE_LATENCY* / LOCAL_STORE_ERRORS inject round-trip latency and
+failures (see FaultModel) so batching / caching changes can be measured
+against realistic 20-80 ms Firestore round trips without the network.
+
+CollectionReference.on_snapshot() simulates Firestore's change feed (see
+Watch); the "listen" latency delays each delivery.
+
+Exports the same names services/firebase.py takes from firebase_admin.firestore.
+"""
+import enum
+import logging
+import math
+import os
+import pickle
+import queue
+import random
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+# ======================================================
+#               ERRORS / TIMESTAMPS / SENTINELS
+# ======================================================
+
+class FailedPrecondition(Exception):
+    """Mirrors google.api_core.exceptions.FailedPrecondition"""
+
+class NotFound(Exception):
+    """Mirrors google.api_core.exceptions.NotFound"""
+
+class AlreadyExists(Exception):
+    """Mirrors google.api_core.exceptions.AlreadyExists"""
+
+class ServiceUnavailable(Exception):
+    """Mirrors google.api_core.exceptions.ServiceUnavailable (injected faults)"""
+
+class DeadlineExceeded(Exception):
+    """Mirrors google.api_core.exceptions.DeadlineExceeded (injected faults)"""
+
+
+class Timestamp(datetime):
+    """UTC datetime with the rfc3339 helpers of DatetimeWithNanoseconds"""
+
+    def rfc3339(self):
+        return self.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+    @classmethod
+    def from_rfc3339(cls, value: str):
+        value = value.rstrip("Z")
+        fmt = "%Y-%m-%dT%H:%M:%S.%f" if "." in value else "%Y-%m-%dT%H:%M:%S"
+        parsed = datetime.strptime(value[:26], fmt)
+        return cls(*parsed.timetuple()[:6], parsed.microsecond, tzinfo=timezone.utc)
+
+    @classmethod
+    def now(cls):
+        now = datetime.now(timezone.utc)
+        return cls(*now.timetuple()[:6], now.microsecond, tzinfo=timezone.utc)
+
+
+class _Sentinel:
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+SERVER_TIMESTAMP = _Sentinel("SERVER_TIMESTAMP")
+DELETE_FIELD = _Sentinel("DELETE_FIELD")
+
+
+class ArrayUnion:
+    def __init__(self, values):
+        self.values = list(values)
+
+class ArrayRemove:
+    def __init__(self, values):
+        self.values = list(values)
+
+class Increment:
+    def __init__(self, value):
+        self.value = value
+
+
+_SIMPLE_FIELD = re.compile(r"^[_a-zA-Z][_a-zA-Z0-9]*$")
+
+class FieldPath:
+    def __init__(self, *parts):
+        self.parts = tuple(parts)
+
+    def to_api_repr(self):
+        return ".".join(
+            part if _SIMPLE_FIELD.match(part)
+            else "`" + part.replace("\\", "\\\\").replace("`", "\\`") + "`"
+            for part in self.parts
+        )
+
+    @classmethod
+    def from_api_repr(cls, path: str):
+        """Split a dotted field path, honouring `backtick` quoted segments"""
+        parts, current, quoted, escaped = [], "", False, False
+        for ch in path:
+            if escaped:
+                current += ch
+                escaped = False
+            elif ch == "\\" and quoted:
+                escaped = True
+            elif ch == "`":
+                quoted = not quoted
+            elif ch == "." and not quoted:
+                parts.append(current)
+                current = ""
+            else:
+                current += ch
+        parts.append(current)
+        return cls(*parts)
+
+
+# ======================================================
+#               VALUE HELPERS
+# ======================================================
+
+def _copy(value):
+    # Faster than deepcopy for the plain dict / list / scalar trees stored here
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
+
+
+def _transform(current, value, now):
+    """Resolve sentinels / transforms against the current field value"""
+    if value is SERVER_TIMESTAMP:
+        return now
+    if isinstance(value, Increment):
+        return (current if isinstance(current, (int, float)) and not isinstance(current, bool) else 0) + value.value
+    if isinstance(value, ArrayUnion):
+        existing = list(current) if isinstance(current, list) else []
+        return existing + [v for v in value.values if v not in existing]
+    if isinstance(value, ArrayRemove):
+        return [v for v in (current if isinstance(current, list) else []) if v not in value.values]
+    if isinstance(value, dict):
+        return {k: _transform(None, v, now) for k, v in value.items() if v is not DELETE_FIELD}
+    return _copy(value)
+
+
+def _merge(target, data, now):
+    for key, value in data.items():
+        if value is DELETE_FIELD:
+            target.pop(key, None)
+        elif isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value, now)
+        elif isinstance(value, dict):
+            target[key] = {}
+            _merge(target[key], value, now)
+        else:
+            target[key] = _transform(target.get(key), value, now)
+
+
+def _set_path(target, parts, value, now):
+    for part in parts[:-1]:
+        child = target.get(part)
+        if not isinstance(child, dict):
+            if value is DELETE_FIELD:
+                return
+            child = target[part] = {}
+        target = child
+    if value is DELETE_FIELD:
+        target.pop(parts[-1], None)
+    else:
+        target[parts[-1]] = _transform(target.get(parts[-1]), value, now)
+
+
+def _get_path(data, parts):
+    for part in parts:
+        if not isinstance(data, dict) or part not in data:
+            raise KeyError(".".join(parts))
+        data = data[part]
+    return data
+
+
+def _project(data, field_paths):
+    if field_paths is None:
+        return _copy(data)
+    projected = {}
+    for path in field_paths:
+        parts = FieldPath.from_api_repr(path).parts
+        try:
+            value = _get_path(data, parts)
+        except KeyError:
+            continue
+        _set_path(projected, parts, value, None)
+    return projected
+
+
+_OPERATORS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "in": lambda a, b: a in b,
+    "not-in": lambda a, b: a not in b,
+    "array_contains": lambda a, b: isinstance(a, list) and b in a,
+    "array_contains_any": lambda a, b: isinstance(a, list) and any(v in a for v in b),
+}
+
+
+# ======================================================
+#               STORE
+# ======================================================
+
+class _Document:
+    __slots__ = ("data", "create_time", "update_time")
+
+    def __init__(self, data, create_time, update_time):
+        self.data = data
+        self.create_time = create_time
+        self.update_time = update_time
+
+
+class Store:
+    """Documents by collection path, optionally written through to SQLite"""
+
+    def __init__(self, path: str = None):
+        self.lock = threading.RLock()
+        self.collections = {}       # collection path -> {doc id -> _Document}
+        self.watches = {}           # collection path -> [Watch]
+        self._last_time = None
+        self._sql = None
+        if path:
+            self._sql = sqlite3.connect(path, check_same_thread=False)
+            self._sql.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                " collection TEXT NOT NULL, id TEXT NOT NULL, data BLOB NOT NULL,"
+                " create_time TEXT NOT NULL, update_time TEXT NOT NULL,"
+                " PRIMARY KEY (collection, id))"
+            )
+            self._load()
+
+    def _load(self):
+        rows = self._sql.execute("SELECT collection, id, data, create_time, update_time FROM documents")
+        for collection, doc_id, data, create_time, update_time in rows:
+            self.collections.setdefault(collection, {})[doc_id] = _Document(
+                pickle.loads(data), Timestamp.from_rfc3339(create_time), Timestamp.from_rfc3339(update_time))
+
+    def next_time(self):
+        """Strictly increasing commit timestamps, like Firestore's update_time"""
+        now = Timestamp.now()
+        if self._last_time is not None and now <= self._last_time:
+            now = self._last_time + timedelta(microseconds=1)
+        self._last_time = now
+        return now
+
+    def get(self, collection, doc_id):
+        return self.collections.get(collection, {}).get(doc_id)
+
+    def put(self, collection, doc_id, document):
+        self.collections.setdefault(collection, {})[doc_id] = document
+        self._changed(collection, doc_id, document)
+        if self._sql is not None:
+            self._sql.execute(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?)",
+                (collection, doc_id, pickle.dumps(document.data),
+                 document.create_time.rfc3339(), document.update_time.rfc3339()))
+
+    def remove(self, collection, doc_id):
+        docs = self.collections.get(collection)
+        if docs is not None:
+            docs.pop(doc_id, None)
+            if not docs:
+                del self.collections[collection]
+        self._changed(collection, doc_id, None)
+        if self._sql is not None:
+            self._sql.execute("DELETE FROM documents WHERE collection = ? AND id = ?", (collection, doc_id))
+
+    def flush(self):
+        if self._sql is not None:
+            self._sql.commit()
+
+    def clear(self):
+        with self.lock:
+            for collection in self.watches:
+                for doc_id in self.collections.get(collection, {}):
+                    self._changed(collection, doc_id, None)
+            self.collections.clear()
+            if self._sql is not None:
+                self._sql.execute("DELETE FROM documents")
+                self._sql.commit()
+            self.notify(self.next_time())
+
+    def _changed(self, collection, doc_id, document):
+        for watch in self.watches.get(collection, ()):
+            watch._pending[doc_id] = document
+
+    def notify(self, read_time):
+        """Hand the changes of one commit to the listeners (called under the lock)"""
+        for watches in self.watches.values():
+            for watch in watches:
+                if watch._pending:
+                    watch._enqueue(watch._pending, read_time)
+                    watch._pending = {}
+
+
+# ======================================================
+#               LATENCY / FAULT INJECTION
+# ======================================================
+# Simulated RPCs: "get", "get_all", "query", "list", "commit" and "listen"
+# (delivery of one change-feed update to a snapshot listener).
+#
+# LOCAL_STORE_LATENCY   per-op delay distributions, "*" for the rest, e.g.
+#                       "get=lognormal:40:0.35,commit=normal:60:15,*=uniform:20:80"
+#                       fixed:<ms> | uniform:<lo>:<hi> | normal:<mean>:<sd> |
+#                       lognormal:<median>:<sigma>
+# LOCAL_STORE_JITTER_MS  extra uniform 0..N ms on every RPC
+# LOCAL_STORE_PER_DOC_MS transfer time per document returned (large streams)
+# LOCAL_STORE_ERRORS     failure probability per op, e.g. "commit=0.01,*=0.001";
+#                        failed RPCs raise ServiceUnavailable (or DeadlineExceeded
+#                        when the drawn delay exceeds LOCAL_STORE_DEADLINE_MS)
+# LOCAL_STORE_LATENCY_MS shorthand for "*=fixed:<ms>"
+
+def _distribution(spec: str):
+    kind, *params = spec.split(":")
+    params = [float(p) for p in params]
+    if kind == "fixed":
+        return lambda rng: params[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(params[0], params[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(params[0], params[1]))
+    if kind == "lognormal":
+        # median * exp(N(0, sigma)): long right tail like real round trips
+        return lambda rng: params[0] * math.exp(rng.gauss(0.0, params[1]))
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def _per_op(spec: str, parse):
+    table = {}
+    for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+        op, _, value = item.partition("=")
+        table[op.strip()] = parse(value.strip())
+    return table
+
+
+class FaultModel:
+    """Delays (and optionally fails) simulated RPCs"""
+
+    def __init__(self, latency=None, jitter_ms=0.0, per_doc_ms=0.0, errors=None,
+                 deadline_ms=None, seed=None):
+        self.latency = latency or {}        # op -> callable(rng) -> ms
+        self.jitter_ms = jitter_ms
+        self.per_doc_ms = per_doc_ms
+        self.errors = errors or {}          # op -> probability
+        self.deadline_ms = deadline_ms
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def parse(cls, latency: str = "", jitter_ms: float = 0.0, per_doc_ms: float = 0.0,
+              errors: str = "", deadline_ms: float = None, seed=None):
+        return cls(_per_op(latency, _distribution), jitter_ms, per_doc_ms,
+                   _per_op(errors, float), deadline_ms, seed)
+
+    @classmethod
+    def from_env(cls):
+        latency = os.getenv("LOCAL_STORE_LATENCY", "")
+        fixed = os.getenv("LOCAL_STORE_LATENCY_MS")
+        if fixed and not latency:
+            latency = f"*=fixed:{fixed}"
+        deadline = os.getenv("LOCAL_STORE_DEADLINE_MS")
+        seed = os.getenv("LOCAL_STORE_FAULT_SEED")
+        return cls.parse(
+            latency,
+            float(os.getenv("LOCAL_STORE_JITTER_MS", "0")),
+            float(os.getenv("LOCAL_STORE_PER_DOC_MS", "0")),
+            os.getenv("LOCAL_STORE_ERRORS", ""),
+            float(deadline) if deadline else None,
+            int(seed) if seed else None,
+        )
+
+    @property
+    def active(self):
+        return bool(self.latency or self.jitter_ms or self.per_doc_ms or self.errors)
+
+    def _lookup(self, table, op):
+        return table.get(op, table.get("*"))
+
+    def delay_ms(self, op, docs=0):
+        with self._lock:
+            dist = self._lookup(self.latency, op)
+            delay = dist(self._rng) if dist else 0.0
+            if self.jitter_ms:
+                delay += self._rng.uniform(0.0, self.jitter_ms)
+            failed = self._rng.random() < (self._lookup(self.errors, op) or 0.0)
+        return delay + self.per_doc_ms * docs, failed
+
+    def apply(self, op, docs=0):
+        delay, failed = self.delay_ms(op, docs)
+        if self.deadline_ms is not None and delay > self.deadline_ms:
+            time.sleep(self.deadline_ms / 1000)
+            raise DeadlineExceeded(f"Injected: {op} exceeded {self.deadline_ms:.0f} ms deadline")
+        if delay:
+            time.sleep(delay / 1000)
+        if failed:
+            raise ServiceUnavailable(f"Injected: {op} failed")
+
+
+# ======================================================
+#               CLIENT API
+# ======================================================
+
+class WriteResult:
+    def __init__(self, update_time):
+        self.update_time = update_time
+
+
+class LastUpdateOption:
+    def __init__(self, last_update_time):
+        self.last_update_time = last_update_time
+
+    def check(self, document):
+        if document is None:
+            raise NotFound("Document does not exist")
+        if document.update_time != self.last_update_time:
+            raise FailedPrecondition("Document was modified since last_update_time")
+
+
+class DocumentSnapshot:
+    def __init__(self, reference, data, create_time=None, update_time=None):
+        self.reference = reference
+        self._data = data
+        self.create_time = create_time
+        self.update_time = update_time
+
+    @property
+    def id(self):
+        return self.reference.id
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        # A fresh copy, like Firestore: callers mutate what they get back
+        return None if self._data is None else _copy(self._data)
+
+    def get(self, field_path):
+        if self._data is None:
+            return None
+        return _copy(_get_path(self._data, FieldPath.from_api_repr(field_path).parts))
+
+
+class Query:
+    def __init__(self, client, collection_path, filters=(), projection=None, limit=None, orders=()):
+        self._client = client
+        self._collection = collection_path
+        self._filters = tuple(filters)
+        self._projection = projection
+        self._limit = limit
+        self._orders = tuple(orders)
+
+    def _copy_with(self, **changes):
+        args = dict(filters=self._filters, projection=self._projection, limit=self._limit, orders=self._orders)
+        args.update(changes)
+        return Query(self._client, self._collection, **args)
+
+    def where(self, field_path, op_string, value):
+        return self._copy_with(filters=self._filters + ((FieldPath.from_api_repr(field_path).parts, op_string, value),))
+
+    def select(self, field_paths):
+        return self._copy_with(projection=list(field_paths))
+
+    def limit(self, count):
+        return self._copy_with(limit=count)
+
+    def order_by(self, field_path, direction="ASCENDING"):
+        return self._copy_with(orders=self._orders + ((FieldPath.from_api_repr(field_path).parts, direction),))
+
+    def _matches(self, data):
+        for parts, op, value in self._filters:
+            try:
+                if not _OPERATORS[op](_get_path(data, parts), value):
+                    return False
+            except (KeyError, TypeError):
+                return False
+        return True
+
+    def stream(self, transaction=None):
+        client = self._client
+        store = client._store
+        with store.lock:
+            docs = sorted(store.collections.get(self._collection, {}).items())
+            matched = [(doc_id, doc) for doc_id, doc in docs if self._matches(doc.data)]
+            for parts, direction in self._orders:
+                matched.sort(key=lambda item: _sort_key(item[1].data, parts),
+                             reverse=direction == "DESCENDING")
+            if self._limit is not None:
+                matched = matched[:self._limit]
+            results = [
+                DocumentSnapshot(DocumentReference(client, self._collection, doc_id),
+                                 _project(doc.data, self._projection), doc.create_time, doc.update_time)
+                for doc_id, doc in matched
+            ]
+        client._round_trip("query", len(results))
+        return iter(results)
+
+    def get(self, transaction=None):
+        return list(self.stream())
+
+
+def _sort_key(data, parts):
+    try:
+        value = _get_path(data, parts)
+    except KeyError:
+        return (0, "")
+    return (1, value)
+
+
+class CollectionReference(Query):
+    def __init__(self, client, path):
+        super().__init__(client, path)
+        self._path = tuple(path.split("/"))
+
+    @property
+    def id(self):
+        return self._path[-1]
+
+    @property
+    def parent(self):
+        if len(self._path) == 1:
+            return None
+        return DocumentReference(self._client, "/".join(self._path[:-2]), self._path[-2])
+
+    def document(self, document_id=None):
+        return DocumentReference(self._client, self._collection, document_id or uuid.uuid4().hex[:20])
+
+    def add(self, document_data, document_id=None):
+        ref = self.document(document_id)
+        return ref.create(document_data), ref
+
+    def list_documents(self, page_size=None):
+        with self._client._store.lock:
+            ids = sorted(self._client._store.collections.get(self._collection, {}))
+        self._client._round_trip("list", len(ids))
+        return iter([DocumentReference(self._client, self._collection, doc_id) for doc_id in ids])
+
+    def on_snapshot(self, callback):
+        return Watch(self._client, self._collection, callback)
+
+
+class DocumentReference:
+    def __init__(self, client, collection_path, document_id):
+        self._client = client
+        self._collection = collection_path
+        self.id = document_id
+
+    @property
+    def path(self):
+        return f"{self._collection}/{self.id}"
+
+    @property
+    def _path(self):
+        return tuple(self.path.split("/"))
+
+    @property
+    def parent(self):
+        return CollectionReference(self._client, self._collection)
+
+    def __eq__(self, other):
+        return isinstance(other, DocumentReference) and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+    def collection(self, collection_id):
+        return CollectionReference(self._client, f"{self.path}/{collection_id}")
+
+    def get(self, field_paths=None, transaction=None):
+        self._client._round_trip("get")
+        store = self._client._store
+        with store.lock:
+            doc = store.get(self._collection, self.id)
+            if doc is None:
+                return DocumentSnapshot(self, None)
+            return DocumentSnapshot(self, _project(doc.data, field_paths), doc.create_time, doc.update_time)
+
+    def _commit(self, write):
+        batch = WriteBatch(self._client)
+        batch._writes.append(write)
+        return batch.commit()[0]
+
+    def set(self, document_data, merge=False):
+        return self._commit(("set", self, document_data, merge, None))
+
+    def create(self, document_data):
+        return self._commit(("create", self, document_data, False, None))
+
+    def update(self, field_updates, option=None):
+        return self._commit(("update", self, field_updates, False, option))
+
+    def delete(self, option=None):
+        return self._commit(("delete", self, None, False, option)).update_time
+
+
+class WriteBatch:
+    """Writes applied atomically on commit (all preconditions checked first)"""
+
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def set(self, reference, document_data, merge=False):
+        self._writes.append(("set", reference, document_data, merge, None))
+        return self
+
+    def create(self, reference, document_data):
+        self._writes.append(("create", reference, document_data, False, None))
+        return self
+
+    def update(self, reference, field_updates, option=None):
+        self._writes.append(("update", reference, field_updates, False, option))
+        return self
+
+    def delete(self, reference, option=None):
+        self._writes.append(("delete", reference, None, False, option))
+        return self
+
+    def __len__(self):
+        return len(self._writes)
+
+    def commit(self):
+        client = self._client
+        client._round_trip("commit", len(self._writes))
+        store = client._store
+        with store.lock:
+            for kind, ref, _, _, option in self._writes:
+                current = store.get(ref._collection, ref.id)
+                if option is not None:
+                    option.check(current)
+                if kind == "update" and current is None:
+                    raise NotFound(f"No document to update: {ref.path}")
+                if kind == "create" and current is not None:
+                    raise AlreadyExists(f"Document already exists: {ref.path}")
+
+            now = store.next_time()
+            results = []
+            for kind, ref, data, merge, _ in self._writes:
+                current = store.get(ref._collection, ref.id)
+                if kind == "delete":
+                    store.remove(ref._collection, ref.id)
+                    results.append(WriteResult(now))
+                    continue
+
+                if kind == "update":
+                    new_data = _copy(current.data)
+                    for path, value in data.items():
+                        _set_path(new_data, FieldPath.from_api_repr(path).parts, value, now)
+                elif merge and current is not None:
+                    new_data = _copy(current.data)
+                    _merge(new_data, data, now)
+                else:
+                    new_data = {}
+                    _merge(new_data, data, now)
+
+                created = current.create_time if current is not None else now
+                store.put(ref._collection, ref.id, _Document(new_data, created, now))
+                results.append(WriteResult(now))
+            store.flush()
+            store.notify(now)
+        self._writes = []
+        return results
+
+
+# ======================================================
+#               SNAPSHOT LISTENERS (simulated change feed)
+# ======================================================
+
+class ChangeType(enum.Enum):
+    """Mirrors google.cloud.firestore_v1.watch.ChangeType"""
+    ADDED = 1
+    REMOVED = 2
+    MODIFIED = 3
+
+
+class DocumentChange:
+    def __init__(self, type, document, old_index, new_index):
+        self.type = type
+        self.document = document
+        self.old_index = old_index
+        self.new_index = new_index
+
+
+class Watch:
+    """
+    Listener on one collection. callback(docs, changes, read_time) runs on the
+    watch's own thread: first with every document ADDED, then once per commit
+    that touched the collection, in commit order, like Firestore's on_snapshot.
+    """
+
+    def __init__(self, client, collection_path, callback):
+        self._client = client
+        self._collection = collection_path
+        self._callback = callback
+        self._docs = {}         # doc id -> DocumentSnapshot as last delivered
+        self._pending = {}      # doc id -> _Document (None = removed), filled under the store lock
+        self._queue = queue.Queue()
+        self._closed = False
+        store = client._store
+        with store.lock:
+            store.watches.setdefault(collection_path, []).append(self)
+            self._enqueue(dict(store.collections.get(collection_path, {})), Timestamp.now())
+        self._thread = threading.Thread(target=self._run, name=f"watch:{collection_path}", daemon=True)
+        self._thread.start()
+
+    def unsubscribe(self):
+        store = self._client._store
+        with store.lock:
+            watches = store.watches.get(self._collection, [])
+            if self in watches:
+                watches.remove(self)
+            if not watches:
+                store.watches.pop(self._collection, None)
+        self._closed = True
+        self._queue.put(None)
+
+    def _enqueue(self, updates, read_time):
+        self._queue.put((updates, read_time))
+
+    def _run(self):
+        first = True
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            updates, read_time = item
+            try:
+                # Propagation delay of the change feed
+                self._client._round_trip("listen", len(updates))
+            except Exception:
+                pass
+            changes = self._apply(updates)
+            if changes or first:
+                docs = [self._docs[doc_id] for doc_id in sorted(self._docs)]
+                try:
+                    self._callback(docs, changes, read_time)
+                except Exception:
+                    logger.exception("Snapshot listener on %s failed", self._collection)
+            first = False
+
+    def _apply(self, updates):
+        old_order = {doc_id: i for i, doc_id in enumerate(sorted(self._docs))}
+        changes = []
+        for doc_id, document in sorted(updates.items()):
+            ref = DocumentReference(self._client, self._collection, doc_id)
+            old_index = old_order.get(doc_id, -1)
+            if document is None:
+                if doc_id in self._docs:
+                    changes.append(DocumentChange(ChangeType.REMOVED, self._docs.pop(doc_id), old_index, -1))
+                continue
+            snap = DocumentSnapshot(ref, _copy(document.data), document.create_time, document.update_time)
+            change_type = ChangeType.MODIFIED if doc_id in self._docs else ChangeType.ADDED
+            self._docs[doc_id] = snap
+            changes.append(DocumentChange(change_type, snap, old_index, -1))
+        if changes:
+            new_order = {doc_id: i for i, doc_id in enumerate(sorted(self._docs))}
+            for change in changes:
+                if change.type is not ChangeType.REMOVED:
+                    change.new_index = new_order[change.document.id]
+        return changes
+
+
+class Client:
+    def __init__(self, store: Store, faults: FaultModel = None):
+        self._store = store
+        self.faults = faults or FaultModel()
+
+    def collection(self, collection_path):
+        return CollectionReference(self, collection_path)
+
+    def document(self, document_path):
+        collection, _, doc_id = document_path.rpartition("/")
+        return DocumentReference(self, collection, doc_id)
+
+    def collections(self):
+        with self._store.lock:
+            names = sorted(c for c in self._store.collections if "/" not in c)
+        return iter([CollectionReference(self, name) for name in names])
+
+    def batch(self):
+        return WriteBatch(self)
+
+    def write_option(self, last_update_time=None, **kwargs):
+        return LastUpdateOption(last_update_time)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        store = self._store
+        with store.lock:
+            snaps = []
+            for ref in references:
+                doc = store.get(ref._collection, ref.id)
+                if doc is None:
+                    snaps.append(DocumentSnapshot(ref, None))
+                else:
+                    snaps.append(DocumentSnapshot(ref, _project(doc.data, field_paths),
+                                                  doc.create_time, doc.update_time))
+        self._round_trip("get_all", len(snaps))
+        return iter(snaps)
+
+    def reset(self):
+        """Drop every document (benchmarks / tests)"""
+        self._store.clear()
+
+    def _round_trip(self, op, docs=0):
+        """Called once per simulated RPC (never while holding the store lock)"""
+        if self.faults.active:
+            self.faults.apply(op, docs)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def client():
+    """Process-wide client over LOCAL_STORE_PATH (SQLite) or a fresh in-memory store"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = Client(Store(os.getenv("LOCAL_STORE_PATH") or None), FaultModel.from_env())
+        return _client
@@ -0,0 +1,209 @@
+# api/services/metrics.py
+"""
+In-process metrics rendered in the Prometheus text format (served at /metrics).
+
+Values are per worker process; scrape every worker (or run a single worker)
+when several uvicorn workers are used.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from services import instrumentation
+
+# Request / calculation latency buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock = threading.Lock()
+_registry = []
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        _registry.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with _lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_samples(items))
+        return lines
+
+    def _render_samples(self, items):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in items]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry["buckets"][i] += 1
+                    break
+            entry["sum"] += value
+            entry["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_samples(self, items):
+        lines = []
+        for key, entry in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry["buckets"]):
+                cumulative += count
+                le = _format_labels(self.labelnames, key, [("le", _format_value(float(bound)))])
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(entry['sum'])}")
+            lines.append(f"{self.name}_count{labels} {entry['count']}")
+        return lines
+
+
+def render():
+    """All registered metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ======================================================
+#               API METRICS
+# ======================================================
+
+REQUEST_LATENCY = Histogram(
+    "api_request_duration_seconds", "Request latency by route", ("method", "route", "status"))
+REQUESTS_IN_FLIGHT = Gauge(
+    "api_requests_in_flight", "Requests currently being served")
+STORAGE_OPS = Counter(
+    "api_storage_operations_total", "Firestore documents read / written / deleted", ("op", "kind"))
+STORAGE_SECONDS = Counter(
+    "api_storage_seconds_total", "Time spent waiting on Firestore", ("op", "kind"))
+UPLOAD_ROWS = Counter(
+    "api_upload_rows_total", "Rows processed by the upload endpoints", ("upload", "outcome"))
+RESULT_CALCULATION = Histogram(
+    "api_result_calculation_seconds", "Duration of a course result calculation")
+RESULT_CALCULATION_STUDENTS = Counter(
+    "api_result_calculation_students_total", "Students processed by result calculations")
+ROSTER_CACHE = Counter(
+    "api_roster_cache_total", "Roster cache lookups and removals", ("result",))
+ROSTER_CACHE_ENTRIES = Gauge(
+    "api_roster_cache_entries", "Course rosters currently cached")
+RESULT_SNAPSHOT_LOOKUPS = Counter(
+    "api_result_snapshot_lookups_total", "Student result lookups served from published snapshots", ("outcome",))
+RESULT_SNAPSHOTS_LOADED = Gauge(
+    "api_result_snapshots_loaded", "Published result snapshots held in memory")
+MIRROR_CHANGES = Counter(
+    "api_mirror_changes_total", "Document changes applied to the listener mirror", ("collection",))
+MIRROR_COLLECTIONS = Gauge(
+    "api_mirror_course_listeners", "Course collections with an active snapshot listener")
+MIRROR_READS = Counter(
+    "api_mirror_reads_total", "Reads served from the listener mirror or falling back", ("read", "outcome"))
+SINGLEFLIGHT = Counter(
+    "api_singleflight_total", "Coalescable reads: leader fetched, shared joined an in-flight fetch", ("read", "result"))
+EVENTS_PUBLISHED = Counter(
+    "api_events_published_total", "Live update events published to course streams", ("event",))
+EVENT_STREAMS = Gauge(
+    "api_event_streams", "Open Server-Sent Events streams")
+EVENT_RELOADS = Counter(
+    "api_event_reloads_total", "Streams told to refetch instead of receiving the missed events", ("reason",))
+
+
+@instrumentation.add_request_start_listener
+def _request_started(stats):
+    REQUESTS_IN_FLIGHT.inc()
+
+
+@instrumentation.add_stream_listener
+def _stream_started(stats):
+    # Open streams are counted by api_event_streams, not as requests in flight
+    REQUESTS_IN_FLIGHT.dec()
+
+
+@instrumentation.add_request_listener
+def _request_finished(stats):
+    if stats.streaming:
+        # Their duration is how long the page stayed open, not a latency
+        return
+    REQUESTS_IN_FLIGHT.dec()
+    # Unmatched paths are collapsed so random URLs cannot blow up the label set
+    route = stats.route if stats.matched else "<unmatched>"
+    REQUEST_LATENCY.observe(stats.duration_ms / 1000, method=stats.method, route=route, status=stats.status)
+
+
+@instrumentation.add_op_listener
+def _storage_op(op, kind, count, elapsed_ms):
+    STORAGE_OPS.inc(count, op=op, kind=kind)
+    STORAGE_SECONDS.inc(elapsed_ms / 1000, op=op, kind=kind)
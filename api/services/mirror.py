@@ -0,0 +1,176 @@
+# api/services/mirror.py
+"""
+Optional in-memory mirror of _courses and of active course rosters, kept up
+to date by snapshot listeners (FIRESTORE_MIRROR=1).
+
+Instead of polling or TTLs, each worker subscribes to _courses and, on first
+use, to a course's <course> collection, and applies the change deltas as they
+arrive. Course lists, rosters and marks are then served from memory, and
+roster / marks ETags come from the mirror itself (no version read), so an
+unchanged teacher page costs nothing.
+
+- At most MIRROR_MAX_COURSES course listeners are kept (least recently used
+  are closed); a course removed from _courses is closed right away
+- A course is served from the mirror once its first snapshot has arrived
+  (waiting up to MIRROR_READY_TIMEOUT seconds), else reads fall back to the
+  roster cache
+- A listener that has stopped is replaced on the next read
+- Listener updates are billed like reads (one per changed document), so the
+  mode pays off for courses that are read more often than they change
+- Deltas arrive asynchronously (usually within milliseconds): a page loaded
+  right after a save can still show the previous state, tagged with the
+  previous ETag, so the next load picks the change up
+
+With STORAGE_BACKEND=local the change feed is simulated (local_store.Watch).
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from services.firestore_client import db, COL_COURSES, RosterDocument
+from services.metrics import MIRROR_CHANGES, MIRROR_COLLECTIONS, MIRROR_READS
+
+MIRROR_ENABLED = os.getenv("FIRESTORE_MIRROR", "").lower() in ("1", "true", "yes", "on")
+MIRROR_MAX_COURSES = int(os.getenv("MIRROR_MAX_COURSES", "100"))
+MIRROR_READY_TIMEOUT = float(os.getenv("MIRROR_READY_TIMEOUT", "10"))
+
+
+class CollectionMirror:
+    """Documents of one collection, updated by its snapshot listener"""
+
+    def __init__(self, name: str, on_removed=None):
+        self.name = name
+        self._on_removed = on_removed
+        self._lock = threading.Lock()
+        self._docs = {}             # doc id -> RosterDocument
+        self._documents = None      # sorted tuple, rebuilt after changes
+        self._count = 0
+        self._latest = ""           # newest update_time applied
+        self.ready = threading.Event()
+        self.watch = db.collection(name).on_snapshot(self._on_snapshot)
+
+    def _on_snapshot(self, docs, changes, read_time):
+        removed = []
+        with self._lock:
+            for change in changes:
+                doc = change.document
+                if change.type.name == "REMOVED":
+                    self._docs.pop(doc.id, None)
+                    removed.append(doc.id)
+                    continue
+                self._docs[doc.id] = RosterDocument(doc.id, doc.to_dict() or {}, doc.update_time)
+                if doc.update_time is not None:
+                    self._latest = max(self._latest, doc.update_time.rfc3339())
+            self._count = len(self._docs)
+            self._documents = None
+        MIRROR_CHANGES.inc(len(changes), collection="courses" if self.name == COL_COURSES else "roster")
+        self.ready.set()
+        if self._on_removed:
+            for doc_id in removed:
+                self._on_removed(doc_id)
+
+    @property
+    def alive(self):
+        return not getattr(self.watch, "_closed", False)
+
+    def documents(self):
+        with self._lock:
+            if self._documents is None:
+                self._documents = tuple(self._docs[doc_id] for doc_id in sorted(self._docs))
+            return self._documents
+
+    def token(self):
+        """
+        Changes whenever the mirrored data does: a write raises the newest
+        update_time, a delete lowers the count.
+        """
+        with self._lock:
+            return f"{self._count}-{self._latest}"
+
+    def close(self):
+        self.watch.unsubscribe()
+
+
+_lock = threading.Lock()
+_courses = None                 # CollectionMirror of _courses
+_rosters = OrderedDict()        # course_code -> CollectionMirror, least recently used first
+
+
+def _ready(collection_mirror):
+    if collection_mirror is None or not collection_mirror.ready.wait(MIRROR_READY_TIMEOUT):
+        return None
+    return collection_mirror
+
+
+def _course_removed(course_code: str):
+    with _lock:
+        collection_mirror = _rosters.pop(course_code, None)
+        MIRROR_COLLECTIONS.set(len(_rosters))
+    if collection_mirror is not None:
+        collection_mirror.close()
+
+
+def _roster_mirror(course_code: str):
+    """The course's mirror, subscribing (and evicting the oldest) when needed"""
+    evicted = []
+    with _lock:
+        collection_mirror = _rosters.get(course_code)
+        if collection_mirror is not None and not collection_mirror.alive:
+            del _rosters[course_code]
+            collection_mirror = None
+        if collection_mirror is None:
+            collection_mirror = _rosters[course_code] = CollectionMirror(course_code)
+            while len(_rosters) > MIRROR_MAX_COURSES:
+                evicted.append(_rosters.popitem(last=False)[1])
+            MIRROR_COLLECTIONS.set(len(_rosters))
+        _rosters.move_to_end(course_code)
+    for old in evicted:
+        old.close()
+    return _ready(collection_mirror)
+
+
+def _courses_mirror():
+    global _courses
+    with _lock:
+        if _courses is None or not _courses.alive:
+            _courses = CollectionMirror(COL_COURSES, on_removed=_course_removed)
+        collection_mirror = _courses
+    return _ready(collection_mirror)
+
+
+def roster(course_code: str):
+    """Roster documents of a course (tuple of RosterDocument), or None to read Firestore"""
+    collection_mirror = _roster_mirror(course_code)
+    MIRROR_READS.inc(read="roster", outcome="served" if collection_mirror else "fallback")
+    return collection_mirror.documents() if collection_mirror else None
+
+
+def roster_token(course_code: str):
+    """ETag component for the mirrored roster / marks, or None when not mirrored"""
+    collection_mirror = _roster_mirror(course_code)
+    return collection_mirror.token() if collection_mirror else None
+
+
+def courses_token():
+    """Version component for the mirrored course list, or None when not mirrored"""
+    collection_mirror = _courses_mirror()
+    return collection_mirror.token() if collection_mirror else None
+
+
+def courses():
+    """_courses documents, or None to read Firestore"""
+    collection_mirror = _courses_mirror()
+    MIRROR_READS.inc(read="courses", outcome="served" if collection_mirror else "fallback")
+    return collection_mirror.documents() if collection_mirror else None
+
+
+def close():
+    """Stop every listener (the mirror is rebuilt on the next read)"""
+    global _courses
+    with _lock:
+        mirrors = list(_rosters.values()) + ([_courses] if _courses else [])
+        _rosters.clear()
+        _courses = None
+        MIRROR_COLLECTIONS.set(0)
+    for collection_mirror in mirrors:
+        collection_mirror.close()
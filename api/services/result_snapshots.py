@@ -0,0 +1,227 @@
+# api/services/result_snapshots.py
+"""
+Published result snapshots: frozen, versioned copies of results_<course>
+that API workers keep in memory, so student result lookups on release day
+cost no Firestore reads.
+
+Layout:
+    _published_results/<course>                          pointer {version, parts, students, sha256...}
+    _published_results/<course>/snapshots/v<N>-<part>    {data: zlib(JSON {rollno: result})}
+
+Parts are created (never overwritten) before the pointer moves to them, so a
+worker always loads a complete version. Documents are capped at 1 MiB, hence
+the parts. The previous version is kept for workers still loading it; older
+ones are deleted on publish.
+
+Workers re-check the pointer at most every RESULT_SNAPSHOT_CHECK_SECONDS per
+course (one read), so a new publish reaches every worker within that time.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+
+from services.firebase import db, chunked, DocumentExists
+from services.metrics import RESULT_SNAPSHOT_LOOKUPS, RESULT_SNAPSHOTS_LOADED
+
+logger = logging.getLogger(__name__)
+
+COL_PUBLISHED_RESULTS = "_published_results"
+SNAPSHOTS = "snapshots"
+# Room below Firestore's 1 MiB document limit
+PART_BYTES = 900_000
+# Firestore caps a commit request at 10 MiB
+PARTS_PER_BATCH = 8
+RESULT_SNAPSHOT_CHECK_SECONDS = float(os.getenv("RESULT_SNAPSHOT_CHECK_SECONDS", "10"))
+
+
+class SnapshotConflict(Exception):
+    """Another publish of the same course took this version first"""
+
+
+class Snapshot:
+    """One loaded version: results by rollno plus the pointer metadata"""
+
+    def __init__(self, course_code, version, published_at, results):
+        self.course_code = course_code
+        self.version = version
+        self.published_at = published_at
+        self.results = results
+        self.etag = f'W/"published{version}"'
+
+
+_lock = threading.Lock()
+_snapshots = {}         # course_code -> Snapshot, or None when nothing is published
+_checked_at = {}        # course_code -> monotonic time of the last pointer read
+_refreshing = set()     # courses whose pointer is being re-read right now
+
+
+def pointer_ref(course_code: str):
+    return db.collection(COL_PUBLISHED_RESULTS).document(course_code)
+
+
+def snapshots_collection(course_code: str):
+    return pointer_ref(course_code).collection(SNAPSHOTS)
+
+
+def part_id(version: int, index: int):
+    return f"v{version}-{index}"
+
+
+def encode(results: dict):
+    return zlib.compress(json.dumps(results, separators=(",", ":"), sort_keys=True, default=str).encode(), 9)
+
+
+# ======================================================
+#                       PUBLISH
+# ======================================================
+
+def publish(course_code: str):
+    """
+    Freeze results_<course> into a new snapshot version and point to it.
+    Returns the pointer document; raises LookupError when there are no results.
+    """
+    results = {doc.id: doc.to_dict() for doc in db.collection(f"results_{course_code}").stream()}
+    if not results:
+        raise LookupError(f"No results found for course '{course_code}'")
+
+    current = pointer_ref(course_code).get()
+    previous = (current.to_dict() or {}).get("version", 0) if current.exists else 0
+    col = snapshots_collection(course_code)
+    existing = list(col.list_documents())
+    # Parts left behind by an interrupted publish also use up their version
+    version = max([previous] + [_version_of(ref.id) for ref in existing]) + 1
+
+    payload = encode(results)
+    parts = [payload[i:i + PART_BYTES] for i in range(0, len(payload), PART_BYTES)]
+    try:
+        for chunk in chunked(list(enumerate(parts)), size=PARTS_PER_BATCH):
+            batch = db.batch()
+            for index, data in chunk:
+                batch.create(col.document(part_id(version, index)), {"data": data})
+            batch.commit()
+    except DocumentExists:
+        raise SnapshotConflict(f"Results of '{course_code}' are being published by someone else")
+
+    pointer = {
+        "course": course_code,
+        "version": version,
+        "parts": len(parts),
+        "bytes": len(payload),
+        "sha256": hashlib.sha256(payload).hexdigest(),
+        "students": len(results),
+        "published_at": datetime.now(timezone.utc).isoformat(),
+    }
+    pointer_ref(course_code).set(pointer)
+
+    # Keep the previous version for workers that are still loading it
+    stale = [ref for ref in existing if _version_of(ref.id) != previous]
+    for refs in chunked(stale):
+        batch = db.batch()
+        for ref in refs:
+            batch.delete(ref)
+        batch.commit()
+
+    # What other workers will decode (JSON types only)
+    frozen = json.loads(zlib.decompress(payload))
+    _install(course_code, Snapshot(course_code, version, pointer["published_at"], frozen))
+    return pointer
+
+
+def unpublish(course_code: str):
+    """Remove every snapshot of a course (lookups go back to results_<course>)"""
+    refs = list(snapshots_collection(course_code).list_documents())
+    for chunk in chunked(refs):
+        batch = db.batch()
+        for ref in chunk:
+            batch.delete(ref)
+        batch.commit()
+    pointer_ref(course_code).delete()
+    _install(course_code, None)
+    return len(refs)
+
+
+def _version_of(doc_id: str):
+    return int(doc_id[1:].split("-", 1)[0])
+
+
+# ======================================================
+#                       LOOKUPS
+# ======================================================
+
+def get_snapshot(course_code: str):
+    """
+    The published snapshot of a course (None when unpublished), from memory.
+    At most one request per worker re-reads the pointer when it is due; the
+    others keep using the loaded version meanwhile.
+    """
+    now = time.monotonic()
+    with _lock:
+        due = now - _checked_at.get(course_code, float("-inf")) >= RESULT_SNAPSHOT_CHECK_SECONDS
+        known = course_code in _snapshots
+        if not due or (known and course_code in _refreshing):
+            return _snapshots.get(course_code)
+        _refreshing.add(course_code)
+    try:
+        _refresh(course_code)
+    except Exception:
+        if _snapshots.get(course_code) is None:
+            raise
+        logger.exception("Result snapshot check for %s failed, serving the loaded version", course_code)
+    finally:
+        with _lock:
+            _refreshing.discard(course_code)
+    return _snapshots.get(course_code)
+
+
+def lookup(course_code: str, rollno: str):
+    """(snapshot, result) from the published snapshot; snapshot is None when unpublished"""
+    snapshot = get_snapshot(course_code)
+    if snapshot is None:
+        return None, None
+    result = snapshot.results.get(rollno)
+    RESULT_SNAPSHOT_LOOKUPS.inc(outcome="hit" if result is not None else "not_found")
+    return snapshot, result
+
+
+def _refresh(course_code: str):
+    pointer = pointer_ref(course_code).get()
+    loaded = _snapshots.get(course_code)
+    if not pointer.exists:
+        _install(course_code, None)
+        return
+    meta = pointer.to_dict()
+    if loaded is not None and loaded.version == meta["version"]:
+        _install(course_code, loaded)
+        return
+
+    col = snapshots_collection(course_code)
+    docs = db.get_all([col.document(part_id(meta["version"], i)) for i in range(meta["parts"])])
+    parts = {doc.id: doc.to_dict()["data"] for doc in docs if doc.exists}
+    payload = b"".join(parts.get(part_id(meta["version"], i), b"") for i in range(meta["parts"]))
+    if hashlib.sha256(payload).hexdigest() != meta["sha256"]:
+        # Superseded (and cleaned up) while we read it: retry on the next check
+        logger.warning("Result snapshot %s v%s is incomplete; retrying on the next check", course_code, meta["version"])
+        _install(course_code, loaded)
+        return
+    results = json.loads(zlib.decompress(payload))
+    _install(course_code, Snapshot(course_code, meta["version"], meta.get("published_at", ""), results))
+
+
+def _install(course_code: str, snapshot):
+    with _lock:
+        _snapshots[course_code] = snapshot
+        _checked_at[course_code] = time.monotonic()
+        RESULT_SNAPSHOTS_LOADED.set(sum(1 for s in _snapshots.values() if s is not None))
+
+
+def clear():
+    """Forget every loaded snapshot (they are re-read on the next lookup)"""
+    with _lock:
+        _snapshots.clear()
+        _checked_at.clear()
+        RESULT_SNAPSHOTS_LOADED.set(0)
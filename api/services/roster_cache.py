@@ -0,0 +1,103 @@
+# api/services/roster_cache.py
+"""
+Process-local read-through cache of course rosters (<course>/<rollno> documents).
+
+Teacher pages, searches, exports and result calculation all read the whole
+roster; with this cache repeated loads of the same course cost one read (the
+course's version document, see services/versions.py) instead of one per student.
+
+- An entry is only reused while the course's roster / marks version is the one
+  it was loaded at, so writes made through any worker are seen immediately
+- At most ROSTER_CACHE_SIZE courses are kept (least recently used are evicted)
+- Entries expire after ROSTER_CACHE_TTL seconds, which bounds staleness for
+  writes that bypass the version document (manual console edits...)
+- Every versions.bump() of roster / marks invalidates the course early to
+  free the memory
+
+Set either variable to 0 to disable caching.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from services import mirror, versions
+from services.firestore_client import db, RosterDocument
+from services.metrics import ROSTER_CACHE, ROSTER_CACHE_ENTRIES
+
+ROSTER_CACHE_SIZE = int(os.getenv("ROSTER_CACHE_SIZE", "64"))
+ROSTER_CACHE_TTL = float(os.getenv("ROSTER_CACHE_TTL", "30"))
+
+_lock = threading.Lock()
+_entries = OrderedDict()    # course_code -> (loaded_at, version, documents)
+_generations = {}           # course_code -> bumped by every invalidate()
+_epoch = 0                  # bumped by clear()
+
+
+def get_roster(course_code: str, version=None):
+    """
+    All roster documents of a course (a tuple of RosterDocument).
+    Pass versions.roster_version(...) when the caller has already read the
+    course versions; otherwise they are read here. Served from the listener
+    mirror instead when FIRESTORE_MIRROR is on (see services/mirror.py).
+    """
+    if mirror.MIRROR_ENABLED:
+        documents = mirror.roster(course_code)
+        if documents is not None:
+            return documents
+    if version is None:
+        version = versions.roster_version(versions.read_versions(course_code))
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(course_code)
+        if entry and now - entry[0] < ROSTER_CACHE_TTL and entry[1] == version:
+            _entries.move_to_end(course_code)
+            ROSTER_CACHE.inc(result="hit")
+            return entry[2]
+        if entry:
+            del _entries[course_code]
+        generation = (_epoch, _generations.get(course_code, 0))
+    if entry:
+        ROSTER_CACHE.inc(result="stale" if entry[1] != version else "expired")
+    else:
+        ROSTER_CACHE.inc(result="miss")
+
+    documents = tuple(
+        RosterDocument(doc.id, doc.to_dict() or {}, doc.update_time)
+        for doc in db.collection(course_code).stream()
+    )
+
+    with _lock:
+        # A write that landed while we were reading makes this copy stale
+        if (_epoch, _generations.get(course_code, 0)) == generation:
+            _entries[course_code] = (now, version, documents)
+            _entries.move_to_end(course_code)
+            while len(_entries) > ROSTER_CACHE_SIZE:
+                _entries.popitem(last=False)
+                ROSTER_CACHE.inc(result="evict")
+        ROSTER_CACHE_ENTRIES.set(len(_entries))
+    return documents
+
+
+def invalidate(course_code: str):
+    """Drop a course's cached roster; call after writing to <course>/<rollno>"""
+    with _lock:
+        _generations[course_code] = _generations.get(course_code, 0) + 1
+        if _entries.pop(course_code, None) is not None:
+            ROSTER_CACHE.inc(result="invalidate")
+        ROSTER_CACHE_ENTRIES.set(len(_entries))
+
+
+@versions.add_bump_listener
+def _on_bump(course_code: str, kinds):
+    if "roster" in kinds or "marks" in kinds:
+        invalidate(course_code)
+
+
+def clear():
+    """Drop every cached roster (e.g. after reseeding the storage backend)"""
+    global _epoch
+    with _lock:
+        _epoch += 1
+        _entries.clear()
+        ROSTER_CACHE_ENTRIES.set(0)
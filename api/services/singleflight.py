@@ -0,0 +1,51 @@
+# api/services/singleflight.py
+"""
+Single-flight reads: concurrent requests for the same data share one fetch.
+
+When results are published hundreds of students open the same pages at once;
+without this every request streams the same collection. The first request
+for a key (the leader) runs the fetch in the threadpool, so the event loop
+keeps accepting requests; requests for that key arriving before it finishes
+await the same task and get the same result object (or exception).
+
+- Results are shared between requests: callers must not mutate them
+- Storage operations are counted on the leader's request only
+- A request that arrives after a write has finished can still join a fetch
+  that started before it; include the course's data version in the key
+  (services/versions.py) where that matters
+- Coalescing is per worker process
+"""
+import asyncio
+
+from starlette.concurrency import run_in_threadpool
+
+from services.metrics import SINGLEFLIGHT
+
+_calls = {}     # (event loop, key) -> in-flight asyncio task
+
+
+async def shared(key: tuple, fn, *args):
+    """
+    fn(*args), run at most once at a time per key. The first element of
+    `key` names the read in the metrics ("courses", "roster", ...).
+    """
+    # Tasks belong to one event loop (several exist under test clients)
+    flight = (asyncio.get_running_loop(), key)
+    task = _calls.get(flight)
+    if task is None:
+        task = asyncio.ensure_future(run_in_threadpool(fn, *args))
+        _calls[flight] = task
+        task.add_done_callback(lambda done: _forget(flight, done))
+        SINGLEFLIGHT.inc(read=key[0], result="leader")
+    else:
+        SINGLEFLIGHT.inc(read=key[0], result="shared")
+    # A leader that gives up (client gone) must not cancel the others' fetch
+    return await asyncio.shield(task)
+
+
+def _forget(flight, task):
+    if _calls.get(flight) is task:
+        del _calls[flight]
+    if not task.cancelled():
+        # Marks the exception as retrieved when every waiter has gone
+        task.exception()
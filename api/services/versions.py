@@ -0,0 +1,137 @@
+# api/services/versions.py
+"""
+Per-course data versions for conditional GETs.
+
+_versions/<course> holds one monotonic counter per kind of course data:
+
+    roster      student fields of <course>/<rollno>
+    marks       mark fields of <course>/<rollno>
+    attendance  attendance_<course>/*
+    results     results_<course>/*
+
+Every write path bumps the kinds it changed, after its own writes, with one
+Increment write. GET endpoints read that single document, derive an ETag from
+the kinds they depend on and answer a matching If-None-Match with 304, so an
+unchanged page costs one read instead of the whole collection.
+
+The document is kept when a course is deleted, so its counters never go back
+to values a client may still hold as an ETag.
+
+The course list itself (_courses) is versioned the same way, as the "courses"
+counter of _versions/_courses (bump_courses / courses_version).
+"""
+from fastapi import Response
+
+from services import mirror
+from services.firestore_client import db, firestore, COL_COURSES, COL_VERSIONS
+
+KINDS = ("roster", "marks", "attendance", "results")
+# Browsers may keep the body but must revalidate it on every use
+CACHE_CONTROL = "private, no-cache"
+
+# Called as fn(course_code, kinds) after every bump (services/roster_cache.py)
+_bump_listeners = []
+
+
+def add_bump_listener(fn):
+    _bump_listeners.append(fn)
+    return fn
+
+
+def bump(course_code: str, *kinds: str):
+    """Mark `kinds` of a course as changed (one write); call after the data writes"""
+    db.collection(COL_VERSIONS).document(course_code).set({
+        **{kind: firestore.Increment(1) for kind in kinds},
+        "updated_at": firestore.SERVER_TIMESTAMP,
+    }, merge=True)
+    for listener in _bump_listeners:
+        listener(course_code, kinds)
+
+
+def read_versions(course_code: str):
+    """{kind: version} for a course (one document read; 0 for kinds never written)"""
+    snap = db.collection(COL_VERSIONS).document(course_code).get()
+    data = (snap.to_dict() or {}) if snap.exists else {}
+    return {kind: int(data.get(kind, 0)) for kind in KINDS}
+
+
+def bump_courses():
+    """Mark the course list as changed (one write); call after writing to _courses"""
+    bump(COL_COURSES, "courses")
+
+
+def courses_version():
+    """
+    Version of the course list: the listener mirror's token when it is on
+    (no read), else one document read.
+    """
+    if mirror.MIRROR_ENABLED:
+        token = mirror.courses_token()
+        if token is not None:
+            return token
+    snap = db.collection(COL_VERSIONS).document(COL_COURSES).get()
+    return int(((snap.to_dict() or {}) if snap.exists else {}).get("courses", 0))
+
+
+def roster_version(current: dict):
+    """Version of everything stored on <course>/<rollno> documents (None when not read)"""
+    if "roster" not in current:
+        return None
+    return current["roster"], current["marks"]
+
+
+def make_etag(current: dict, kinds):
+    # Weak: the same versions always give equivalent, not byte-identical, bodies
+    return 'W/"' + ".".join(f"{kind}{current[kind]}" for kind in kinds) + '"'
+
+
+def etag_matches(if_none_match: str, etag: str):
+    """Weak comparison of an If-None-Match header against our ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+class Conditional:
+    """
+    Outcome of conditional_get():
+        .versions      {kind: version} as read
+        .headers       ETag / Cache-Control for the response
+        .not_modified  a 304 response when the client is already current, else None
+    """
+
+    def __init__(self, current: dict, kinds, if_none_match: str = None):
+        self.versions = current
+        self.etag = make_etag(current, kinds)
+        self.headers = {"ETag": self.etag, "Cache-Control": CACHE_CONTROL}
+        self.not_modified = None
+        if etag_matches(if_none_match, self.etag):
+            self.not_modified = Response(status_code=304, headers=self.headers)
+
+
+def conditional_get(request, response, course_code: str, *kinds: str):
+    """
+    Read the course versions once and put ETag / Cache-Control on `response`.
+    Endpoints return .not_modified as-is when it is set; file responses pass
+    .headers themselves.
+
+    With the listener mirror on, roster / marks are tagged with the mirror's
+    own state (what will actually be served): pages that only need those
+    skip the version read, the others add it to their ETag.
+    """
+    token = None
+    if mirror.MIRROR_ENABLED and {"roster", "marks"} & set(kinds):
+        token = mirror.roster_token(course_code)
+    if token is not None:
+        other = [kind for kind in kinds if kind not in ("roster", "marks")]
+        current = read_versions(course_code) if other else {}
+        current["mirror"] = token
+        kinds = (*other, "mirror")
+    else:
+        current = read_versions(course_code)
+    cond = Conditional(current, kinds, request.headers.get("if-none-match"))
+    response.headers.update(cond.headers)
+    return cond
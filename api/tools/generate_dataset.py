@@ -0,0 +1,229 @@
+# api/tools/generate_dataset.py
+"""
+Generate synthetic courses at production scale.
+
+Writes, per course, files in the column formats the API and dashboards expect:
+    <course>_roster.<ext>      POST /upload/students
+    <course>_marks.<ext>       POST /upload/marks
+    <course>_attendance.<ext>  attendance dashboard (same columns as /attendance/export)
+    <course>_results.<ext>     marks dashboard (same columns as /results/export)
+
+and/or seeds the local storage backend directly (STORAGE_BACKEND=local).
+
+Run from the api/ directory:
+    python -m tools.generate_dataset --courses 5 --students 2000 --formats csv parquet
+    python -m tools.generate_dataset --courses 20 --students 1000 --skew 1.0 --no-files \\
+        --seed-local ../local_store.sqlite
+"""
+import argparse
+import os
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# Max marks per component (see routers/result.calculate_percentage)
+MARK_COMPONENTS = {"mids_marks": 30, "finals_marks": 50, "sessional": 10, "assignment": 5, "quiz": 5}
+SECTIONS = ["A", "B", "C", "D", "E"]
+DEPARTMENTS = ["CS", "SE", "AI", "DS", "EE"]
+FIRST_NAMES = ["Ali", "Ayesha", "Bilal", "Fatima", "Hamza", "Hira", "Usman", "Zainab", "Omar", "Sana",
+               "Ahmed", "Maryam", "Hassan", "Laiba", "Saad", "Amna", "Danish", "Noor", "Talha", "Iqra"]
+LAST_NAMES = ["Khan", "Ahmed", "Malik", "Hussain", "Raza", "Jawaid", "Sheikh", "Butt", "Qureshi", "Siddiqui"]
+WRITERS = {
+    "csv": lambda df, path: df.to_csv(path, index=False),
+    "xlsx": lambda df, path: df.to_excel(path, index=False),
+    "parquet": lambda df, path: df.to_parquet(path, index=False),
+}
+
+
+def course_sizes(rng, courses, students, skew):
+    """Students per course; skew > 0 gives a long tail of large / small courses"""
+    if skew <= 0:
+        return [students] * courses
+    sizes = rng.lognormal(mean=0.0, sigma=skew, size=courses)
+    sizes = sizes / sizes.mean() * students
+    return [max(1, int(round(s))) for s in sizes]
+
+
+def section_weights(rng, skew):
+    """Uneven section sizes (one big morning section, smaller evening ones...)"""
+    weights = rng.dirichlet(np.full(len(SECTIONS), 1.0 / max(skew, 0.2)))
+    return weights / weights.sum()
+
+
+def make_roster(rng, course_code, n, skew=0.5):
+    idx = np.arange(n)
+    first = rng.choice(FIRST_NAMES, size=n)
+    last = rng.choice(LAST_NAMES, size=n)
+    return pd.DataFrame({
+        "rollno": [f"{course_code}-{i:05d}" for i in idx],
+        "name": np.char.add(np.char.add(first, " "), last),
+        "section": rng.choice(SECTIONS, size=n, p=section_weights(rng, skew)),
+        "batch": rng.choice(["2021", "2022", "2023", "2024"], size=n, p=[0.1, 0.3, 0.4, 0.2]),
+        "department": rng.choice(DEPARTMENTS, size=n, p=[0.45, 0.2, 0.15, 0.1, 0.1]),
+        "semester": rng.choice(["3", "5", "7"], size=n, p=[0.3, 0.5, 0.2]),
+    })
+
+
+def make_marks(rng, roster, difficulty=0.0):
+    """
+    Per-student ability ~ Beta (left-skewed: most pass, a tail fails);
+    difficulty > 0 shifts the whole class down.
+    """
+    n = len(roster)
+    ability = rng.beta(3.5, 2.0 + 3.0 * max(difficulty, 0.0), size=n)
+    marks = {"rollno": roster["rollno"].values, "name": roster["name"].values, "section": roster["section"].values}
+    for component, max_marks in MARK_COMPONENTS.items():
+        noise = rng.normal(0.0, 0.12, size=n)
+        marks[component] = np.round(np.clip(ability + noise, 0.0, 1.0) * max_marks, 1)
+    return pd.DataFrame(marks)
+
+
+def make_attendance(rng, course_code, roster, sessions, start=date(2025, 2, 3)):
+    """One row per student per session; a few chronic absentees, a little lateness"""
+    n = len(roster)
+    if sessions <= 0 or n == 0:
+        return pd.DataFrame(columns=["date", "time", "rollno", "status", "course",
+                                     "name", "section", "department", "semester"])
+    propensity = rng.beta(9.0, 1.5, size=n)
+    # Class days: Mon / Wed / Fri
+    days, current = [], start
+    while len(days) < sessions:
+        if current.weekday() in (0, 2, 4):
+            days.append(current.isoformat())
+        current += timedelta(days=1)
+
+    draws = rng.random((sessions, n))
+    status = np.where(draws < propensity, "present", "absent")
+    status = np.where((status == "present") & (rng.random((sessions, n)) < 0.05), "late", status)
+
+    return pd.DataFrame({
+        "date": np.repeat(days, n),
+        "time": np.repeat(rng.choice(["08:30", "10:00", "11:30", "14:00"], size=sessions), n),
+        "rollno": np.tile(roster["rollno"].values, sessions),
+        "status": status.ravel(),
+        "course": course_code,
+        "name": np.tile(roster["name"].values, sessions),
+        "section": np.tile(roster["section"].values, sessions),
+        "department": np.tile(roster["department"].values, sessions),
+        "semester": np.tile(roster["semester"].values, sessions),
+    })
+
+
+def make_results(course_code, roster, marks):
+    from routers.result import calculate_result
+
+    rows = []
+    for student, scores in zip(roster.itertuples(index=False), marks.itertuples(index=False)):
+        result = calculate_result(*(float(getattr(scores, c)) for c in MARK_COMPONENTS))
+        result.pop("components")
+        rows.append({
+            "rollno": student.rollno, "name": student.name, "section": student.section,
+            "batch": student.batch, "course": course_code, **result,
+        })
+    return pd.DataFrame(rows)
+
+
+def generate_course(rng, course_code, n, sessions, skew, difficulty):
+    roster = make_roster(rng, course_code, n, skew)
+    marks = make_marks(rng, roster, difficulty)
+    return {
+        "roster": roster,
+        "marks": marks,
+        "attendance": make_attendance(rng, course_code, roster, sessions),
+        "results": make_results(course_code, roster, marks),
+    }
+
+
+def write_files(course_code, frames, out_dir, formats):
+    os.makedirs(out_dir, exist_ok=True)
+    for kind, df in frames.items():
+        for fmt in formats:
+            if fmt == "xlsx" and len(df) > 1_048_575:
+                print(f"  skipping {course_code}_{kind}.xlsx ({len(df)} rows exceeds the Excel sheet limit)")
+                continue
+            WRITERS[fmt](df, os.path.join(out_dir, f"{course_code}_{kind}.{fmt}"))
+
+
+def seed_local(course_code, frames):
+    """Write the course straight into the local storage backend"""
+    from services.firebase import db, chunked, COL_COURSES
+    from services import attendance_repo, versions
+
+    roster, marks = frames["roster"], frames["marks"]
+    scores = marks.set_index("rollno")[list(MARK_COMPONENTS)].to_dict("index")
+    col = db.collection(course_code)
+    results_col = db.collection(f"results_{course_code}")
+
+    writes = []
+    for student in roster.to_dict("records"):
+        writes.append((col.document(student["rollno"]), {**student, "course": course_code,
+                                                         **scores[student["rollno"]]}))
+    for result in frames["results"].to_dict("records"):
+        writes.append((results_col.document(result["rollno"]), result))
+    for chunk in chunked(writes):
+        batch = db.batch()
+        for ref, data in chunk:
+            batch.set(ref, data)
+        batch.commit()
+
+    attendance = frames["attendance"]
+    sessions = []
+    for (day, time), rows in attendance.groupby(["date", "time"], sort=True):
+        session = attendance_repo.build_session(course_code, day, time, dict(zip(rows["rollno"], rows["status"])))
+        sessions.append((attendance_repo.session_id(day), session))
+    for chunk in chunked(sessions):
+        batch = db.batch()
+        for doc_id, session in chunk:
+            attendance_repo.save_session(course_code, doc_id, session, batch=batch)
+        batch.commit()
+
+    db.collection(COL_COURSES).document(course_code).set({
+        "name": course_code,
+        "created_at": datetime.now().isoformat(),
+        "student_count": len(roster),
+        "description": f"Synthetic course with {len(roster)} students",
+        "status": "active",
+    })
+    versions.bump(course_code, *versions.KINDS)
+    versions.bump_courses()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic roster / marks / attendance data")
+    parser.add_argument("--courses", type=int, default=3, help="number of courses")
+    parser.add_argument("--students", type=int, default=1000, help="mean students per course")
+    parser.add_argument("--sessions", type=int, default=30, help="attendance sessions per course")
+    parser.add_argument("--skew", type=float, default=0.5,
+                        help="0 = equal course/section sizes; higher = longer tail")
+    parser.add_argument("--difficulty", type=float, default=0.0, help="shifts marks down (more failures)")
+    parser.add_argument("--prefix", default="SYN", help="course code prefix (SYN101, SYN102, ...)")
+    parser.add_argument("--formats", nargs="+", choices=sorted(WRITERS), default=["csv"])
+    parser.add_argument("--out", default="generated_data", help="output directory for files")
+    parser.add_argument("--no-files", action="store_true", help="only seed, do not write files")
+    parser.add_argument("--seed-local", metavar="SQLITE_PATH",
+                        help="also load the data into the local storage backend at this SQLite path")
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+    args = parser.parse_args(argv)
+
+    # Never talk to Firestore from here (routers.result imports services.firebase)
+    os.environ["STORAGE_BACKEND"] = "local"
+    if args.seed_local:
+        os.environ["LOCAL_STORE_PATH"] = args.seed_local
+
+    rng = np.random.default_rng(args.seed)
+    sizes = course_sizes(rng, args.courses, args.students, args.skew)
+
+    for i, n in enumerate(sizes):
+        course_code = f"{args.prefix}{101 + i}"
+        frames = generate_course(rng, course_code, n, args.sessions, args.skew, args.difficulty)
+        if not args.no_files:
+            write_files(course_code, frames, args.out, args.formats)
+        if args.seed_local:
+            seed_local(course_code, frames)
+        print(f"{course_code}: {n} students, {args.sessions} sessions, "
+              f"{(frames['results']['status'] == 'Fail').mean():.0%} failing")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+# api/tools/migrate_attendance.py
+"""
+Move legacy attendance/<course>/logs/<date> documents into the canonical
+attendance_<course>/<date> collections.
+
+Run from the api/ directory:
+    python -m tools.migrate_attendance                  # every legacy course
+    python -m tools.migrate_attendance CS101 --delete-legacy
+    python -m tools.migrate_attendance --dry-run
+"""
+import argparse
+
+from services import attendance_repo
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migrate legacy attendance logs to the canonical layout")
+    parser.add_argument("courses", nargs="*", help="Course codes to migrate (default: all legacy courses)")
+    parser.add_argument("--delete-legacy", action="store_true", help="Delete legacy documents after copying")
+    parser.add_argument("--overwrite", action="store_true", help="Replace sessions that already exist in the canonical layout")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing")
+    args = parser.parse_args(argv)
+
+    courses = args.courses or attendance_repo.legacy_courses()
+    if not courses:
+        print("No legacy attendance found.")
+        return
+
+    for course_code in courses:
+        stats = attendance_repo.migrate_course(
+            course_code,
+            delete_legacy=args.delete_legacy,
+            overwrite=args.overwrite,
+            dry_run=args.dry_run,
+        )
+        prefix = "[dry-run] " if args.dry_run else ""
+        print(
+            f"{prefix}{course_code}: migrated {stats['migrated']}, "
+            f"skipped {stats['skipped']}, deleted legacy {stats['deleted_legacy']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+Asyncio load generator for result-day style traffic.
+
+By default the API runs in-process (httpx ASGI transport) over the local
+storage backend, seeded with synthetic courses; --latency / --errors inject
+storage round-trip delays and failures (services/local_store.FaultModel). Like a single uvicorn worker, blocking storage calls inside
+async endpoints hold up every other request. --url points it at a running
+server instead (seed that one with tools/generate_dataset.py --seed-local).
+
+    python benchmarks/loadtest.py result_release --users 200 --duration 30 --latency-ms 40
+    python benchmarks/loadtest.py result_release --latency "*=lognormal:40:0.4" --errors "commit=0.01"
+    python benchmarks/loadtest.py attendance_hour --courses 10 --students 300
+    python benchmarks/loadtest.py roster_intake --url http://localhost:8000 --json out.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(os.path.dirname(HERE), "api")
+
+
+# ======================================================
+#               SCENARIOS
+# ======================================================
+# Each action: (weight, endpoint label, coroutine(client, ctx, rng) -> response)
+
+def _csv(rows):
+    columns = list(rows[0])
+    lines = [",".join(columns)] + [",".join(str(r[c]) for c in columns) for r in rows]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def _course(ctx, rng):
+    # Traffic concentrates on a few popular courses
+    return ctx["courses"][min(int(rng.expovariate(0.5)), len(ctx["courses"]) - 1)]
+
+
+async def student_result(client, ctx, rng):
+    course = _course(ctx, rng)
+    return await client.get(f"/results/student/{course}/{rng.choice(ctx['rollnos'][course])}")
+
+
+async def marks_reupload(client, ctx, rng):
+    course = _course(ctx, rng)
+    rows = [{"rollno": r, "mids_marks": round(rng.uniform(5, 30), 1), "finals_marks": round(rng.uniform(10, 50), 1),
+             "sessional": round(rng.uniform(3, 10), 1), "assignment": round(rng.uniform(1, 5), 1),
+             "quiz": round(rng.uniform(1, 5), 1)}
+            for r in rng.sample(ctx["rollnos"][course], min(20, len(ctx["rollnos"][course])))]
+    return await client.post("/upload/marks", files={"file": ("marks.csv", _csv(rows))},
+                             data={"course_code": course})
+
+
+async def mark_attendance(client, ctx, rng):
+    course = _course(ctx, rng)
+    roster = ctx["rollnos"][course]
+    day = f"2025-04-{rng.randint(1, 28):02d}"
+    return await client.post(f"/attendance/mark/{course}", json={
+        "date": day, "time": "09:00",
+        "attendance": {r: "present" if rng.random() < 0.85 else "absent" for r in roster},
+    })
+
+
+async def view_attendance(client, ctx, rng):
+    course = _course(ctx, rng)
+    return await client.get(f"/attendance/view/{course}/{rng.choice(ctx['dates'][course])}")
+
+
+async def roster_upload(client, ctx, rng):
+    course = f"INTAKE{rng.randint(1, 5)}"
+    rows = [{"rollno": f"{course}-{i:04d}", "name": f"Applicant {i}", "section": rng.choice("ABC"),
+             "batch": "2025", "department": "CS", "semester": "1"} for i in range(rng.randint(50, 200))]
+    return await client.post("/upload/students", files={"file": ("roster.csv", _csv(rows))},
+                             data={"course_code": course})
+
+
+async def add_student(client, ctx, rng):
+    course = _course(ctx, rng)
+    rollno = f"{course}-N{rng.randrange(10 ** 6):06d}"
+    return await client.post("/students/add", json={"course_code": course, "student": {
+        "rollno": rollno, "name": "New Student", "section": "A", "batch": "2025",
+        "department": "CS", "semester": "1"}})
+
+
+async def enroll_bulk(client, ctx, rng):
+    course = _course(ctx, rng)
+    return await client.post(f"/students/enroll-bulk/{course}",
+                             json={"rollnos": rng.sample(ctx["rollnos"][course], min(25, len(ctx["rollnos"][course])))})
+
+
+async def calculate_results(client, ctx, rng):
+    return await client.post(f"/results/calculate/{_course(ctx, rng)}")
+
+
+def _get(path):
+    async def action(client, ctx, rng):
+        return await client.get(path.format(course=_course(ctx, rng)))
+    return action
+
+
+SCENARIOS = {
+    # Students refreshing their result while teachers fix marks
+    "result_release": [
+        (45, "GET /courses/", _get("/courses/")),
+        (45, "GET /results/student/{course}/{rollno}", student_result),
+        (5, "GET /results/{course}/stats", _get("/results/{course}/stats")),
+        (4, "POST /upload/marks", marks_reupload),
+        (1, "POST /results/calculate/{course}", calculate_results),
+    ],
+    # Teachers marking and reviewing attendance at the start of class
+    "attendance_hour": [
+        (50, "POST /attendance/mark/{course}", mark_attendance),
+        (20, "GET /attendance/dates/{course}", _get("/attendance/dates/{course}")),
+        (15, "GET /students/by-course/{course}", _get("/students/by-course/{course}")),
+        (10, "GET /attendance/view/{course}/{date}", view_attendance),
+        (5, "GET /attendance/export/{course}", _get("/attendance/export/{course}")),
+    ],
+    # Start of semester: rosters uploaded, late additions, enrollment
+    "roster_intake": [
+        (30, "POST /upload/students", roster_upload),
+        (30, "POST /students/add", add_student),
+        (20, "POST /students/enroll-bulk/{course}", enroll_bulk),
+        (20, "GET /students/search/{course}", _get("/students/search/{course}?query=khan")),
+    ],
+}
+
+
+# ======================================================
+#               RUNNER
+# ======================================================
+
+def percentile(ordered, pct):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def virtual_user(client, ctx, actions, deadline, think_ms, seed, samples):
+    rng = random.Random(seed)
+    weights = [a[0] for a in actions]
+    while time.perf_counter() < deadline:
+        _, label, action = rng.choices(actions, weights)[0]
+        start = time.perf_counter()
+        try:
+            response = await action(client, ctx, rng)
+            ok = response.status_code < 400
+            status = response.status_code
+        except Exception as e:
+            ok, status = False, type(e).__name__
+        samples.append((label, time.perf_counter() - start, ok, status))
+        if think_ms:
+            await asyncio.sleep(rng.expovariate(1000 / think_ms))
+
+
+async def discover(client, max_courses):
+    """Course codes and roll numbers to aim traffic at"""
+    courses = (await client.get("/courses/")).json()
+    courses = [c for c in courses if not c.startswith("INTAKE")][:max_courses]
+    if not courses:
+        raise SystemExit("No courses to target; seed the backend first")
+    rollnos, dates = {}, {}
+    for course in courses:
+        students = (await client.get(f"/students/by-course/{course}")).json()
+        rollnos[course] = [s["rollno"] for s in students] or ["none"]
+        sessions = (await client.get(f"/attendance/dates/{course}")).json()
+        dates[course] = [s["date"] for s in sessions] or ["2025-04-01"]
+    return {"courses": courses, "rollnos": rollnos, "dates": dates}
+
+
+def seed_in_process(courses, students, faults):
+    os.environ["STORAGE_BACKEND"] = "local"
+    os.environ.pop("LOCAL_STORE_PATH", None)
+    os.environ["COST_LEDGER_FLUSH_SECONDS"] = "1e9"
+    os.chdir(API_DIR)
+    sys.path.insert(0, API_DIR)
+
+    import numpy as np
+    from services import instrumentation, local_store
+    from tools.generate_dataset import course_sizes, generate_course, seed_local
+    import main
+
+    instrumentation.logger.setLevel("WARNING")
+    rng = np.random.default_rng(42)
+    for i, n in enumerate(course_sizes(rng, courses, students, 0.5)):
+        seed_local(f"LOAD{101 + i}", generate_course(rng, f"LOAD{101 + i}", n, 5, 0.5, 0.0))
+    # Seed at full speed, then switch the injected latency / faults on
+    local_store.client().faults = local_store.FaultModel.parse(**faults)
+    return main.app
+
+
+def fault_options(args):
+    latency = args.latency or (f"*=fixed:{args.latency_ms}" if args.latency_ms else "")
+    return {"latency": latency, "jitter_ms": args.jitter_ms, "per_doc_ms": args.per_doc_ms,
+            "errors": args.errors, "deadline_ms": args.deadline_ms, "seed": args.seed}
+
+
+def report(samples, elapsed):
+    by_label = {}
+    for label, latency, ok, status in samples:
+        by_label.setdefault(label, []).append((latency, ok, status))
+
+    rows = []
+    for label, entries in sorted(by_label.items()):
+        latencies = sorted(e[0] * 1000 for e in entries)
+        errors = [e[2] for e in entries if not e[1]]
+        rows.append({
+            "endpoint": label,
+            "requests": len(entries),
+            "rps": round(len(entries) / elapsed, 2),
+            "error_rate": round(len(errors) / len(entries), 4),
+            "errors": {str(s): errors.count(s) for s in set(errors)},
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p90_ms": round(percentile(latencies, 90), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "max_ms": round(latencies[-1], 2),
+        })
+    total_errors = sum(1 for s in samples if not s[2])
+    summary = {
+        "requests": len(samples),
+        "rps": round(len(samples) / elapsed, 2),
+        "error_rate": round(total_errors / len(samples), 4) if samples else 0.0,
+        "duration_s": round(elapsed, 2),
+    }
+    return summary, rows
+
+
+async def run(args):
+    import httpx
+
+    if args.url:
+        transport, base_url = None, args.url
+    else:
+        app = seed_in_process(args.courses, args.students, fault_options(args))
+        transport, base_url = httpx.ASGITransport(app=app), "http://loadtest"
+
+    limits = httpx.Limits(max_connections=args.users)
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=args.timeout,
+                                 limits=limits) as client:
+        ctx = await discover(client, args.courses)
+        samples = []
+        start = time.perf_counter()
+        deadline = start + args.duration
+        users = []
+        for i in range(args.users):
+            users.append(asyncio.create_task(virtual_user(
+                client, ctx, SCENARIOS[args.scenario], deadline, args.think_ms, args.seed + i, samples)))
+            # Spread the ramp-up over --ramp seconds
+            if args.ramp:
+                await asyncio.sleep(args.ramp / args.users)
+        await asyncio.gather(*users)
+        elapsed = time.perf_counter() - start
+    return report(samples, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate result-day traffic against the API")
+    parser.add_argument("scenario", choices=sorted(SCENARIOS))
+    parser.add_argument("--users", type=int, default=50, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of load")
+    parser.add_argument("--ramp", type=float, default=2.0, help="seconds to start all users")
+    parser.add_argument("--think-ms", type=float, default=200.0, help="mean pause between a user's requests")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout (s)")
+    parser.add_argument("--url", help="target a running server instead of the in-process app")
+    parser.add_argument("--courses", type=int, default=5, help="synthetic courses (in-process) / courses targeted")
+    parser.add_argument("--students", type=int, default=500, help="mean students per synthetic course")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="fixed storage round-trip delay (in-process)")
+    parser.add_argument("--latency", default="",
+                        help='per-op latency distributions, e.g. "get=lognormal:40:0.35,*=uniform:20:80"')
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="extra uniform 0..N ms per storage RPC")
+    parser.add_argument("--per-doc-ms", type=float, default=0.0, help="transfer time per document returned")
+    parser.add_argument("--errors", default="", help='failure probability per op, e.g. "commit=0.01,*=0.001"')
+    parser.add_argument("--deadline-ms", type=float, help="RPCs slower than this fail with DeadlineExceeded")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    summary, rows = asyncio.run(run(args))
+
+    print(f"\n{args.scenario}: {summary['requests']} requests in {summary['duration_s']}s "
+          f"({summary['rps']} req/s, {summary['error_rate']:.2%} errors)\n")
+    print(f"{'endpoint':<42} {'reqs':>7} {'req/s':>8} {'err%':>6} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}")
+    for row in rows:
+        print(f"{row['endpoint']:<42} {row['requests']:>7} {row['rps']:>8} {row['error_rate']:>6.1%} "
+              f"{row['p50_ms']:>9} {row['p90_ms']:>9} {row['p99_ms']:>9} {row['max_ms']:>9}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"scenario": args.scenario, "args": vars(args), "summary": summary, "endpoints": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
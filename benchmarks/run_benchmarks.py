@@ -0,0 +1,225 @@
+"""
+API benchmarks against the local storage backend (no Firebase needed).
+
+Each scenario x course size runs in a fresh process so peak RSS is per run:
+
+    python benchmarks/run_benchmarks.py --sizes 100 1000     # compare with baseline.json
+    python benchmarks/run_benchmarks.py --save-baseline      # record a new baseline
+    python benchmarks/run_benchmarks.py --sizes 100 1000 --only result_stats course_info
+    python benchmarks/run_benchmarks.py --sizes 1000 --latency "*=uniform:20:80"   # Firestore-like RTTs
+
+Exits with status 1 when a scenario is slower (p50), uses more memory or more
+storage operations than the baseline by more than --threshold.
+
+The committed baseline.json covers --sizes 100 1000 (the default scenarios and
+repeats, no --latency), recorded with --sizes 100 1000 --save-baseline. Its
+storage op counts are deterministic, but timings and RSS only compare on the
+machine that recorded them, so CI checks it with
+
+    python benchmarks/run_benchmarks.py --sizes 100 1000 --counts-only
+
+Results without a baseline entry, or a missing baseline file, are reported as
+warnings, and fail the run with --strict (the default when the CI environment
+variable is set).
+"""
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(os.path.dirname(HERE), "api")
+DEFAULT_BASELINE = os.path.join(HERE, "baseline.json")
+DEFAULT_SIZES = [100, 1000, 10000, 50000]
+
+
+def default_repeat(size):
+    return 20 if size <= 1000 else 5 if size <= 10000 else 3
+
+
+def peak_rss_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    except ImportError:
+        try:
+            import psutil
+            return round(psutil.Process().memory_info().peak_wset / (1024 * 1024), 1)
+        except (ImportError, AttributeError):
+            return None
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_one(scenario_name, size, repeat, faults=None):
+    """Runs in a child process: time `repeat` calls of one scenario at one size"""
+    os.environ["STORAGE_BACKEND"] = "local"
+    os.environ.pop("LOCAL_STORE_PATH", None)
+    # Keep the cost ledger from flushing in the middle of a measurement
+    os.environ["COST_LEDGER_FLUSH_SECONDS"] = "1e9"
+    os.chdir(API_DIR)
+    sys.path.insert(0, API_DIR)
+    sys.path.insert(0, HERE)
+
+    from fastapi.testclient import TestClient
+    from services import instrumentation, local_store
+    import main
+    from scenarios import SCENARIOS
+
+    # One log line per request would swamp the report
+    instrumentation.logger.setLevel("WARNING")
+
+    scenario = next(s for s in SCENARIOS if s.name == scenario_name)
+    raw = local_store.client()
+    # Injected storage latency applies to the timed call only, not to seeding
+    injected = local_store.FaultModel.parse(**(faults or {}))
+    no_faults = raw.faults
+    client = TestClient(main.app)
+
+    counting = {"on": False}
+    ops = {kind: 0 for kind in instrumentation.OP_KINDS}
+
+    @instrumentation.add_op_listener
+    def count(op, kind, n, elapsed_ms):
+        if counting["on"]:
+            ops[op] += n
+
+    if scenario.setup:
+        scenario.setup(raw, size)
+
+    latencies = []
+    # The first (untimed) call pays for lazy imports and warms the caches
+    for i in range(repeat + 1):
+        if scenario.prepare:
+            scenario.prepare(raw, size)
+        counting["on"] = i > 0
+        raw.faults = injected
+        start = time.perf_counter()
+        response = scenario.run(client, size)
+        elapsed = time.perf_counter() - start
+        raw.faults = no_faults
+        counting["on"] = False
+        if response.status_code >= 400:
+            raise RuntimeError(f"{scenario_name}@{size}: HTTP {response.status_code} {response.text[:200]}")
+        if i > 0:
+            latencies.append(elapsed)
+
+    total = sum(latencies)
+    return {
+        "scenario": scenario_name,
+        "size": size,
+        "iterations": repeat,
+        "ops_per_sec": round(repeat / total, 3) if total else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "peak_rss_mb": peak_rss_mb(),
+        # Storage documents touched per call (deterministic, so compared exactly)
+        "reads": ops["read"] // repeat,
+        "writes": ops["write"] // repeat,
+        "deletes": ops["delete"] // repeat,
+    }
+
+
+def compare(results, baseline, threshold, counts_only=False):
+    """(regression messages for results worse than the baseline, keys it has no entry for)"""
+    problems = []
+    missing = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if not base:
+            missing.append(key)
+            continue
+        for op in ("reads", "writes", "deletes"):
+            if result[op] > base.get(op, 0):
+                problems.append(f"{key}: {result[op]} {op}/call vs baseline {base.get(op, 0)}")
+        if counts_only:
+            continue
+        if result["p50_ms"] > base["p50_ms"] * (1 + threshold):
+            problems.append(f"{key}: p50 {result['p50_ms']}ms vs baseline {base['p50_ms']}ms")
+        if result["peak_rss_mb"] and base.get("peak_rss_mb") and \
+                result["peak_rss_mb"] > base["peak_rss_mb"] * (1 + threshold):
+            problems.append(f"{key}: peak RSS {result['peak_rss_mb']}MB vs baseline {base['peak_rss_mb']}MB")
+    return problems, missing
+
+
+def main():
+    sys.path.insert(0, API_DIR)
+    sys.path.insert(0, HERE)
+    from scenarios import SCENARIOS
+
+    parser = argparse.ArgumentParser(description="Benchmark the API against the local storage backend")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="students per course")
+    parser.add_argument("--only", nargs="+", choices=[s.name for s in SCENARIOS], help="scenarios to run")
+    parser.add_argument("--repeat", type=int, help="iterations per run (default depends on size)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--output", help="also write this run's results to a JSON file")
+    parser.add_argument("--latency", default="",
+                        help='storage latency per op, e.g. "*=uniform:20:80" (results are keyed by it)')
+    parser.add_argument("--per-doc-ms", type=float, default=0.0, help="storage transfer time per document")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown / memory growth before failing (0.25 = 25%%)")
+    parser.add_argument("--strict", action=argparse.BooleanOptionalAction, default=bool(os.getenv("CI")),
+                        help="fail when the baseline or an entry for a result is missing (default: on in CI)")
+    parser.add_argument("--counts-only", action="store_true",
+                        help="compare storage op counts only (for a baseline recorded on another machine)")
+    args = parser.parse_args()
+
+    names = args.only or [s.name for s in SCENARIOS]
+    faults = {"latency": args.latency, "per_doc_ms": args.per_doc_ms, "seed": 0}
+    suffix = "".join(f" [{label}={value}]" for label, value in
+                     (("latency", args.latency), ("per_doc_ms", args.per_doc_ms)) if value)
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for size in args.sizes:
+        for name in names:
+            repeat = args.repeat or default_repeat(size)
+            with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                result = pool.submit(run_one, name, size, repeat, faults).result()
+            key = f"{name}@{size}{suffix}"
+            results[key] = result
+            print(f"{key:<28} {result['ops_per_sec']:>10} ops/s  p50 {result['p50_ms']:>10}ms  "
+                  f"p99 {result['p99_ms']:>10}ms  rss {result['peak_rss_mb']}MB  "
+                  f"r/w/d {result['reads']}/{result['writes']}/{result['deletes']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"WARNING: no baseline at {args.baseline}, nothing was compared; "
+              f"run with --save-baseline first", file=sys.stderr)
+        return 1 if args.strict else 0
+    with open(args.baseline) as f:
+        problems, missing = compare(results, json.load(f), args.threshold, args.counts_only)
+    for problem in problems:
+        print(f"REGRESSION {problem}")
+    for key in missing:
+        print(f"WARNING: no baseline entry for {key}, not compared", file=sys.stderr)
+    return 1 if problems or (missing and args.strict) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
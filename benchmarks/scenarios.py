@@ -0,0 +1,170 @@
+"""
+Benchmark scenarios: each one seeds a synthetic course into the local storage
+backend (untimed) and then times one API call through FastAPI's TestClient.
+"""
+import io
+import random
+
+import numpy as np
+
+from tools.generate_dataset import MARK_COMPONENTS, make_marks, make_roster
+
+COURSE = "BENCH101"
+ATTENDANCE_SESSIONS = 10
+
+
+def rollno(i):
+    return f"{COURSE}-{i:05d}"
+
+
+def roster_rows(n):
+    return make_roster(np.random.default_rng(7), COURSE, n).to_dict("records")
+
+
+def marks_rows(n):
+    roster = make_roster(np.random.default_rng(7), COURSE, n)
+    marks = make_marks(np.random.default_rng(11), roster)
+    return marks[["rollno", *MARK_COMPONENTS]].to_dict("records")
+
+
+def to_csv(rows):
+    buf = io.StringIO()
+    columns = list(rows[0])
+    buf.write(",".join(columns) + "\n")
+    for row in rows:
+        buf.write(",".join(str(row[c]) for c in columns) + "\n")
+    return buf.getvalue().encode()
+
+
+# ------------------------------------------------------
+#   Seeding (writes straight to the store, not timed)
+# ------------------------------------------------------
+
+def _write_all(raw, writes):
+    for start in range(0, len(writes), 500):
+        batch = raw.batch()
+        for ref, data in writes[start:start + 500]:
+            batch.set(ref, data)
+        batch.commit()
+
+
+def seed_course(raw, n, marks=True, results=False, attendance=False):
+    from routers.result import calculate_result
+
+    roster = roster_rows(n)
+    scores = {row["rollno"]: row for row in marks_rows(n)} if marks else {}
+    course = raw.collection(COURSE)
+    writes = []
+    for row in roster:
+        writes.append((course.document(row["rollno"]), {**row, "course": COURSE, **{
+            k: v for k, v in scores.get(row["rollno"], {}).items() if k != "rollno"}}))
+    writes.append((raw.collection("_courses").document(COURSE), {
+        "name": COURSE, "student_count": n, "status": "active"}))
+
+    if results:
+        col = raw.collection(f"results_{COURSE}")
+        for row in roster:
+            s = scores[row["rollno"]]
+            result = calculate_result(s["mids_marks"], s["finals_marks"], s["sessional"], s["assignment"], s["quiz"])
+            result.update({"rollno": row["rollno"], "name": row["name"], "section": row["section"],
+                           "batch": row["batch"], "course": COURSE})
+            writes.append((col.document(row["rollno"]), result))
+
+    if attendance:
+        rng = random.Random(3)
+        col = raw.collection(f"attendance_{COURSE}")
+        for day in range(ATTENDANCE_SESSIONS):
+            date = f"2025-03-{day + 1:02d}"
+            writes.append((col.document(date), {
+                "date": date, "time": "09:00", "course": COURSE,
+                "attendance": {row["rollno"]: "present" if rng.random() < 0.85 else "absent" for row in roster},
+            }))
+
+    _write_all(raw, writes)
+
+
+# ------------------------------------------------------
+#   Scenarios
+# ------------------------------------------------------
+
+class Scenario:
+    """
+    setup(raw, n)   once before the iterations (untimed)
+    prepare(raw, n) before every iteration (untimed)
+    run(client, n)  the timed API call; returns the response
+    """
+
+    def __init__(self, name, run, setup=None, prepare=None):
+        self.name = name
+        self.run = run
+        self.setup = setup
+        self.prepare = prepare
+
+
+def _reset(raw):
+    from services import result_snapshots, roster_cache
+    raw.reset()
+    # The API process caches rosters and snapshots; seeding behind its back must drop them
+    roster_cache.clear()
+    result_snapshots.clear()
+
+
+def _fresh(raw, n):
+    _reset(raw)
+
+
+def _upload_roster(client, n):
+    return client.post("/upload/students",
+                       files={"file": ("roster.csv", _payload("roster", n))},
+                       data={"course_code": COURSE})
+
+
+def _upload_marks(client, n):
+    return client.post("/upload/marks",
+                       files={"file": ("marks.csv", _payload("marks", n))},
+                       data={"course_code": COURSE})
+
+
+_payload_cache = {}
+
+def _payload(kind, n):
+    key = (kind, n)
+    if key not in _payload_cache:
+        _payload_cache[key] = to_csv(roster_rows(n) if kind == "roster" else marks_rows(n))
+    return _payload_cache[key]
+
+
+def _seed(**kwargs):
+    def setup(raw, n):
+        _reset(raw)
+        seed_course(raw, n, **kwargs)
+    return setup
+
+
+def _published(raw, n):
+    from services import result_snapshots
+    _seed(results=True)(raw, n)
+    result_snapshots.publish(COURSE)
+
+
+SCENARIOS = [
+    Scenario("roster_upload", _upload_roster, prepare=_fresh),
+    Scenario("marks_upload", _upload_marks, setup=_seed(marks=False)),
+    Scenario("result_calculate", lambda c, n: c.post(f"/results/calculate/{COURSE}"), setup=_seed()),
+    Scenario("result_stats", lambda c, n: c.get(f"/results/{COURSE}/stats"), setup=_seed(results=True)),
+    Scenario("result_lookup", lambda c, n: c.get(f"/results/student/{COURSE}/{rollno(n // 2)}"),
+             setup=_seed(results=True)),
+    Scenario("result_lookup_published", lambda c, n: c.get(f"/results/student/{COURSE}/{rollno(n // 2)}"),
+             setup=_published),
+    Scenario("results_export", lambda c, n: c.get(f"/results/export/{COURSE}"), setup=_seed(results=True)),
+    Scenario("marks_export", lambda c, n: c.get(f"/marks/export/{COURSE}"), setup=_seed()),
+    Scenario("attendance_export", lambda c, n: c.get(f"/attendance/export/{COURSE}"),
+             setup=_seed(attendance=True)),
+    Scenario("student_search", lambda c, n: c.get(f"/students/search/{COURSE}", params={"query": "khan"}),
+             setup=_seed()),
+    Scenario("course_list", lambda c, n: c.get("/courses/"), setup=_seed()),
+    Scenario("course_info", lambda c, n: c.get(f"/courses/{COURSE}/info"),
+             setup=_seed(results=True, attendance=True)),
+    Scenario("course_delete", lambda c, n: c.delete(f"/courses/{COURSE}"),
+             prepare=_seed(results=True, attendance=True)),
+]